@@ -0,0 +1,381 @@
+"""
+Microbenchmarks for the desktop data layer (services/local_db.py).
+
+Generates years of synthetic sessions and blinks into a throwaway SQLite file,
+shaped like a long-tenured user's database: a few sessions a day, blinks at
+realistic rates, everything synced except a recent offline backlog (blinks of
+the last --backlog-days, and the sessions of the last two days). It then
+times the operations the app runs all day:
+
+  save_blinks_batch                 dashboard flushes of 10 blinks into the active session
+  unsynced_cycle                    get_unsynced_blinks + mark_blinks_synced, 500 rows
+  get_blinks_for_session            random historical sessions
+  get_all_sessions / sessions_page  history list, first page and a deep keyset page
+  sync_drain                        SyncWorker pushing the whole offline backlog to a
+                                    local HTTP stub, until nothing is pending
+
+Results go to bench/results/ as JSON tagged with the git commit, like the
+backend load test, so runs can be compared:
+
+    uv run python bench/local_db_bench.py --years 3
+    uv run python bench/local_db_bench.py --compare bench/results/A.json bench/results/B.json
+"""
+import argparse
+import json
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+EMAIL = "bench@example.com"
+
+sys.path.insert(0, str(APP_DIR / "src"))
+
+
+# ========== SYNTHETIC DATA ==========
+
+def generate(db_path: Path, years: float, sessions_per_day: float, blinks_per_min: float,
+             backlog_days: int, seed: int) -> dict:
+    """Write the synthetic dataset straight into db_path. Returns its shape."""
+    from services import local_db
+
+    local_db.DB_PATH = db_path
+    local_db._get_conn().close()  # create the schema the app would
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    conn = sqlite3.connect(db_path)
+    now = datetime.now().replace(microsecond=0)
+    day = now - timedelta(days=int(years * 365))
+    backlog_from = now - timedelta(days=backlog_days)
+    offline_from = now - timedelta(days=min(backlog_days, 2))
+    sessions = blinks = 0
+    cloud_id = 1
+    while day < now - timedelta(days=1):
+        # up to 4 sessions a day, sessions_per_day on average
+        for _ in range(sum(rng.random() < sessions_per_day / 4 for _ in range(4))):
+            start = day.replace(hour=rng.randint(8, 20), minute=rng.randint(0, 59))
+            minutes = max(5, int(rng.gauss(70, 35)))
+            end = start + timedelta(minutes=minutes)
+            # sessions went up when they started; their blinks waited for the connection
+            session_synced = 1 if end < offline_from else 0
+            synced = 1 if end < backlog_from else 0
+
+            # blink gaps are roughly exponential around the user's mean rate
+            stamps = []
+            t = start
+            while True:
+                t += timedelta(seconds=rng.expovariate(blinks_per_min / 60))
+                if t >= end:
+                    break
+                stamps.append(t.isoformat(timespec="microseconds"))
+
+            cur = conn.execute(
+                "INSERT INTO sessions (user_email, name, start_time, end_time, synced, cloud_session_id, deleted, "
+                "total_blinks, duration_seconds, mean_rate, peak_rate, longest_gap_seconds, last_blink_at) "
+                "VALUES (?, NULL, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?)",
+                (EMAIL, start.isoformat(), end.isoformat(), session_synced, cloud_id if session_synced else None,
+                 len(stamps), minutes * 60.0, round(len(stamps) / minutes, 3), 0, 0.0, stamps[-1] if stamps else None),
+            )
+            session_id = cur.lastrowid
+            cloud_id += 1
+            conn.executemany(
+                "INSERT INTO local_blinks (user_email, timestamp, count, session_id, synced) VALUES (?, ?, ?, ?, ?)",
+                [(EMAIL, ts, i + 1, session_id, synced) for i, ts in enumerate(stamps)],
+            )
+            sessions += 1
+            blinks += len(stamps)
+        day += timedelta(days=1)
+        if day.day == 1:
+            conn.commit()
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+    return {
+        "sessions": sessions,
+        "blinks": blinks,
+        "pending": list(local_db.get_pending_counts(EMAIL)),
+        "file_mb": round(db_path.stat().st_size / 1e6, 1),
+        "generate_seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+# ========== TIMING ==========
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _summarize(samples_ms: list[float], **extra) -> dict:
+    return {
+        "runs": len(samples_ms),
+        "mean_ms": round(sum(samples_ms) / len(samples_ms), 3) if samples_ms else 0.0,
+        "p50_ms": round(_percentile(samples_ms, 50), 3),
+        "p95_ms": round(_percentile(samples_ms, 95), 3),
+        "max_ms": round(max(samples_ms), 3) if samples_ms else 0.0,
+        **extra,
+    }
+
+
+def _time(fn, runs: int) -> list[float]:
+    out = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+# ========== HTTP STUB ==========
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Answers the endpoints SyncWorker calls, the way the backend would, without storing anything."""
+    protocol_version = "HTTP/1.1"
+    next_id = 10_000_000
+    lock = threading.Lock()
+    requests = 0
+
+    def _reply(self, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def do_POST(self):
+        data = self._body()
+        with _StubHandler.lock:
+            _StubHandler.requests += 1
+        if self.path == "/sync/sessions":
+            with _StubHandler.lock:
+                first = _StubHandler.next_id
+                _StubHandler.next_id += len(data)
+            self._reply({"status": "ok", "created": len(data), "ids": list(range(first, first + len(data)))})
+        elif self.path == "/sync/deletions":
+            self._reply({"status": "ok", "deleted": len(data), "ids": data})
+        else:
+            self._reply({"status": "ok", "received": len(data)})
+
+    def do_PATCH(self):
+        self._body()
+        self._reply({})
+
+    def do_GET(self):
+        self._reply({"version": 0, "more": False, "reset": False, "changes": []})
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_stub() -> tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# ========== BENCHMARKS ==========
+
+def run_benchmarks(runs: int, seed: int, drain_limit: int) -> dict:
+    from services import local_db
+    from services.auth_service import User
+    from threaded import sync_worker
+
+    rng = random.Random(seed)
+    results = {}
+    session_ids = [r[0] for r in sqlite3.connect(local_db.DB_PATH).execute("SELECT id FROM sessions")]
+
+    active = local_db.create_session(EMAIL, "bench")
+    ts = datetime.now()
+
+    def save_batch():
+        nonlocal ts
+        batch = []
+        for i in range(10):
+            ts += timedelta(seconds=4)
+            batch.append((ts.isoformat(), i))
+        local_db.save_blinks_batch(EMAIL, batch, active)
+
+    results["save_blinks_batch"] = _summarize(_time(save_batch, runs), rows_per_call=10)
+    local_db.end_session(active)
+
+    drained: list[int] = []
+
+    def unsynced_cycle():
+        rows = local_db.get_unsynced_blinks(EMAIL)
+        ids = [r[0] for r in rows]
+        local_db.mark_blinks_synced(ids)
+        drained.extend(ids)
+
+    results["unsynced_cycle"] = _summarize(_time(unsynced_cycle, min(runs, 50)), rows_per_call=500)
+    # put the backlog back so sync_drain sees all of it
+    conn = sqlite3.connect(local_db.DB_PATH)
+    for i in range(0, len(drained), 900):
+        chunk = drained[i:i + 900]
+        conn.execute(f"UPDATE local_blinks SET synced = 0 WHERE id IN ({','.join('?' for _ in chunk)})", chunk)
+    conn.commit()
+    conn.close()
+
+    results["get_blinks_for_session"] = _summarize(
+        _time(lambda: local_db.get_blinks_for_session(rng.choice(session_ids)), runs))
+    results["get_blink_minutes"] = _summarize(
+        _time(lambda: local_db.get_blink_minutes(rng.choice(session_ids)), runs))
+    results["get_all_sessions"] = _summarize(_time(lambda: local_db.get_all_sessions(EMAIL), max(5, runs // 10)))
+    results["sessions_page_first"] = _summarize(_time(lambda: local_db.get_sessions_page(EMAIL), runs))
+    oldest = local_db.get_sessions_page(EMAIL, limit=len(session_ids))[-50]
+    results["sessions_page_deep"] = _summarize(
+        _time(lambda: local_db.get_sessions_page(EMAIL, after=(oldest[2], oldest[0])), runs))
+    results["get_pending_counts"] = _summarize(_time(lambda: local_db.get_pending_counts(EMAIL), runs))
+
+    server, base_url = _start_stub()
+    sync_worker.API_BASE_URL = base_url
+    worker = sync_worker.SyncWorker(User(email=EMAIL, token="bench"))
+    pending_sessions, pending_blinks = local_db.get_pending_counts(EMAIL)
+    cycles = []
+    started = time.perf_counter()
+    try:
+        while sum(local_db.get_pending_counts(EMAIL)) and len(cycles) < drain_limit:
+            t0 = time.perf_counter()
+            worker._sync_sessions()
+            worker._sync_blinks()
+            cycles.append((time.perf_counter() - t0) * 1000)
+    finally:
+        server.shutdown()
+    elapsed = time.perf_counter() - started
+    results["sync_drain"] = _summarize(
+        cycles,
+        sessions=pending_sessions,
+        blinks=pending_blinks,
+        left=list(local_db.get_pending_counts(EMAIL)),
+        seconds=round(elapsed, 3),
+        blinks_per_sec=round(pending_blinks / elapsed, 1) if elapsed else 0.0,
+        http_requests=_StubHandler.requests,
+    )
+    return results
+
+
+# ========== REPORTING ==========
+
+def _git_commit() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain"], cwd=APP_DIR, capture_output=True, text=True).stdout.strip()
+        return f"{sha}-dirty" if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(result: dict) -> None:
+    d = result["dataset"]
+    print(f"commit {result['commit']}  {d['sessions']} sessions, {d['blinks']} blinks, "
+          f"{d['file_mb']} MB (generated in {d['generate_seconds']}s), pending {d['pending']}")
+    print(f"{'benchmark':<24}{'runs':>6}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, b in result["benchmarks"].items():
+        print(f"{name:<24}{b['runs']:>6}{b['mean_ms']:>10}{b['p50_ms']:>10}{b['p95_ms']:>10}{b['max_ms']:>10}")
+    drain = result["benchmarks"].get("sync_drain")
+    if drain:
+        print(f"sync drain: {drain['blinks']} blinks, {drain['sessions']} sessions in {drain['seconds']}s "
+              f"({drain['blinks_per_sec']} blinks/s, {drain['http_requests']} requests), left {drain['left']}")
+
+
+def compare(old_path: str, new_path: str) -> None:
+    old = json.loads(Path(old_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+    print(f"{old['commit']} -> {new['commit']}")
+    print(f"{'benchmark':<24}{'p50 ms':>22}{'p95 ms':>22}")
+
+    def delta(a, b):
+        if not a:
+            return f"{b:>10}"
+        return f"{b:>10} ({(b - a) / a * 100:+.0f}%)"
+
+    for name, n in new["benchmarks"].items():
+        o = old["benchmarks"].get(name)
+        if o is None:
+            print(f"{name:<24} (new)")
+            continue
+        print(f"{name:<24}{delta(o['p50_ms'], n['p50_ms']):>22}{delta(o['p95_ms'], n['p95_ms']):>22}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the desktop local_db layer on synthetic multi-year data.")
+    parser.add_argument("--years", type=float, default=3.0, help="years of history to generate")
+    parser.add_argument("--sessions-per-day", type=float, default=2.0, help="average sessions per day")
+    parser.add_argument("--blinks-per-min", type=float, default=15.0, help="average blink rate")
+    parser.add_argument("--backlog-days", type=int, default=14, help="most recent days left unsynced (offline backlog)")
+    parser.add_argument("--runs", type=int, default=200, help="timed calls per benchmark")
+    parser.add_argument("--drain-limit", type=int, default=100_000, help="max sync cycles for the drain")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--db", help="database file (default: temp file; an existing file is reused as is)")
+    parser.add_argument("--out", help="result file path (default: bench/results/local_db-<time>-<commit>.json)")
+    parser.add_argument("--json", action="store_true", help="also print the result json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    # local_db does timing through the metrics registry; keep that overhead in, as in the app
+    from services import local_db
+
+    db_path = Path(args.db) if args.db else Path(tempfile.mkdtemp(prefix="lumina-localdb-")) / "bench.db"
+    if db_path.exists():
+        local_db.DB_PATH = db_path
+        dataset = {
+            "sessions": sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM sessions").fetchone()[0],
+            "blinks": sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM local_blinks").fetchone()[0],
+            "pending": list(local_db.get_pending_counts(EMAIL)),
+            "file_mb": round(db_path.stat().st_size / 1e6, 1),
+            "generate_seconds": 0.0,
+        }
+    else:
+        dataset = generate(db_path, args.years, args.sessions_per_day, args.blinks_per_min, args.backlog_days, args.seed)
+
+    benchmarks = run_benchmarks(args.runs, args.seed, args.drain_limit)
+    commit = _git_commit()
+    result = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "config": {
+            "years": args.years,
+            "sessions_per_day": args.sessions_per_day,
+            "blinks_per_min": args.blinks_per_min,
+            "backlog_days": args.backlog_days,
+            "runs": args.runs,
+            "seed": args.seed,
+            "db": str(db_path),
+            "sqlite": sqlite3.sqlite_version,
+            "python": sys.version.split()[0],
+        },
+        "dataset": dataset,
+        "benchmarks": benchmarks,
+    }
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"local_db-{datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2))
+    print_report(result)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    print(f"\nresults written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Compares the tracker's inference backends (threaded/inference_backends.py) on
+the same footage: speed, CPU and blink accuracy.
+
+Every backend runs over the same frames. They are downscaled to the tracker's
+inference width and go through the same EAR state machine as EyeTrackerThread.
+Decoding is left out of the timings. For each backend the report has:
+
+  load_ms          time to load the model
+  p50/p95 ms       inference time per frame, including the EAR
+  fps              frames per second of inference time
+  cpu_ms           process CPU time per frame; more than the wall time means
+                   the model used several cores
+  faces            share of frames with a face
+  blinks           blinks detected
+  precision/recall/f1
+                   detected blinks against the annotated ones. A detection
+                   counts if it is within --tolerance seconds of one.
+
+Ground truth is a JSON file next to the video, either {"blinks": [frame, ...]}
+or a plain list of frame numbers. Each frame number is the one where the eye is
+closed or reopens. Without a ground-truth file, the first backend listed is
+used as the reference for the others. A camera index instead of a file records
+--seconds of video first, so the backends can be compared on the same hardware:
+
+    uv run python bench/tracker_bench.py clip.mp4 --truth clip.blinks.json
+    uv run python bench/tracker_bench.py 0 --seconds 60 --backends facemesh-lite,eyepatch
+    uv run python bench/tracker_bench.py --compare bench/results/A.json bench/results/B.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+sys.path.insert(0, str(APP_DIR / "src"))
+
+# same defaults as EyeTrackerThread
+EAR_THRESH = 0.21
+CONSEC_FRAMES = 2
+
+
+# ========== INPUT ==========
+
+def record(camera: int, seconds: float, path: Path) -> Path:
+    """Record `seconds` from a camera into an MJPG file, so every backend sees the same frames."""
+    import cv2
+
+    cap = cv2.VideoCapture(camera)
+    ok, frame = cap.read()
+    if not ok:
+        raise SystemExit(f"camera {camera} gave no frames")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    h, w = frame.shape[:2]
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (w, h))
+    print(f"recording {seconds:g}s from camera {camera} ({w}x{h} @ {fps:g} fps)...")
+    end = time.monotonic() + seconds
+    while ok and time.monotonic() < end:
+        writer.write(frame)
+        ok, frame = cap.read()
+    writer.release()
+    cap.release()
+    return path
+
+
+def frames(video: Path, width: int, limit: int):
+    """RGB frames of the video, downscaled the way the tracker does it."""
+    import cv2
+
+    cap = cv2.VideoCapture(str(video))
+    small = rgb = None
+    n = 0
+    try:
+        while not limit or n < limit:
+            ok, frame = cap.read()
+            if not ok:
+                return
+            h, w = frame.shape[:2]
+            src = frame
+            if width and w > width:
+                small = cv2.resize(frame, (width, round(h * width / w)), dst=small, interpolation=cv2.INTER_AREA)
+                src = small
+            rgb = cv2.cvtColor(src, cv2.COLOR_BGR2RGB, dst=rgb if rgb is not None and rgb.shape == src.shape else None)
+            n += 1
+            yield rgb
+    finally:
+        cap.release()
+
+
+def video_fps(video: Path) -> float:
+    import cv2
+
+    cap = cv2.VideoCapture(str(video))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    return fps
+
+
+def load_truth(path: Path) -> list[int]:
+    data = json.loads(path.read_text())
+    return sorted(int(f) for f in (data["blinks"] if isinstance(data, dict) else data))
+
+
+# ========== BENCHMARK ==========
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_backend(name: str, video: Path, width: int, limit: int) -> dict:
+    """Run one backend over the video. Returns its timings and the frames it saw blinks on."""
+    from threaded.inference_backends import create_backend
+
+    backend, load_seconds = create_backend(name)
+    timings, blink_frames = [], []
+    n = with_face = closed = 0
+    cpu = wall = 0.0
+    try:
+        for i, rgb in enumerate(frames(video, width, limit)):
+            c0, t0 = time.process_time(), time.perf_counter()
+            faces = backend.process(rgb)
+            elapsed = time.perf_counter() - t0
+            cpu += time.process_time() - c0
+            wall += elapsed
+            timings.append(elapsed * 1000)
+            n += 1
+            if not faces:
+                continue
+            with_face += 1
+            # the tracker's state machine: a blink is counted when the eye reopens
+            if faces[0].ear < EAR_THRESH:
+                closed += 1
+            else:
+                if closed >= CONSEC_FRAMES:
+                    blink_frames.append(i)
+                closed = 0
+    finally:
+        backend.close()
+    return {
+        "load_ms": round(load_seconds * 1000, 1),
+        "frames": n,
+        "mean_ms": round(sum(timings) / n, 2) if n else 0.0,
+        "p50_ms": round(_percentile(timings, 50), 2),
+        "p95_ms": round(_percentile(timings, 95), 2),
+        "fps": round(n / wall, 1) if wall else 0.0,
+        "cpu_ms": round(cpu * 1000 / n, 2) if n else 0.0,
+        "faces": round(with_face / n, 3) if n else 0.0,
+        "blinks": len(blink_frames),
+        "blink_frames": blink_frames,
+    }
+
+
+def score(detected: list[int], truth: list[int], tolerance: int) -> dict:
+    """Precision/recall/F1 of detected blink frames, each matched to at most one true blink."""
+    unmatched = list(truth)
+    hits = 0
+    for frame in detected:
+        best = min(unmatched, key=lambda t: abs(t - frame), default=None)
+        if best is not None and abs(best - frame) <= tolerance:
+            unmatched.remove(best)
+            hits += 1
+    precision = hits / len(detected) if detected else 0.0
+    recall = hits / len(truth) if truth else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": round(precision, 3), "recall": round(recall, 3), "f1": round(f1, 3)}
+
+
+# ========== REPORTING ==========
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(result: dict) -> None:
+    c = result["config"]
+    print(f"commit {result['commit']}  {c['video']}  {c['frames']} frames @ {c['fps']:g} fps, width {c['width']}, "
+          f"accuracy vs {c['reference']}")
+    print(f"{'backend':<16}{'load ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'fps':>8}{'cpu ms':>9}{'faces':>7}"
+          f"{'blinks':>8}{'prec':>7}{'recall':>8}{'f1':>7}")
+    for name, b in result["backends"].items():
+        print(f"{name:<16}{b['load_ms']:>9}{b['p50_ms']:>9}{b['p95_ms']:>9}{b['fps']:>8}{b['cpu_ms']:>9}"
+              f"{b['faces']:>7}{b['blinks']:>8}{b['precision']:>7}{b['recall']:>8}{b['f1']:>7}")
+
+
+def compare(old_path: str, new_path: str) -> None:
+    old = json.loads(Path(old_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+    print(f"{old['commit']} -> {new['commit']}")
+    print(f"{'backend':<16}{'p95 ms':>22}{'fps':>22}{'f1':>16}")
+
+    def delta(a, b):
+        if not a:
+            return f"{b:>10}"
+        return f"{b:>10} ({(b - a) / a * 100:+.0f}%)"
+
+    for name, n in new["backends"].items():
+        o = old["backends"].get(name)
+        if o is None:
+            print(f"{name:<16} (new)")
+            continue
+        print(f"{name:<16}{delta(o['p95_ms'], n['p95_ms']):>22}{delta(o['fps'], n['fps']):>22}"
+              f"{o['f1']:>8} -> {n['f1']:<5}")
+
+
+def main():
+    from threaded.inference_backends import BACKENDS
+    from threaded.tracker import INFERENCE_WIDTH
+
+    parser = argparse.ArgumentParser(description="Compare tracker inference backends on the same video.")
+    parser.add_argument("video", nargs="?", help="video file, or a camera index to record from")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help=f"comma-separated, from: {', '.join(BACKENDS)}")
+    parser.add_argument("--truth", help='ground truth json: {"blinks": [frame, ...]} or a list of frames')
+    parser.add_argument("--tolerance", type=float, default=0.3, help="seconds a detection may be off a true blink")
+    parser.add_argument("--width", type=int, default=INFERENCE_WIDTH, help="inference width (0: full frames)")
+    parser.add_argument("--frames", type=int, default=0, help="stop after this many frames (0: whole video)")
+    parser.add_argument("--seconds", type=float, default=30.0, help="recording length when video is a camera index")
+    parser.add_argument("--out", help="result file path (default: bench/results/tracker-<time>-<commit>.json)")
+    parser.add_argument("--json", action="store_true", help="also print the result json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if not args.video:
+        parser.error("a video file or camera index is required")
+
+    names = [n.strip() for n in args.backends.split(",") if n.strip()]
+    unknown = [n for n in names if n not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown backends: {', '.join(unknown)}")
+
+    if args.video.isdigit():
+        video = record(int(args.video), args.seconds, Path(tempfile.mkdtemp(prefix="lumina-tracker-")) / "recording.avi")
+    else:
+        video = Path(args.video)
+        if not video.exists():
+            parser.error(f"no such video: {video}")
+    fps = video_fps(video)
+    # imported up front so load_ms is the model alone, whichever backend runs first
+    import mediapipe.python.solutions.face_detection  # noqa: F401
+    import mediapipe.python.solutions.face_mesh  # noqa: F401
+
+    backends = {}
+    for name in names:
+        print(f"running {name}...")
+        backends[name] = run_backend(name, video, args.width, args.frames)
+
+    if args.truth:
+        truth, reference = load_truth(Path(args.truth)), "truth"
+    else:
+        truth, reference = backends[names[0]]["blink_frames"], names[0]
+    tolerance = max(1, round(args.tolerance * fps))
+    for b in backends.values():
+        b.update(score(b["blink_frames"], truth, tolerance))
+
+    commit = _git_commit()
+    result = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "config": {
+            "video": str(video),
+            "frames": max(b["frames"] for b in backends.values()),
+            "fps": round(fps, 2),
+            "width": args.width,
+            "reference": reference,
+            "true_blinks": len(truth),
+            "tolerance_frames": tolerance,
+            "ear_thresh": EAR_THRESH,
+            "consec_frames": CONSEC_FRAMES,
+            "python": sys.version.split()[0],
+        },
+        "backends": backends,
+    }
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"tracker-{datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2))
+    print_report(result)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    print(f"\nresults written to {out}")
+
+
+if __name__ == "__main__":
+    main()
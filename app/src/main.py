@@ -1,43 +1,42 @@
+import multiprocessing
+import os
 import sys
-from PyQt6.QtWidgets import QApplication, QMainWindow
-from services.auth_service import AuthService, User
-from windows.login_window import LoginWidget
-from windows.dashboard_widget import DashboardWidget
-
-class AppWindow(QMainWindow):
-    """
-    this is a single top-level window that behaves like an "spa":
-    - shows LoginWidget if no valid session.
-    - switches centralWidget to DashboardWidget after login.
-    """
-
-    def __init__(self):
-        super().__init__()
-
-        self.setWindowTitle("Lumina Wellness")
-        self.setFixedSize(350, 500)
-        self.setStyleSheet("background-color: #0F0F0F; color: #FFFFFF;")
-
-        self.auth_service = AuthService()
-
-        # yaha the initial view is decided based on stored session
-        user = self.auth_service.load_session()
-        if user and user.token:
-            self.show_dashboard(user)
-        else:
-            self.show_login()
-
-    def show_login(self):
-        login_widget = LoginWidget(self.auth_service)
-        login_widget.authenticated.connect(self.show_dashboard)
-        self.setCentralWidget(login_widget)
-
-    def show_dashboard(self, user: User):
-        dashboard = DashboardWidget(user=user)
-        self.setCentralWidget(dashboard)
+import time
+
+# taken before anything heavy is imported so startup profiling sees the whole cost
+_PROCESS_START = time.perf_counter()
+
+
+def main() -> int:
+    # Qt and the window tree are imported here, not at module level: spawned tracker
+    # and inference workers re-import this file as __mp_main__ and must stay light
+    from services import startup_profile
+    startup_profile.init(_PROCESS_START)
+
+    from PyQt6.QtCore import QTimer
+    from PyQt6.QtWidgets import QApplication
+    from services.sampling_profiler import profiler
+    from services.instrumentation import install_gc_monitor
+    from windows.app_window import AppWindow
+
+    # LUMINA_SAMPLING_PROFILER=1 profiles from launch; otherwise toggle it in the diagnostics panel
+    if os.getenv("LUMINA_SAMPLING_PROFILER") == "1":
+        profiler.start()
+    install_gc_monitor()
 
-if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = AppWindow()
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    if startup_profile.enabled():
+        # fires on the first event-loop pass, i.e. once the window has been painted
+        def _first_window():
+            startup_profile.mark("time to first window")
+            startup_profile.report()
+        QTimer.singleShot(0, _first_window)
+    return app.exec()
+
+
+if __name__ == "__main__":
+    # the multi-camera tracker runs inference in spawned worker processes
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Rolling blink rate for the running session, and low-rate break reminders.
+
+The dashboard feeds BlinkRate one add() per blink signal from the tracker;
+nothing runs per frame and nothing is read back from the database. Blinks go
+into a ring of per-second buckets covering the longest window (15 minutes),
+with a running sum per window. Moving forward one second subtracts the bucket
+that falls out of each window and clears the slot for reuse, so add() and
+rates() are O(1) however many blinks a session has (a long idle gap costs at
+most one pass over the ring).
+
+A window younger than its length (start of a session) is divided by the time
+it actually covers, and reports None until MIN_COVERAGE_SECONDS have passed,
+so the first blink does not read as 60 blinks/min.
+
+BreakReminder watches the 5-minute rate. People blink roughly 15-20 times a
+minute at rest and often under 10 while staring at a screen. Below
+LOW_BLINK_RATE it asks for a break, at most once per REMINDER_COOLDOWN_SECONDS.
+"""
+import os
+import time
+from typing import Callable, Optional
+
+from services.instrumentation import metrics
+
+# window lengths in seconds, shortest first
+WINDOWS = (60, 300, 900)
+MIN_COVERAGE_SECONDS = 30
+
+# set LUMINA_BREAK_REMINDERS=0 to only show the rate
+BREAK_REMINDERS = os.getenv("LUMINA_BREAK_REMINDERS", "1") != "0"
+LOW_BLINK_RATE = float(os.getenv("LUMINA_LOW_BLINK_RATE", "10"))  # blinks/min over 5 minutes
+REMINDER_WINDOW = 300
+REMINDER_COOLDOWN_SECONDS = 20 * 60
+
+
+class BlinkRate:
+    def __init__(self, windows: tuple[int, ...] = WINDOWS, clock: Callable[[], float] = time.monotonic):
+        self.windows = windows
+        self.clock = clock
+        self.size = max(windows)
+        self._buckets = [0] * self.size
+        self._sums = [0] * len(windows)
+        self._second: Optional[int] = None  # the second the newest bucket holds
+        self._started: Optional[int] = None
+        self.total = 0
+
+    def reset(self) -> None:
+        """Forget everything, e.g. when a session ends."""
+        self._buckets = [0] * self.size
+        self._sums = [0] * len(self.windows)
+        self._second = self._started = None
+        self.total = 0
+
+    def start(self) -> None:
+        """Start counting coverage from now (session start), without any blinks yet."""
+        self.reset()
+        self._advance(int(self.clock()))
+
+    def _advance(self, second: int) -> None:
+        if self._second is None:
+            self._second = self._started = second
+            return
+        if second <= self._second:
+            return
+        if second - self._second >= self.size:
+            # idle for longer than the longest window: nothing in the ring is still in range
+            self._buckets = [0] * self.size
+            self._sums = [0] * len(self.windows)
+            self._second = second
+            return
+        buckets, sums, size = self._buckets, self._sums, self.size
+        for s in range(self._second + 1, second + 1):
+            for i, window in enumerate(self.windows):
+                sums[i] -= buckets[(s - window) % size]
+            # the longest window's leaving bucket is this slot, already subtracted
+            buckets[s % size] = 0
+        self._second = second
+
+    def add(self, blinks: int = 1) -> None:
+        second = int(self.clock())
+        self._advance(second)
+        self._buckets[second % self.size] += blinks
+        for i in range(len(self._sums)):
+            self._sums[i] += blinks
+        self.total += blinks
+
+    def rates(self) -> dict[int, Optional[float]]:
+        """Blinks per minute over each window, keyed by window length in seconds."""
+        if self._second is None:
+            return {window: None for window in self.windows}
+        now = int(self.clock())
+        self._advance(now)
+        covered = now - self._started + 1
+        out = {}
+        for window, count in zip(self.windows, self._sums):
+            span = min(window, covered)
+            out[window] = round(count * 60 / span, 1) if span >= MIN_COVERAGE_SECONDS else None
+        return out
+
+    def covered_seconds(self) -> int:
+        if self._started is None:
+            return 0
+        return int(self.clock()) - self._started + 1
+
+
+class BreakReminder:
+    """Decides when a low blink rate is worth a reminder."""
+
+    def __init__(
+        self,
+        threshold: float = LOW_BLINK_RATE,
+        window: int = REMINDER_WINDOW,
+        cooldown: float = REMINDER_COOLDOWN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.clock = clock
+        self.last_reminded: Optional[float] = None
+        self.reminders = 0
+
+    def reset(self) -> None:
+        self.last_reminded = None
+
+    def check(self, rate: BlinkRate, rates: dict[int, Optional[float]]) -> Optional[str]:
+        """A reminder message when one is due, else None. Needs a full window of data."""
+        value = rates.get(self.window)
+        if value is None or value >= self.threshold or rate.covered_seconds() < self.window:
+            return None
+        now = self.clock()
+        if self.last_reminded is not None and now - self.last_reminded < self.cooldown:
+            return None
+        self.last_reminded = now
+        self.reminders += 1
+        metrics.counter("blink_rate.reminders").inc()
+        message = f"{value:g} blinks/min over the last {self.window // 60} min: look away and blink for 20 seconds"
+        metrics.event("reminder", message, rate=value, threshold=self.threshold)
+        return message
+
+
+def format_rates(rates: dict[int, Optional[float]]) -> str:
+    parts = []
+    for window, value in rates.items():
+        parts.append(f"{window // 60}m {'--' if value is None else f'{value:.1f}'}")
+    return "BLINKS/MIN  " + " · ".join(parts)
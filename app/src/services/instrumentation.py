@@ -0,0 +1,272 @@
+"""
+Lightweight in-process metrics: counters, gauges and fixed-bucket histograms.
+
+Everything records into the module-level `metrics` registry. Recording a value is a
+bisect plus a few integer updates under a per-metric lock, cheap enough for the
+tracker's per-frame loop. The debug panel reads `metrics.snapshot()` and can export
+it to a JSON file users attach to bug reports.
+"""
+import functools
+import gc
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence
+
+# upper bounds; the last bucket is open-ended
+LATENCY_MS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+RATE_BUCKETS = (10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+ENABLED = os.getenv("LUMINA_METRICS", "1") != "0"
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, n: int = 1) -> None:
+        with self._lock:
+            self.value += n
+
+
+class Gauge:
+    def __init__(self):
+        self.value: Optional[float] = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Histogram:
+    def __init__(self, bounds: Sequence[float] = LATENCY_MS_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        idx = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def observe_since(self, started: float) -> None:
+        """Record milliseconds elapsed since a time.perf_counter() reading."""
+        self.observe((time.perf_counter() - started) * 1000)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Bucket upper bound at quantile q (an over-estimate by at most one bucket), capped at max."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                if idx < len(self.bounds) and self.max is not None:
+                    return min(self.bounds[idx], self.max)
+                return self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "count": self.count,
+                "mean": round(self.total / self.count, 4) if self.count else None,
+                "min": self.min,
+                "max": self.max,
+                "p50": self.quantile(0.5),
+                "p95": self.quantile(0.95),
+                "p99": self.quantile(0.99),
+                "buckets": {
+                    (str(b) if i < len(self.bounds) else "+inf"): n
+                    for i, (b, n) in enumerate(zip(list(self.bounds) + [None], self.counts))
+                    if n
+                },
+            }
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Timer:
+    __slots__ = ("hist", "started")
+
+    def __init__(self, hist: Histogram):
+        self.hist = hist
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe_since(self.started)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Counter] = {}
+        self._gauges: Dict[str, Gauge] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._providers: Dict[str, Callable[[], dict]] = {}
+        self.events: deque = deque(maxlen=200)
+        self.started_at = datetime.now()
+
+    def counter(self, name: str) -> Counter:
+        c = self._counters.get(name)
+        if c is None:
+            with self._lock:
+                c = self._counters.setdefault(name, Counter())
+        return c
+
+    def gauge(self, name: str) -> Gauge:
+        g = self._gauges.get(name)
+        if g is None:
+            with self._lock:
+                g = self._gauges.setdefault(name, Gauge())
+        return g
+
+    def histogram(self, name: str, bounds: Sequence[float] = LATENCY_MS_BUCKETS) -> Histogram:
+        h = self._histograms.get(name)
+        if h is None:
+            with self._lock:
+                h = self._histograms.setdefault(name, Histogram(bounds))
+        return h
+
+    def timer(self, name: str):
+        """Context manager recording elapsed milliseconds into histogram `name`."""
+        if not ENABLED:
+            return _NullTimer()
+        return _Timer(self.histogram(name))
+
+    def event(self, kind: str, message: str, **fields) -> None:
+        """Append a timestamped event (e.g. a throttling decision) to the bounded event log."""
+        self.events.append({"time": datetime.now().isoformat(timespec="seconds"), "kind": kind, "message": message, **fields})
+
+    def register_provider(self, name: str, provider: Callable[[], dict]) -> None:
+        """Include provider() output (e.g. tracker.stats) in every snapshot."""
+        with self._lock:
+            self._providers[name] = provider
+
+    def unregister_provider(self, name: str) -> None:
+        with self._lock:
+            self._providers.pop(name, None)
+
+    def snapshot(self) -> dict:
+        flush_gc_events()
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = dict(self._histograms)
+            providers = dict(self._providers)
+
+        extra = {}
+        for name, provider in providers.items():
+            try:
+                extra[name] = provider()
+            except Exception as e:
+                extra[name] = {"error": str(e)}
+
+        return {
+            "taken_at": datetime.now().isoformat(timespec="seconds"),
+            "since": self.started_at.isoformat(timespec="seconds"),
+            "counters": {k: c.value for k, c in sorted(counters.items())},
+            "gauges": {k: g.value for k, g in sorted(gauges.items())},
+            "histograms": {k: h.snapshot() for k, h in sorted(histograms.items())},
+            "providers": extra,
+            "events": list(self.events),
+        }
+
+    def export(self, path: Optional[Path] = None, extra: Optional[dict] = None) -> Path:
+        """Write a snapshot (plus optional extra sections) to a JSON file and return its path."""
+        if path is None:
+            path = Path.home() / f"lumina_metrics_{datetime.now():%Y%m%d_%H%M%S}.json"
+        data = self.snapshot()
+        if extra:
+            data.update(extra)
+        path.write_text(json.dumps(data, indent=2, default=str))
+        return path
+
+
+metrics = Registry()
+
+
+_gc_started: list[float] = []
+# (generation, pause ms, objects collected) per finished collection, waiting to be
+# folded into the metrics by flush_gc_events(). Bounded so a process nobody reads
+# metrics from can't grow it; the oldest collections are dropped first.
+_gc_pending: deque = deque(maxlen=4096)
+
+
+def _gc_callback(phase: str, info: dict) -> None:
+    # A collection can start inside any allocation, including while this thread holds
+    # a metric or registry lock (e.g. building a snapshot). Those locks aren't
+    # reentrant, so the callback must not touch metrics: it only appends to plain
+    # containers, and flush_gc_events() records the results later.
+    if phase == "start":
+        _gc_started.append(time.perf_counter())
+    elif _gc_started:
+        pause_ms = (time.perf_counter() - _gc_started.pop()) * 1000
+        _gc_pending.append((info["generation"], pause_ms, info.get("collected", 0)))
+
+
+def flush_gc_events() -> None:
+    """Record collections seen by the GC monitor into gc.pause_ms and the gc.* counters."""
+    while _gc_pending:
+        try:
+            generation, pause_ms, collected = _gc_pending.popleft()
+        except IndexError:
+            return
+        metrics.histogram("gc.pause_ms").observe(pause_ms)
+        metrics.counter(f"gc.collections.gen{generation}").inc()
+        if collected:
+            metrics.counter("gc.collected_objects").inc(collected)
+
+
+def install_gc_monitor() -> None:
+    """
+    Record every garbage collection's pause time (gc.pause_ms) and generation counts.
+    They reach the metrics on the next snapshot() or flush_gc_events() call.
+    """
+    if ENABLED and _gc_callback not in gc.callbacks:
+        gc.callbacks.append(_gc_callback)
+
+
+def timed(name: str):
+    """Decorator recording each call's duration (ms) into histogram `name`."""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        hist = metrics.histogram(name)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe_since(started)
+        return wrapper
+    return decorator
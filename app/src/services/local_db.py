@@ -2,13 +2,39 @@ from typing import Optional
 import sqlite3
 from datetime import datetime
 from pathlib import Path
-from typing import List, Tuple
+from typing import Callable, Iterable, List, Tuple
+from services.instrumentation import metrics, timed
 
 DB_PATH = Path.home() / "waw_local.db"
 
+# per-session summary, kept up to date as blinks are saved so list views read one row per session
+SUMMARY_COLUMNS = (
+    ("total_blinks", "INTEGER NOT NULL DEFAULT 0"),
+    ("duration_seconds", "REAL"),
+    ("mean_rate", "REAL"),  # blinks/min
+    ("peak_rate", "INTEGER NOT NULL DEFAULT 0"),  # most blinks in one clock minute
+    ("longest_gap_seconds", "REAL NOT NULL DEFAULT 0"),
+    # running state for the incremental update
+    ("last_blink_at", "TEXT"),
+    ("cur_minute", "TEXT"),
+    ("cur_minute_blinks", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+_schema_ready: set = set()
+
 def _get_conn() -> sqlite3.Connection:
     conn = sqlite3.connect(DB_PATH)
+    # the CREATE/ALTER checks only need to run once per database file per process
+    if DB_PATH not in _schema_ready:
+        _ensure_schema(conn)
+        _schema_ready.add(DB_PATH)
+    return conn
+
 
+def _ensure_schema(conn: sqlite3.Connection) -> None:
+    # only takes effect on a brand new file; older databases are converted by
+    # enable_incremental_vacuum when the app is idle
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS sessions (
@@ -41,9 +67,131 @@ def _get_conn() -> sqlite3.Connection:
         conn.execute("ALTER TABLE local_blinks ADD COLUMN session_id INTEGER")
     except sqlite3.OperationalError:
         pass  # Column already exists
-    
-    return conn
 
+    # sessions pulled down from the change feed (recorded on another device)
+    try:
+        conn.execute("ALTER TABLE sessions ADD COLUMN remote INTEGER NOT NULL DEFAULT 0")
+    except sqlite3.OperationalError:
+        pass
+
+    # blink counts per bucket, for sessions whose raw blinks aren't stored here
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS blink_rollups (
+            session_id INTEGER NOT NULL,
+            bucket_start TEXT NOT NULL,
+            bucket_seconds INTEGER NOT NULL,
+            blinks INTEGER NOT NULL,
+            PRIMARY KEY (session_id, bucket_start)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sync_state (
+            user_email TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            PRIMARY KEY (user_email, key)
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS ix_sessions_cloud_id ON sessions (cloud_session_id)"
+    )
+
+    added = False
+    for name, decl in SUMMARY_COLUMNS:
+        try:
+            conn.execute(f"ALTER TABLE sessions ADD COLUMN {name} {decl}")
+            added = True
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+    if added:
+        _backfill_summaries(conn)
+
+    # keyset paging for the history list and per-session blink reads
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS ix_sessions_user_start "
+        "ON sessions (user_email, deleted, start_time, id)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS ix_local_blinks_session_ts "
+        "ON local_blinks (session_id, timestamp)"
+    )
+    # partial: only the unsynced tail is indexed, for the sync drain and pending counts
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS ix_local_blinks_unsynced "
+        "ON local_blinks (user_email, id) WHERE synced = 0"
+    )
+    conn.commit()
+
+
+def _parse_ts(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def _fold_blinks(state: dict, timestamps: List[str]) -> None:
+    """Fold blink timestamps (in time order) into a session's running summary."""
+    for ts in timestamps:
+        prev = state["last_blink_at"] or state["start_time"]
+        gap = (_parse_ts(ts) - _parse_ts(prev)).total_seconds()
+        state["longest_gap_seconds"] = max(state["longest_gap_seconds"], gap)
+        state["last_blink_at"] = ts
+        state["total_blinks"] += 1
+        minute = ts[:16]  # YYYY-MM-DDTHH:MM
+        if minute == state["cur_minute"]:
+            state["cur_minute_blinks"] += 1
+        else:
+            state["cur_minute"] = minute
+            state["cur_minute_blinks"] = 1
+        state["peak_rate"] = max(state["peak_rate"], state["cur_minute_blinks"])
+
+
+def _finish_summary(state: dict, end_time: str) -> None:
+    """Duration, mean rate and the trailing gap, as of end_time."""
+    duration = max(0.0, (_parse_ts(end_time) - _parse_ts(state["start_time"])).total_seconds())
+    state["duration_seconds"] = duration
+    state["mean_rate"] = round(state["total_blinks"] / (duration / 60), 3) if duration > 0 else None
+    tail = (_parse_ts(end_time) - _parse_ts(state["last_blink_at"] or state["start_time"])).total_seconds()
+    state["longest_gap_seconds"] = max(state["longest_gap_seconds"], tail)
+
+
+_STATE_FIELDS = ("start_time", "end_time") + tuple(name for name, _ in SUMMARY_COLUMNS)
+
+
+def _load_state(conn: sqlite3.Connection, session_id: int) -> Optional[dict]:
+    row = conn.execute(
+        f"SELECT {', '.join(_STATE_FIELDS)} FROM sessions WHERE id = ?", (session_id,)
+    ).fetchone()
+    return dict(zip(_STATE_FIELDS, row)) if row else None
+
+
+def _store_state(conn: sqlite3.Connection, session_id: int, state: dict) -> None:
+    names = [name for name, _ in SUMMARY_COLUMNS]
+    conn.execute(
+        f"UPDATE sessions SET {', '.join(f'{n} = ?' for n in names)} WHERE id = ?",
+        [state[n] for n in names] + [session_id],
+    )
+
+
+def _backfill_summaries(conn: sqlite3.Connection) -> None:
+    """Compute summaries for sessions recorded before the summary columns existed."""
+    ids = [r[0] for r in conn.execute("SELECT id FROM sessions")]
+    for session_id in ids:
+        state = _load_state(conn, session_id)
+        if state is None:
+            continue
+        stamps = [r[0] for r in conn.execute(
+            "SELECT timestamp FROM local_blinks WHERE session_id = ? ORDER BY timestamp ASC", (session_id,)
+        )]
+        _fold_blinks(state, stamps)
+        if state["end_time"]:
+            _finish_summary(state, state["end_time"])
+        _store_state(conn, session_id, state)
+
+
+@timed("local_db.create_session")
 def create_session(user_email: str, name: Optional[str] = None) -> int | None:
     """Create a new tracking session. Returns session_id."""
     conn = _get_conn()
@@ -60,26 +208,37 @@ def create_session(user_email: str, name: Optional[str] = None) -> int | None:
     return session_id if session_id else None
 
 
+@timed("local_db.end_session")
 def end_session(session_id: int) -> None:
-    """End a session by setting end_time."""
+    """
+    End a session by setting end_time and finalizing its summary. A session that
+    was already synced is flagged for sync again so the end reaches the cloud.
+    """
     conn = _get_conn()
     cur = conn.cursor()
     end_time = datetime.now().isoformat()
     cur.execute(
-        "UPDATE sessions SET end_time = ? WHERE id = ?",
+        "UPDATE sessions SET end_time = ?, "
+        "synced = CASE WHEN cloud_session_id IS NOT NULL THEN 0 ELSE synced END "
+        "WHERE id = ?",
         (end_time, session_id)
     )
+    state = _load_state(conn, session_id)
+    if state is not None:
+        _finish_summary(state, end_time)
+        _store_state(conn, session_id, state)
     conn.commit()
     conn.close()
 
 
+@timed("local_db.get_active_session")
 def get_active_session(user_email: str) -> Optional[int]:
     """Get the active session_id for a user, or None if no active session."""
     conn = _get_conn()
     cur = conn.cursor()
     cur.execute(
         "SELECT id FROM sessions "
-        "WHERE user_email = ? AND end_time IS NULL AND deleted = 0 "
+        "WHERE user_email = ? AND end_time IS NULL AND deleted = 0 AND remote = 0 "
         "ORDER BY start_time DESC LIMIT 1",
         (user_email,)
     )
@@ -88,6 +247,7 @@ def get_active_session(user_email: str) -> Optional[int]:
     return row[0] if row else None
 
 
+@timed("local_db.get_all_sessions")
 def get_all_sessions(user_email: str) -> List[Tuple[int, Optional[str], str, Optional[str], int]]:
     """Get all sessions for a user. Returns list of (id, name, start_time, end_time, synced)."""
     conn = _get_conn()
@@ -103,6 +263,69 @@ def get_all_sessions(user_email: str) -> List[Tuple[int, Optional[str], str, Opt
     return rows
 
 
+SESSION_PAGE_COLUMNS = (
+    "id, name, start_time, end_time, "
+    "total_blinks, duration_seconds, mean_rate, peak_rate, longest_gap_seconds"
+)
+
+
+@timed("local_db.get_sessions_page")
+def get_sessions_page(
+    user_email: str,
+    after: Optional[Tuple[str, int]] = None,
+    limit: int = 50,
+) -> List[tuple]:
+    """
+    One page of sessions, newest first. Pass the (start_time, id) of the last row of
+    the previous page as `after` to get the next one. This is a keyset seek on
+    ix_sessions_user_start, so every page costs the same however deep the user scrolls.
+    Returns (id, name, start_time, end_time, total_blinks, duration_seconds,
+    mean_rate, peak_rate, longest_gap_seconds) tuples.
+    """
+    conn = _get_conn()
+    cur = conn.cursor()
+    if after is None:
+        cur.execute(
+            f"SELECT {SESSION_PAGE_COLUMNS} FROM sessions "
+            "WHERE user_email = ? AND deleted = 0 "
+            "ORDER BY start_time DESC, id DESC LIMIT ?",
+            (user_email, limit),
+        )
+    else:
+        cur.execute(
+            f"SELECT {SESSION_PAGE_COLUMNS} FROM sessions "
+            "WHERE user_email = ? AND deleted = 0 AND (start_time, id) < (?, ?) "
+            "ORDER BY start_time DESC, id DESC LIMIT ?",
+            (user_email, after[0], after[1], limit),
+        )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+@timed("local_db.get_blink_minutes")
+def get_blink_minutes(session_id: int) -> List[Tuple[str, int]]:
+    """
+    Blinks per minute for a session. Returns list of (YYYY-MM-DDTHH:MM, blinks).
+    Rolled-up blinks are included; an hourly rollup shows up as its first minute.
+    """
+    conn = _get_conn()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT minute, SUM(n) FROM ("
+        "  SELECT substr(timestamp, 1, 16) AS minute, COUNT(*) AS n FROM local_blinks "
+        "  WHERE session_id = ? GROUP BY minute "
+        "  UNION ALL "
+        "  SELECT substr(bucket_start, 1, 16), blinks FROM blink_rollups WHERE session_id = ?"
+        ") GROUP BY minute ORDER BY minute",
+        (session_id, session_id)
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+@timed("local_db.get_session")
 def get_session(session_id: int) -> Optional[Tuple[str, Optional[str], str, Optional[str], int]]:
     """Get a single session. Returns (user_email, name, start_time, end_time, synced) or None."""
     conn = _get_conn()
@@ -117,6 +340,23 @@ def get_session(session_id: int) -> Optional[Tuple[str, Optional[str], str, Opti
     return row if row else None
 
 
+@timed("local_db.get_session_summary")
+def get_session_summary(session_id: int) -> Optional[dict]:
+    """
+    Summary of one session: total_blinks, duration_seconds, mean_rate, peak_rate and
+    longest_gap_seconds. For an active session these are as of now.
+    """
+    conn = _get_conn()
+    state = _load_state(conn, session_id)
+    conn.close()
+    if state is None:
+        return None
+    if not state["end_time"]:
+        _finish_summary(state, datetime.now().isoformat())
+    return {k: state[k] for k in ("total_blinks", "duration_seconds", "mean_rate", "peak_rate", "longest_gap_seconds")}
+
+
+@timed("local_db.update_session_name")
 def update_session_name(session_id: int, name: Optional[str]) -> None:
     """Update the name of a session."""
     conn = _get_conn()
@@ -129,8 +369,12 @@ def update_session_name(session_id: int, name: Optional[str]) -> None:
     conn.close()
 
 
+@timed("local_db.delete_session")
 def delete_session(session_id: int) -> None:
-    """Mark a session as deleted (soft delete)."""
+    """
+    Mark a session as deleted (soft delete). The row stays as a tombstone until
+    SyncWorker has told the backend, then purge_sessions removes it with its blinks.
+    """
     conn = _get_conn()
     cur = conn.cursor()
     cur.execute(
@@ -141,12 +385,18 @@ def delete_session(session_id: int) -> None:
     conn.close()
 
 
-def get_unsynced_sessions(user_email: str, limit: int = 50) -> List[Tuple[int, str, Optional[str], str, Optional[str]]]:
-    """Get unsynced sessions. Returns list of (id, user_email, name, start_time, end_time)."""
+@timed("local_db.get_unsynced_sessions")
+def get_unsynced_sessions(user_email: str, limit: int = 50) -> List[tuple]:
+    """
+    Get unsynced sessions. Returns list of (id, user_email, name, start_time, end_time,
+    cloud_session_id, total_blinks, duration_seconds, mean_rate, peak_rate, longest_gap_seconds).
+    cloud_session_id is set for sessions already in the cloud that need updating.
+    """
     conn = _get_conn()
     cur = conn.cursor()
     cur.execute(
-        "SELECT id, user_email, name, start_time, end_time FROM sessions "
+        "SELECT id, user_email, name, start_time, end_time, cloud_session_id, "
+        "total_blinks, duration_seconds, mean_rate, peak_rate, longest_gap_seconds FROM sessions "
         "WHERE user_email = ? AND synced = 0 AND deleted = 0 "
         "ORDER BY id ASC LIMIT ?",
         (user_email, limit)
@@ -156,6 +406,16 @@ def get_unsynced_sessions(user_email: str, limit: int = 50) -> List[Tuple[int, s
     return rows
 
 
+@timed("local_db.get_cloud_session_id")
+def get_cloud_session_id(session_id: int) -> Optional[int]:
+    """Backend id of a local session, or None if it hasn't been synced yet."""
+    conn = _get_conn()
+    row = conn.execute("SELECT cloud_session_id FROM sessions WHERE id = ?", (session_id,)).fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+@timed("local_db.mark_session_synced")
 def mark_session_synced(session_id: int, cloud_session_id: Optional[int] = None) -> None:
     """Mark a session as synced, optionally storing cloud_session_id."""
     conn = _get_conn()
@@ -176,13 +436,18 @@ def mark_session_synced(session_id: int, cloud_session_id: Optional[int] = None)
 
 # ========== BLINK MANAGEMENT ==========
 
+@timed("local_db.save_blink_locally")
 def save_blink_locally(user_email: str, count: int, session_id: Optional[int] = None) -> None:
     """Legacy single-blink insert. Prefer save_blinks_batch for better performance."""
     save_blinks_batch(user_email, [(None, count)], session_id)
 
 
+@timed("local_db.save_blinks_batch")
 def save_blinks_batch(user_email: str, samples: List[Tuple[str | None, int]], session_id: Optional[int] = None) -> None:
-    """Save blink samples. If session_id is None, tries to get active session."""
+    """
+    Save blink samples. If session_id is None, tries to get active session.
+    The session's summary columns are updated in the same transaction.
+    """
     if not samples:
         return
     
@@ -205,18 +470,37 @@ def save_blinks_batch(user_email: str, samples: List[Tuple[str | None, int]], se
         "VALUES (?, ?, ?, ?, ?)",
         data,
     )
-    
+
+    if session_id is not None:
+        state = _load_state(conn, session_id)
+        if state is not None:
+            _fold_blinks(state, sorted(row[1] for row in data))
+            # while active, duration and mean rate run up to the newest blink
+            if not state["end_time"]:
+                _finish_summary(state, state["last_blink_at"] or state["start_time"])
+            else:
+                _finish_summary(state, state["end_time"])
+            _store_state(conn, session_id, state)
+
     conn.commit()
     conn.close()
 
 
+@timed("local_db.get_unsynced_blinks")
 def get_unsynced_blinks(user_email: str, limit: int = 500) -> List[Tuple[int, str, int, Optional[int]]]:
-    """Get unsynced blinks. Returns list of (id, timestamp, count, session_id)."""
+    """
+    Get unsynced blinks. Returns list of (id, timestamp, count, cloud_session_id).
+    Blinks whose session hasn't been synced yet are held back until it has a cloud id,
+    and blinks of deleted sessions are never sent.
+    """
     conn = _get_conn()
     cur = conn.cursor()
     cur.execute(
-        "SELECT id, timestamp, count, session_id FROM local_blinks "
-        "WHERE user_email = ? AND synced = 0 ORDER BY id ASC LIMIT ?",
+        "SELECT b.id, b.timestamp, b.count, s.cloud_session_id FROM local_blinks b "
+        "LEFT JOIN sessions s ON s.id = b.session_id "
+        "WHERE b.user_email = ? AND b.synced = 0 "
+        "AND (b.session_id IS NULL OR (s.cloud_session_id IS NOT NULL AND s.deleted = 0)) "
+        "ORDER BY b.id ASC LIMIT ?",
         (user_email, limit),
     )
     rows = cur.fetchall()
@@ -224,8 +508,29 @@ def get_unsynced_blinks(user_email: str, limit: int = 500) -> List[Tuple[int, st
     return rows
 
 
+@timed("local_db.get_pending_counts")
+def get_pending_counts(user_email: str) -> Tuple[int, int]:
+    """Rows waiting to be synced. Returns (sessions, blinks)."""
+    conn = _get_conn()
+    cur = conn.cursor()
+    sessions = cur.execute(
+        "SELECT COUNT(*) FROM sessions WHERE user_email = ? AND synced = 0 AND deleted = 0",
+        (user_email,)
+    ).fetchone()[0]
+    blinks = cur.execute(
+        "SELECT COUNT(*) FROM local_blinks WHERE user_email = ? AND synced = 0",
+        (user_email,)
+    ).fetchone()[0]
+    conn.close()
+    return sessions, blinks
+
+
+@timed("local_db.get_blinks_for_session")
 def get_blinks_for_session(session_id: int) -> List[Tuple[str, int]]:
-    """Get all blinks for a session. Returns list of (timestamp, count)."""
+    """
+    Get all raw blinks for a session. Returns list of (timestamp, count). Sessions
+    folded by retention have none left; get_blink_minutes still covers them.
+    """
     conn = _get_conn()
     cur = conn.cursor()
     cur.execute(
@@ -238,6 +543,7 @@ def get_blinks_for_session(session_id: int) -> List[Tuple[str, int]]:
     return rows
 
 
+@timed("local_db.mark_blinks_synced")
 def mark_blinks_synced(ids: list[int]) -> None:
     """Mark blinks as synced."""
     if not ids:
@@ -249,4 +555,316 @@ def mark_blinks_synced(ids: list[int]) -> None:
         ids,
     )
     conn.commit()
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+# ========== DELETIONS ==========
+
+@timed("local_db.get_deleted_sessions")
+def get_deleted_sessions(user_email: str, limit: int = 200) -> List[Tuple[int, Optional[int]]]:
+    """Session tombstones waiting to be sent. Returns list of (id, cloud_session_id)."""
+    conn = _get_conn()
+    rows = conn.execute(
+        "SELECT id, cloud_session_id FROM sessions WHERE user_email = ? AND deleted = 1 "
+        "ORDER BY id ASC LIMIT ?",
+        (user_email, limit),
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+@timed("local_db.purge_sessions")
+def purge_sessions(session_ids: List[int]) -> None:
+    """Hard-delete sessions with their blinks and rollups, once the backend has acknowledged them."""
+    if not session_ids:
+        return
+    marks = ",".join("?" for _ in session_ids)
+    conn = _get_conn()
+    with conn:
+        conn.execute(f"DELETE FROM blink_rollups WHERE session_id IN ({marks})", session_ids)
+        conn.execute(f"DELETE FROM local_blinks WHERE session_id IN ({marks})", session_ids)
+        conn.execute(f"DELETE FROM sessions WHERE id IN ({marks})", session_ids)
+    conn.close()
+
+
+# ========== CHANGE FEED ==========
+
+@timed("local_db.get_sync_state")
+def get_sync_state(user_email: str, key: str) -> Optional[str]:
+    conn = _get_conn()
+    row = conn.execute(
+        "SELECT value FROM sync_state WHERE user_email = ? AND key = ?", (user_email, key)
+    ).fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+@timed("local_db.reset_changes")
+def reset_changes(user_email: str, live_cloud_ids: Iterable[int]) -> int:
+    """
+    Forget everything pulled from the change feed (remote sessions and the cursor),
+    for when the backend says the cursor is too old to continue from. Sessions
+    recorded here that were synced but are no longer among live_cloud_ids were
+    deleted elsewhere after their tombstone was purged, so the re-pull would never
+    remove them; they are deleted now. Returns the number of those.
+    """
+    live = set(live_cloud_ids)
+    conn = _get_conn()
+    with conn:
+        conn.execute(
+            "DELETE FROM blink_rollups WHERE session_id IN "
+            "(SELECT id FROM sessions WHERE user_email = ? AND remote = 1)",
+            (user_email,),
+        )
+        conn.execute("DELETE FROM sessions WHERE user_email = ? AND remote = 1", (user_email,))
+        gone = [
+            session_id for session_id, cloud_id in conn.execute(
+                "SELECT id, cloud_session_id FROM sessions "
+                "WHERE user_email = ? AND cloud_session_id IS NOT NULL",
+                (user_email,),
+            ).fetchall()
+            if cloud_id not in live
+        ]
+        for session_id in gone:
+            _delete_local_session(conn, session_id)
+        conn.execute(
+            "DELETE FROM sync_state WHERE user_email = ? AND key = 'changes_version'", (user_email,)
+        )
+    conn.close()
+    return len(gone)
+
+
+def _delete_local_session(conn: sqlite3.Connection, session_id: int) -> None:
+    conn.execute("DELETE FROM blink_rollups WHERE session_id = ?", (session_id,))
+    conn.execute("DELETE FROM local_blinks WHERE session_id = ?", (session_id,))
+    conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+
+_FEED_SUMMARY = ("total_blinks", "duration_seconds", "mean_rate", "peak_rate", "longest_gap_seconds")
+
+
+@timed("local_db.apply_changes")
+def apply_changes(user_email: str, changes: List[dict], version: int) -> int:
+    """
+    Apply one page of the backend change feed and advance the stored cursor, all in
+    one transaction: either the whole page lands or none of it does, so a crash
+    mid-page just means the page is fetched again. Returns the number of sessions
+    touched.
+
+    Sessions recorded on this device keep their local summary and raw blinks; only
+    a rename from elsewhere is taken, and only if the session has no local changes
+    waiting to be pushed. Sessions from other devices are stored with remote = 1
+    and their blink rollups replace whatever was stored for them before.
+    """
+    conn = _get_conn()
+    touched = 0
+    try:
+        with conn:
+            for change in changes:
+                cloud_id = change["session_id"]
+                row = conn.execute(
+                    "SELECT id, remote, synced FROM sessions WHERE cloud_session_id = ? AND user_email = ?",
+                    (cloud_id, user_email),
+                ).fetchone()
+
+                if change["op"] == "delete":
+                    if row is not None:
+                        _delete_local_session(conn, row[0])
+                        touched += 1
+                    continue
+
+                session = change["session"]
+                if row is not None and not row[1]:
+                    if row[2]:
+                        conn.execute("UPDATE sessions SET name = ? WHERE id = ?", (session["name"], row[0]))
+                    touched += 1
+                    continue
+
+                summary = [session.get(k) for k in _FEED_SUMMARY]
+                summary[0] = summary[0] or 0
+                summary[3] = summary[3] or 0
+                summary[4] = summary[4] or 0
+                if row is None:
+                    cur = conn.execute(
+                        "INSERT INTO sessions (user_email, name, start_time, end_time, synced, "
+                        f"cloud_session_id, deleted, remote, {', '.join(_FEED_SUMMARY)}) "
+                        "VALUES (?, ?, ?, ?, 1, ?, 0, 1, ?, ?, ?, ?, ?)",
+                        (user_email, session["name"], session["start_time"], session["end_time"], cloud_id, *summary),
+                    )
+                    session_id = cur.lastrowid
+                else:
+                    session_id = row[0]
+                    conn.execute(
+                        "UPDATE sessions SET name = ?, start_time = ?, end_time = ?, "
+                        f"{', '.join(f'{k} = ?' for k in _FEED_SUMMARY)} WHERE id = ?",
+                        (session["name"], session["start_time"], session["end_time"], *summary, session_id),
+                    )
+                    conn.execute("DELETE FROM blink_rollups WHERE session_id = ?", (session_id,))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO blink_rollups (session_id, bucket_start, bucket_seconds, blinks) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(session_id, r["bucket_start"], r["bucket_seconds"], r["blinks"]) for r in change["rollups"]],
+                )
+                touched += 1
+
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state (user_email, key, value) VALUES (?, 'changes_version', ?)",
+                (user_email, str(version)),
+            )
+    finally:
+        conn.close()
+    return touched
+
+
+# ========== RETENTION ==========
+
+@timed("local_db.fold_old_blinks")
+def fold_old_blinks(
+    before: str,
+    max_sessions: int = 20,
+    archive: Optional[Callable[[List[tuple]], None]] = None,
+) -> int:
+    """
+    Fold the raw blinks of sessions that ended before `before` into per-minute
+    rollups, oldest sessions first and at most max_sessions per call. Only sessions
+    whose blinks have all been synced are folded. Each session is folded in its own
+    transaction, and its summary columns are untouched, so history and charts read
+    the same before and after.
+
+    `archive`, if given, receives the raw (session_id, cloud_session_id, timestamp,
+    count) rows of each session once its rollups are written and its blinks deleted,
+    as the last step before the commit, so a failed fold never leaves rows in the
+    archive. If it raises, that session's transaction is rolled back, the error is
+    counted in retention.archive_errors, and no more sessions are folded this call:
+    folding without a working archive would lose the raw rows. Returns the number
+    of raw rows removed.
+    """
+    conn = _get_conn()
+    ids = [r[0] for r in conn.execute(
+        "SELECT s.id FROM sessions s WHERE s.remote = 0 AND s.deleted = 0 "
+        "AND s.end_time IS NOT NULL AND s.end_time < ? "
+        "AND EXISTS (SELECT 1 FROM local_blinks b WHERE b.session_id = s.id) "
+        "AND NOT EXISTS (SELECT 1 FROM local_blinks b WHERE b.session_id = s.id AND b.synced = 0) "
+        "ORDER BY s.end_time ASC LIMIT ?",
+        (before, max_sessions),
+    )]
+    removed = 0
+    try:
+        for session_id in ids:
+            rows = None
+            archiving = False
+            try:
+                with conn:
+                    if archive is not None:
+                        rows = conn.execute(
+                            "SELECT b.session_id, s.cloud_session_id, b.timestamp, b.count FROM local_blinks b "
+                            "JOIN sessions s ON s.id = b.session_id WHERE b.session_id = ? ORDER BY b.timestamp",
+                            (session_id,),
+                        ).fetchall()
+                    conn.execute(
+                        "INSERT INTO blink_rollups (session_id, bucket_start, bucket_seconds, blinks) "
+                        "SELECT session_id, substr(timestamp, 1, 16) || ':00', 60, COUNT(*) FROM local_blinks "
+                        "WHERE session_id = ? GROUP BY substr(timestamp, 1, 16) "
+                        "ON CONFLICT (session_id, bucket_start) DO UPDATE SET blinks = blinks + excluded.blinks",
+                        (session_id,),
+                    )
+                    deleted = conn.execute("DELETE FROM local_blinks WHERE session_id = ?", (session_id,)).rowcount
+                    if rows is not None:
+                        archiving = True
+                        archive(rows)  # type: ignore[misc]
+            except Exception:
+                if not archiving:
+                    raise
+                metrics.counter("retention.archive_errors").inc()
+                break
+            removed += deleted
+    finally:
+        conn.close()
+    return removed
+
+
+@timed("local_db.purge_deleted_data")
+def purge_deleted_data(before: str, archive: Optional[Callable[[List[tuple]], None]] = None) -> int:
+    """
+    Drop data nobody can see any more: blinks and rollups of deleted sessions (the
+    session row itself stays as a tombstone until the backend acknowledges it),
+    deleted sessions that never reached the cloud, and synced blinks older than
+    `before` that belong to no session. Orphan blinks go to `archive` just before
+    their delete commits, and are kept if it raises (counted in retention.archive_errors). Returns the
+    number of rows removed.
+    """
+    conn = _get_conn()
+    removed = 0
+    try:
+        archiving = False
+        try:
+            with conn:
+                orphans = None
+                if archive is not None:
+                    orphans = conn.execute(
+                        "SELECT NULL, NULL, timestamp, count FROM local_blinks "
+                        "WHERE session_id IS NULL AND synced = 1 AND timestamp < ?",
+                        (before,),
+                    ).fetchall()
+                deleted = conn.execute(
+                    "DELETE FROM local_blinks WHERE session_id IS NULL AND synced = 1 AND timestamp < ?", (before,)
+                ).rowcount
+                if orphans:
+                    # last step before the commit, as in fold_old_blinks
+                    archiving = True
+                    archive(orphans)  # type: ignore[misc]
+            removed += deleted
+        except Exception:
+            if not archiving:
+                raise
+            # the orphans stay until the archive works again; the rest needs no archive
+            metrics.counter("retention.archive_errors").inc()
+
+        with conn:
+            removed += conn.execute(
+                "DELETE FROM local_blinks WHERE session_id IN (SELECT id FROM sessions WHERE deleted = 1)"
+            ).rowcount
+            removed += conn.execute(
+                "DELETE FROM blink_rollups WHERE session_id IN (SELECT id FROM sessions WHERE deleted = 1)"
+            ).rowcount
+            removed += conn.execute(
+                "DELETE FROM sessions WHERE deleted = 1 AND cloud_session_id IS NULL"
+            ).rowcount
+    finally:
+        conn.close()
+    return removed
+
+
+@timed("local_db.enable_incremental_vacuum")
+def enable_incremental_vacuum() -> bool:
+    """
+    Switch a database created before auto_vacuum was set to INCREMENTAL. That needs
+    one full VACUUM, which rewrites the file and locks it while it runs, so call it
+    only while nothing is being recorded. Returns True if a conversion ran.
+    """
+    conn = _get_conn()
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
+
+
+@timed("local_db.incremental_vacuum")
+def incremental_vacuum(max_pages: int = 200) -> Tuple[int, int]:
+    """
+    Return up to max_pages free pages to the filesystem. Each call holds the write
+    lock only briefly. Returns (pages freed, free pages left).
+    """
+    conn = _get_conn()
+    try:
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if before:
+            # execute() steps this pragma only once (one page); executescript runs it to completion
+            conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+        after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        conn.close()
+    return before - after, after
@@ -0,0 +1,83 @@
+"""
+Retention for the local database.
+
+Raw blinks are only needed until they are synced and the session is old enough
+that nobody is likely to zoom in on it. After LOCAL_RETENTION_DAYS they are
+folded into per-minute rollups (and optionally appended to a gzip JSON-lines
+archive first), data of deleted sessions is dropped, and the freed pages are
+handed back to the filesystem a few at a time with incremental vacuum.
+
+run_step() does a bounded amount of each and is meant to be called from a
+background thread (SyncWorker) between sync cycles, so no single step holds the
+write lock long enough for the GUI's blink writes to notice.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+from services import local_db
+from services.instrumentation import metrics
+
+# raw blinks of sessions that ended longer ago than this are folded; 0 keeps them forever
+LOCAL_RETENTION_DAYS = int(os.getenv("LUMINA_LOCAL_RETENTION_DAYS", "30"))
+# directory for blinks-YYYYMM.jsonl.gz archives of folded raw blinks; unset means no archive
+LOCAL_ARCHIVE_DIR = os.getenv("LUMINA_LOCAL_ARCHIVE_DIR", "")
+# sessions folded and pages vacuumed per step
+FOLD_SESSIONS_PER_STEP = int(os.getenv("LUMINA_LOCAL_FOLD_SESSIONS", "20"))
+VACUUM_PAGES_PER_STEP = int(os.getenv("LUMINA_LOCAL_VACUUM_PAGES", "256"))
+
+
+class BlinkArchive:
+    """Appends raw blink rows to monthly gzip JSON-lines files (one gzip member per batch)."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    def __call__(self, rows: List[tuple]) -> None:
+        if not rows:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        by_month: dict[str, list[str]] = {}
+        for session_id, cloud_session_id, ts, count in rows:
+            by_month.setdefault(ts[:7].replace("-", ""), []).append(json.dumps({
+                "session_id": session_id,
+                "cloud_session_id": cloud_session_id,
+                "timestamp": ts,
+                "count": count,
+            }))
+        for month, lines in by_month.items():
+            with gzip.open(self.directory / f"blinks-{month}.jsonl.gz", "at", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        metrics.counter("retention.archived_rows").inc(len(rows))
+
+
+def _archive() -> Optional[BlinkArchive]:
+    return BlinkArchive(Path(LOCAL_ARCHIVE_DIR).expanduser()) if LOCAL_ARCHIVE_DIR else None
+
+
+def run_step(idle: bool, now: Optional[datetime] = None) -> dict:
+    """
+    One bounded round of retention work. `idle` says no session is being recorded;
+    only then is the one-off conversion to incremental auto_vacuum attempted, since
+    it rewrites the whole file. Returns what was done, for logging.
+    """
+    started = time.perf_counter()
+    done = {"folded": 0, "purged": 0, "vacuumed_pages": 0, "free_pages": 0, "converted": False}
+    if LOCAL_RETENTION_DAYS > 0:
+        cutoff = ((now or datetime.now()) - timedelta(days=LOCAL_RETENTION_DAYS)).isoformat()
+        archive = _archive()
+        done["folded"] = local_db.fold_old_blinks(cutoff, FOLD_SESSIONS_PER_STEP, archive)
+        done["purged"] = local_db.purge_deleted_data(cutoff, archive)
+    if idle:
+        done["converted"] = local_db.enable_incremental_vacuum()
+    done["vacuumed_pages"], done["free_pages"] = local_db.incremental_vacuum(VACUUM_PAGES_PER_STEP)
+
+    metrics.counter("retention.folded_rows").inc(done["folded"])
+    metrics.counter("retention.purged_rows").inc(done["purged"])
+    metrics.counter("retention.vacuumed_pages").inc(done["vacuumed_pages"])
+    metrics.gauge("retention.free_pages").set(done["free_pages"])
+    metrics.histogram("retention.step_ms").observe_since(started)
+    return done
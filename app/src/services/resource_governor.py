@@ -0,0 +1,206 @@
+"""
+Power- and load-aware throttling.
+
+The dashboard feeds the governor a reading every few seconds. It looks at
+battery state, CPU used by other programs (system load minus Lumina's own
+processes) and CPU temperature, where psutil can read it. From these it picks
+one of three levels:
+
+  full     camera rate, the tracker's own inference width, sync every interval
+  saver    15 fps, 480 px wide, sync 3x less often, local vacuum deferred
+  minimal  10 fps, 320 px wide, sync 10x less often, local vacuum deferred
+
+A worse reading switches level immediately. Going back up waits until
+conditions have allowed it for RELAX_AFTER_SECONDS, so a short lull in a
+compile job does not flap the camera rate. Each switch is logged with
+metrics.event and shows up in the debug panel (Ctrl+Shift+D).
+
+Blink detection copes with the lower frame rates because the trackers scale
+their closed-frame count to the cap (inference_backends.consec_frames_for).
+"""
+import os
+import time
+from typing import Callable, NamedTuple, Optional
+
+import psutil
+
+from services.instrumentation import metrics
+
+# set LUMINA_GOVERNOR=0 to always run at full fidelity
+GOVERNOR = os.getenv("LUMINA_GOVERNOR", "1") != "0"
+
+BATTERY_LOW_PERCENT = 20
+# percent of all cores used by other programs, smoothed
+CPU_BUSY_PERCENT = 70
+CPU_SATURATED_PERCENT = 90
+CPU_SMOOTHING = 0.3
+# degrees C of the hottest CPU sensor; a sensor's own "high" mark counts as hot
+TEMP_WARM = 80
+TEMP_HOT = 90
+RELAX_AFTER_SECONDS = 60
+
+
+class Level(NamedTuple):
+    name: str
+    max_fps: float  # 0: camera rate
+    max_width: int  # 0: the tracker's own inference width
+    sync_interval_factor: float
+    maintenance: bool  # local retention (fold, incremental vacuum) allowed
+
+
+LEVELS = (
+    Level("full", 0, 0, 1.0, True),
+    Level("saver", 15, 480, 3.0, False),
+    Level("minimal", 10, 320, 10.0, False),
+)
+
+
+class Readings(NamedTuple):
+    on_battery: Optional[bool]  # None: no battery
+    battery_percent: Optional[float]
+    system_cpu: float
+    other_cpu: float  # smoothed system CPU not used by Lumina
+    temperature: Optional[float]
+    temperature_high: Optional[float]
+
+
+class ResourceGovernor:
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.level_index = 0
+        self.reason = "start"
+        self.readings: Optional[Readings] = None
+        self.changes = 0
+        self._process = psutil.Process()
+        self._children: dict[int, psutil.Process] = {}
+        self._other_cpu: Optional[float] = None
+        self._relax_since: Optional[float] = None
+        self._process.cpu_percent()  # primes the per-process counter
+
+    @property
+    def level(self) -> Level:
+        return LEVELS[self.level_index]
+
+    def _own_cpu(self) -> float:
+        """CPU percent (of one core) used by this process and its children, e.g. the inference worker."""
+        total = self._process.cpu_percent()
+        try:
+            children = self._process.children(recursive=True)
+        except psutil.Error:
+            children = []
+        seen = {}
+        for child in children:
+            # cpu_percent() is measured since the previous call on the same object
+            proc = self._children.get(child.pid, child)
+            try:
+                total += proc.cpu_percent()
+            except psutil.Error:
+                continue
+            seen[child.pid] = proc
+        self._children = seen
+        return total
+
+    def read(self, system_cpu: float) -> Readings:
+        """
+        Take a reading. system_cpu is psutil.cpu_percent() from the caller: it is
+        measured since the previous call anywhere in the process, so two pollers
+        would each see part of the window.
+        """
+        other = max(0.0, system_cpu - self._own_cpu() / (psutil.cpu_count() or 1))
+        if self._other_cpu is None:
+            self._other_cpu = other
+        else:
+            self._other_cpu += CPU_SMOOTHING * (other - self._other_cpu)
+
+        on_battery = percent = None
+        battery = psutil.sensors_battery() if hasattr(psutil, "sensors_battery") else None
+        if battery is not None:
+            on_battery, percent = not battery.power_plugged, battery.percent
+
+        temperature = high = None
+        try:
+            sensors = psutil.sensors_temperatures() if hasattr(psutil, "sensors_temperatures") else {}
+        except (OSError, RuntimeError):
+            sensors = {}
+        for name in ("coretemp", "k10temp", "zenpower", "cpu_thermal", "cpu-thermal", "acpitz"):
+            for entry in sensors.get(name, ()):
+                if entry.current and (temperature is None or entry.current > temperature):
+                    temperature, high = entry.current, entry.high
+            if temperature is not None:
+                break
+
+        return Readings(on_battery, percent, system_cpu, round(self._other_cpu, 1), temperature, high)
+
+    @staticmethod
+    def target(r: Readings) -> tuple[int, str]:
+        """The level the readings call for, and why."""
+        wanted = [(0, "resources available")]
+        if r.on_battery:
+            if r.battery_percent is not None and r.battery_percent <= BATTERY_LOW_PERCENT:
+                wanted.append((2, f"battery low ({r.battery_percent:.0f}%)"))
+            else:
+                wanted.append((1, "on battery"))
+        if r.other_cpu >= CPU_SATURATED_PERCENT:
+            wanted.append((2, f"cpu saturated by other work ({r.other_cpu:.0f}%)"))
+        elif r.other_cpu >= CPU_BUSY_PERCENT:
+            wanted.append((1, f"cpu busy with other work ({r.other_cpu:.0f}%)"))
+        if r.temperature is not None:
+            if r.temperature >= min(TEMP_HOT, r.temperature_high or TEMP_HOT):
+                wanted.append((2, f"cpu hot ({r.temperature:.0f}°C)"))
+            elif r.temperature >= TEMP_WARM:
+                wanted.append((1, f"cpu warm ({r.temperature:.0f}°C)"))
+        index = max(i for i, _ in wanted)
+        return index, ", ".join(reason for i, reason in wanted if i == index)
+
+    def update(self, system_cpu: float) -> Optional[Level]:
+        """Take a reading and decide. Returns the new level when it changed, else None."""
+        r = self.readings = self.read(system_cpu)
+        metrics.gauge("governor.other_cpu_percent").set(r.other_cpu)
+        if r.battery_percent is not None:
+            metrics.gauge("governor.battery_percent").set(r.battery_percent)
+        if r.temperature is not None:
+            metrics.gauge("governor.temperature_c").set(r.temperature)
+
+        index, reason = self.target(r)
+        now = self.clock()
+        if index >= self.level_index:
+            self._relax_since = None
+            if index == self.level_index:
+                return None
+        else:
+            if self._relax_since is None:
+                self._relax_since = now
+            if now - self._relax_since < RELAX_AFTER_SECONDS:
+                return None
+            self._relax_since = None
+        return self._switch(index, reason)
+
+    def _switch(self, index: int, reason: str) -> Level:
+        old = self.level
+        self.level_index, self.reason = index, reason
+        self.changes += 1
+        new = self.level
+        metrics.gauge("governor.level").set(index)
+        metrics.counter("governor.changes").inc()
+        metrics.event(
+            "governor",
+            f"{old.name} -> {new.name}: {reason}",
+            level=new.name,
+            max_fps=new.max_fps,
+            max_width=new.max_width,
+            sync_interval_factor=new.sync_interval_factor,
+            maintenance=new.maintenance,
+        )
+        return new
+
+    def stats(self) -> dict:
+        r = self.readings
+        return {
+            "level": self.level.name,
+            "reason": self.reason,
+            "changes": self.changes,
+            "other_cpu_percent": r.other_cpu if r else None,
+            "on_battery": r.on_battery if r else None,
+            "battery_percent": r.battery_percent if r else None,
+            "temperature_c": r.temperature if r else None,
+        }
@@ -0,0 +1,87 @@
+"""
+Statistical sampling profiler that can be switched on and off at runtime.
+
+A daemon thread snapshots every other thread's stack via sys._current_frames()
+at a fixed interval and counts identical stacks. Nothing is hooked into the
+profiled code, so the cost is bounded by the sampling rate and it can be left
+running on a slow user machine while they reproduce a problem. Output is in the
+collapsed-stack format understood by flamegraph.pl / speedscope.
+"""
+import sys
+import threading
+from collections import Counter
+from typing import Optional
+
+
+class SamplingProfiler:
+    def __init__(self, interval_seconds: float = 0.01, max_depth: int = 64):
+        self.interval = interval_seconds
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="lumina-sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            if len(names) != len(frames):
+                names = {t.ident: t.name for t in threading.enumerate()}
+            collected = []
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                depth = 0
+                while frame is not None and depth < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                    depth += 1
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                collected.append(";".join(reversed(stack)))
+            del frames
+            with self._lock:
+                self._stacks.update(collected)
+                self.samples += 1
+
+    def collapsed(self) -> str:
+        """Stacks in collapsed format: `thread;outer;...;inner <count>` per line."""
+        with self._lock:
+            return "\n".join(f"{stack} {n}" for stack, n in self._stacks.most_common())
+
+    def top_functions(self, n: int = 15) -> list[tuple[str, int]]:
+        """Leaf frames that appeared most often (where threads were actually spending time)."""
+        leaves: Counter = Counter()
+        with self._lock:
+            for stack, count in self._stacks.items():
+                leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(n)
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,80 @@
+"""
+Startup measurement mode.
+
+Enabled with `--profile-startup` or LUMINA_PROFILE_STARTUP=1. Records the inclusive
+import time of every top-level import (per thread, so background preloads are
+counted separately from the GUI thread), named marks such as time-to-first-window,
+and prints a report to stderr. Disabled, everything here is a no-op.
+"""
+import builtins
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+_enabled = "--profile-startup" in sys.argv or os.getenv("LUMINA_PROFILE_STARTUP") == "1"
+_process_start = time.perf_counter()
+_marks: dict[str, float] = {}
+_import_costs: dict[str, float] = defaultdict(float)
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def init(process_start: float) -> None:
+    """Call first thing in main with a perf_counter() taken before any other import."""
+    global _process_start
+    _process_start = process_start
+    if _enabled:
+        _install_import_timer()
+
+
+def _install_import_timer() -> None:
+    original_import = builtins.__import__
+
+    def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and name in sys.modules:
+            return original_import(name, globals, locals, fromlist, level)
+
+        depth = getattr(_local, "depth", 0)
+        _local.depth = depth + 1
+        started = time.perf_counter()
+        try:
+            return original_import(name, globals, locals, fromlist, level)
+        finally:
+            _local.depth = depth
+            if depth == 0:
+                elapsed = time.perf_counter() - started
+                with _lock:
+                    _import_costs[name] += elapsed
+
+    builtins.__import__ = timed_import
+
+
+def mark(name: str) -> None:
+    """Record the time since process start under `name`."""
+    if not _enabled:
+        return
+    with _lock:
+        _marks.setdefault(name, time.perf_counter() - _process_start)
+
+
+def report(title: str = "startup profile") -> None:
+    if not _enabled:
+        return
+    with _lock:
+        marks = sorted(_marks.items(), key=lambda kv: kv[1])
+        imports = sorted(_import_costs.items(), key=lambda kv: kv[1], reverse=True)
+
+    lines = [f"[lumina] {title}"]
+    for name, seconds in marks:
+        lines.append(f"  {name:<42}{seconds * 1000:>10.1f} ms")
+    lines.append("  import cost (inclusive, top-level imports):")
+    for name, seconds in imports:
+        if seconds * 1000 >= 1.0:
+            lines.append(f"    {name:<40}{seconds * 1000:>10.1f} ms")
+    print("\n".join(lines), file=sys.stderr)
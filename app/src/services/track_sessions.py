@@ -0,0 +1,56 @@
+from datetime import datetime
+from services import local_db
+
+
+class TrackSessionRouter:
+    """
+    Routes per-track blink streams from MultiTrackerThread to separate local_db
+    sessions. Each confirmed track gets its own session, named after its camera
+    and track id. Blinks are buffered per track and written with
+    save_blinks_batch, like the dashboard's single-session buffer. The session
+    is ended when the track is lost.
+    """
+
+    def __init__(self, user_email: str):
+        self.user_email = user_email
+        self.sessions: dict[str, int] = {}
+        self.counts: dict[str, int] = {}
+        self._pending: dict[str, list[tuple[str | None, int]]] = {}
+
+    def start(self, key: str, label: str) -> int | None:
+        session_id = local_db.create_session(self.user_email, name=label)
+        if session_id:
+            self.sessions[key] = session_id
+            self.counts[key] = 0
+            self._pending[key] = []
+        return session_id
+
+    def add_blink(self, key: str, count: int) -> None:
+        if key not in self.sessions:
+            return
+        self.counts[key] = count
+        self._pending[key].append((datetime.now().isoformat(), count))
+
+    def flush(self, key: str | None = None) -> None:
+        keys = [key] if key is not None else list(self._pending)
+        for k in keys:
+            samples = self._pending.get(k)
+            if samples:
+                local_db.save_blinks_batch(self.user_email, samples, self.sessions[k])
+                samples.clear()
+
+    def end(self, key: str) -> None:
+        if key not in self.sessions:
+            return
+        self.flush(key)
+        local_db.end_session(self.sessions.pop(key))
+        self.counts.pop(key, None)
+        self._pending.pop(key, None)
+
+    def end_all(self) -> None:
+        for key in list(self.sessions):
+            self.end(key)
+
+    @property
+    def total_blinks(self) -> int:
+        return sum(self.counts.values())
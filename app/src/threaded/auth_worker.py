@@ -0,0 +1,152 @@
+import time
+from typing import Callable, Optional
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from services.auth_service import AuthService, AuthError, User
+from services import local_db
+from services.instrumentation import metrics
+
+
+class _TaskSignals(QObject):
+    # QRunnable isn't a QObject, so each task carries one of these to signal back
+    finished = pyqtSignal(int, object)  # ticket, result
+    failed = pyqtSignal(int, str, bool)  # ticket, message, unexpected
+
+
+class _Task(QRunnable):
+    def __init__(self, ticket: int, fn: Callable[[], object]):
+        super().__init__()
+        self.ticket = ticket
+        self.fn = fn
+        self.signals = _TaskSignals()
+
+    def run(self):
+        try:
+            result = self.fn()
+        except AuthError as e:
+            self.signals.failed.emit(self.ticket, str(e), False)
+        except Exception as e:
+            self.signals.failed.emit(self.ticket, str(e), True)
+        else:
+            self.signals.finished.emit(self.ticket, result)
+
+
+def prefetch_dashboard(email: str) -> dict:
+    """Local data the dashboard needs on its first paint, read while login is in flight."""
+    return {
+        "email": email,
+        "active_session_id": local_db.get_active_session(email),
+        "pending": local_db.get_pending_counts(email),
+    }
+
+
+class AuthWorker(QObject):
+    """
+    Runs AuthService calls on a small thread pool so the GUI never blocks on the
+    network. Results come back as signals on the GUI thread.
+
+    A request identical to one already in flight (same operation, email and
+    password, plus consent for signup) is not sent twice. A different request for
+    the same operation, e.g. another email or a retyped password, supersedes the
+    old one.
+    cancel() drops everything in flight. requests can't abort a blocking call, so
+    a cancelled call runs to its timeout in the background and its result is
+    discarded. Starting a login also starts a local dashboard prefetch in parallel.
+    """
+    login_succeeded = pyqtSignal(User, object)  # user, dashboard prefetch (None if not ready)
+    signup_succeeded = pyqtSignal()
+    failed = pyqtSignal(str, str, bool)  # operation, message, unexpected
+    busy_changed = pyqtSignal(bool)  # also re-emitted when the operations in flight change
+
+    def __init__(self, auth_service: AuthService, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.auth_service = auth_service
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(3)
+        self._next_ticket = 1
+        # ticket -> (operation, key, started)
+        self._inflight: dict[int, tuple[str, tuple, float]] = {}
+        self._prefetch: Optional[dict] = None
+        self._prefetch_email: Optional[str] = None
+
+    @property
+    def busy(self) -> bool:
+        return bool(self.operations())
+
+    def operations(self) -> set[str]:
+        """Auth operations ("login", "signup") currently in flight."""
+        return {op for op, _, _ in self._inflight.values() if op != "prefetch"}
+
+    def _submit(self, op: str, key: tuple, fn: Callable[[], object]) -> Optional[int]:
+        for ticket, (other_op, other_key, _) in self._inflight.items():
+            if other_op == op and other_key == key:
+                metrics.counter(f"auth.{op}.deduplicated").inc()
+                return ticket
+        # a newer request for a different account replaces the pending one
+        self._drop(lambda o, k: o == op)
+
+        before = self.operations()
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        task = _Task(ticket, fn)
+        task.signals.finished.connect(self._on_finished)
+        task.signals.failed.connect(self._on_failed)
+        self._inflight[ticket] = (op, key, time.perf_counter())
+        self.pool.start(task)
+        if self.operations() != before:
+            self.busy_changed.emit(True)
+        return ticket
+
+    def _drop(self, predicate: Callable[[str, tuple], bool]) -> None:
+        before = self.operations()
+        for ticket in [t for t, (op, key, _) in self._inflight.items() if predicate(op, key)]:
+            op = self._inflight.pop(ticket)[0]
+            metrics.counter(f"auth.{op}.cancelled").inc()
+        if self.operations() != before:
+            self.busy_changed.emit(self.busy)
+
+    def login(self, email: str, password: str) -> Optional[int]:
+        email = (email or "").strip()
+        if email and email != self._prefetch_email:
+            self._prefetch = None
+            self._prefetch_email = email
+            self._submit("prefetch", (email,), lambda: prefetch_dashboard(email))
+        return self._submit("login", (email, password), lambda: self.auth_service.login(email, password))
+
+    def signup(self, email: str, password: str, consent: bool) -> Optional[int]:
+        return self._submit(
+            "signup", ((email or "").strip(), password, consent),
+            lambda: self.auth_service.signup(email, password, consent),
+        )
+
+    def cancel(self) -> None:
+        """Forget every in-flight auth request; their results will be ignored."""
+        self._drop(lambda op, _key: op != "prefetch")
+
+    def _finish(self, ticket: int) -> Optional[str]:
+        entry = self._inflight.pop(ticket, None)
+        if entry is None:
+            return None  # cancelled or superseded
+        op, _key, started = entry
+        metrics.histogram(f"auth.{op}.ms").observe_since(started)
+        if op != "prefetch":
+            self.busy_changed.emit(self.busy)
+        return op
+
+    def _on_finished(self, ticket: int, result: object):
+        op = self._finish(ticket)
+        if op == "prefetch":
+            self._prefetch = result  # type: ignore[assignment]
+        elif op == "login":
+            user: User = result  # type: ignore[assignment]
+            prefetch = self._prefetch if self._prefetch_email == user.email else None
+            self.login_succeeded.emit(user, prefetch)
+        elif op == "signup":
+            self.signup_succeeded.emit()
+
+    def _on_failed(self, ticket: int, message: str, unexpected: bool):
+        op = self._finish(ticket)
+        if op is None or op == "prefetch":
+            # the dashboard falls back to reading local data itself
+            return
+        metrics.counter(f"auth.{op}.errors").inc()
+        self.failed.emit(op, message, unexpected)
@@ -0,0 +1,36 @@
+"""
+Worker-process side of the multi-camera tracker.
+
+Each worker in the pool loads its own inference backend once (in the pool
+initializer) and then turns RGB frames into one small tuple per detected face.
+Only the openness and the eye centroid come back over the pipe, not the
+landmarks, so results are cheap to send. Openness is the backend's raw value: a
+worker serves frames from every camera, so per-face baselines are kept by the
+tracks in the parent (FaceTracker), not here. This module has no Qt imports so spawned workers stay
+light.
+"""
+import os
+import time
+
+from threaded.inference_backends import InferenceBackend, create_backend
+
+_backend: InferenceBackend | None = None
+
+
+def init_worker(max_faces: int, backend: str = "facemesh") -> None:
+    """Pool initializer: load the inference backend once per worker process."""
+    global _backend
+    _backend, _ = create_backend(backend, max_faces)
+
+
+def detect_faces(rgb) -> tuple[list[tuple[float, float, float]], float, int]:
+    """
+    Run the backend on one RGB frame.
+
+    Returns ([(openness, cx, cy), ...], inference_ms, pid). cx and cy are the eye
+    centroid in normalized image coordinates, used for identity assignment.
+    """
+    started = time.perf_counter()
+    faces = _backend.process_raw(rgb)  # type: ignore[union-attr]
+    inference_ms = (time.perf_counter() - started) * 1000
+    return [(f.ear, f.cx, f.cy) for f in faces], inference_ms, os.getpid()
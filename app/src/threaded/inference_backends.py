@@ -0,0 +1,257 @@
+"""
+Interchangeable face/eye inference for the trackers.
+
+Every tracker engine (EyeTrackerThread, the out-of-process worker and the
+multi-camera pool) turns an RGB frame into one EyeState per face through a
+backend from here, and then runs the same blink state machine on it. A backend
+reports eye openness on the EAR scale (about 0.3 open, under 0.21 closed), so
+thresholds do not depend on which backend is in use.
+
+  facemesh       FaceMesh with iris refinement: 478 landmarks. The original,
+                 most robust to head pose.
+  facemesh-lite  FaceMesh without refinement: 468 landmarks, no iris model.
+                 The same EAR points, but the unrefined eyelids move less on a
+                 blink, so the EAR is rescaled against the wearer's open-eye
+                 baseline (OpenBaseline).
+  eyepatch       BlazeFace short-range detection (face box and eye keypoints),
+                 then an open/closed score from a small grayscale patch around
+                 each eye. No mesh at all. Cheapest, but less accurate with
+                 glasses, low light or a turned head.
+
+bench/tracker_bench.py compares them on the same video. No Qt imports here, so
+spawned workers can load this module.
+"""
+import math
+import time
+from typing import NamedTuple, Optional
+
+# FaceMesh indices of the six EAR points of each eye
+LEFT_EYE = (33, 160, 158, 133, 153, 144)
+RIGHT_EYE = (362, 385, 387, 263, 373, 380)
+EAR_POINTS = LEFT_EYE + RIGHT_EYE
+
+
+def eye_aspect_ratio(pts) -> float:
+    a = math.dist(pts[1], pts[5])
+    b = math.dist(pts[2], pts[4])
+    c = math.dist(pts[0], pts[3])
+    return (a + b) / (2.0 * c) if c else 0.0
+
+
+# frame rate the blink state machine's CONSEC_FRAMES is tuned for (a typical webcam)
+NOMINAL_FPS = 30
+
+
+def consec_frames_for(max_fps: float, consec_frames: int = 2) -> int:
+    """
+    Closed frames that make a blink when the frame rate is capped at max_fps (0:
+    uncapped). A blink lasts as long at any frame rate, so fewer frames see it.
+    """
+    if not max_fps or max_fps >= NOMINAL_FPS:
+        return consec_frames
+    return max(1, round(consec_frames * max_fps / NOMINAL_FPS))
+
+
+def capped_width(width: int, max_width: int) -> int:
+    """Inference width with a cap applied; 0 means no downscaling / no cap."""
+    if not max_width:
+        return width
+    return min(width, max_width) if width else max_width
+
+
+class EyeState(NamedTuple):
+    ear: float  # openness on the EAR scale, averaged over both eyes
+    cx: float  # eye centroid in normalized image coordinates, for identity assignment
+    cy: float
+    points: Optional[list]  # the 12 EAR points in pixels, if the backend has them
+
+
+# openness reported for an eye at its open baseline
+OPEN_EAR = 0.30
+
+
+class OpenBaseline:
+    """
+    Running open-eye level per face, keyed by whatever identifies the face to the
+    caller (a left-to-right slot, or a track id). It rises quickly and falls
+    slowly, so blinks barely move it. normalize() maps a raw openness onto the EAR
+    scale relative to it, and `gain` stretches the drop for signals that move less
+    than the EAR on a blink.
+    """
+    UP = 0.10
+    DOWN = 0.005
+
+    def __init__(self, gain: float = 1.0):
+        self.gain = gain
+        self.levels: dict[int, float] = {}
+
+    def normalize(self, slot: int, value: float) -> float:
+        level = self.levels.get(slot)
+        if level is None:
+            level = value
+        else:
+            level += (self.UP if value > level else self.DOWN) * (value - level)
+        self.levels[slot] = level
+        if not level:
+            return 0.0
+        return max(0.0, OPEN_EAR * (1.0 - self.gain * (1.0 - value / level)))
+
+    def forget(self, key) -> None:
+        self.levels.pop(key, None)
+
+
+class InferenceBackend:
+    name = ""
+    # None: process_raw already reports the EAR. Otherwise its openness has to be put
+    # on the EAR scale by an OpenBaseline with this gain, one level per face.
+    baseline_gain: Optional[float] = None
+    _slot_baseline: Optional[OpenBaseline] = None
+
+    def process_raw(self, rgb) -> list[EyeState]:
+        """Faces in one RGB frame, at most max_faces of them, with the backend's own openness."""
+        raise NotImplementedError
+
+    def process(self, rgb) -> list[EyeState]:
+        """
+        Faces in one RGB frame on the EAR scale. Baselines are kept per left-to-right
+        slot, which is right for one camera and one wearer. Callers that follow
+        faces across frames or cameras should use process_raw and keep an
+        OpenBaseline per face.
+        """
+        faces = self.process_raw(rgb)
+        if self.baseline_gain is None:
+            return faces
+        if self._slot_baseline is None:
+            self._slot_baseline = OpenBaseline(self.baseline_gain)
+        faces.sort(key=lambda f: f.cx)
+        return [f._replace(ear=self._slot_baseline.normalize(slot, f.ear)) for slot, f in enumerate(faces)]
+
+    def close(self) -> None:
+        pass
+
+
+class FaceMeshBackend(InferenceBackend):
+    name = "facemesh"
+    refine_landmarks = True
+
+    def __init__(self, max_faces: int = 1):
+        import mediapipe.python.solutions.face_mesh as mp_face_mesh
+
+        self._mesh = mp_face_mesh.FaceMesh(
+            max_num_faces=max_faces, refine_landmarks=self.refine_landmarks,
+            min_detection_confidence=0.5, min_tracking_confidence=0.5
+        )
+
+    def process_raw(self, rgb) -> list[EyeState]:
+        results = self._mesh.process(rgb)
+        h, w = rgb.shape[:2]
+        faces = []
+        for face_landmarks in results.multi_face_landmarks or ():  # type: ignore[attr-defined]
+            lm = face_landmarks.landmark
+            pts = [(lm[i].x * w, lm[i].y * h) for i in EAR_POINTS]
+            ear = (eye_aspect_ratio(pts[:6]) + eye_aspect_ratio(pts[6:])) / 2.0
+            cx = sum(lm[i].x for i in EAR_POINTS) / len(EAR_POINTS)
+            cy = sum(lm[i].y for i in EAR_POINTS) / len(EAR_POINTS)
+            faces.append(EyeState(ear, cx, cy, pts))
+        return faces
+
+    def close(self) -> None:
+        self._mesh.close()
+
+
+class FaceMeshLiteBackend(FaceMeshBackend):
+    name = "facemesh-lite"
+    refine_landmarks = False
+    # a blink moves the unrefined EAR by roughly 15-20% rather than 50%+
+    baseline_gain = 2.5
+
+
+class EyePatchBackend(InferenceBackend):
+    """
+    Face detection for the eye positions, then a hand-made open/closed score per
+    eye. An open eye shows a dark iris spanning a good part of the patch height.
+    A closed one only shows the lash line. The score is the height of the dark
+    region in the middle columns, put on the EAR scale by an OpenBaseline.
+    """
+    name = "eyepatch"
+    baseline_gain = 1.0
+    # the patch around each eye, in units of the distance between the eyes
+    HALF_WIDTH = 0.35
+    ABOVE = 0.18  # stops short of the eyebrow
+    BELOW = 0.14
+    PATCH_SIZE = (24, 16)  # (w, h) the patch is resampled to
+    MIN_EYE_DISTANCE = 12  # pixels; smaller faces are too blurry to score
+
+    def __init__(self, max_faces: int = 1):
+        import cv2
+        import numpy as np
+        import mediapipe.python.solutions.face_detection as mp_face_detection
+
+        self._cv2, self._np = cv2, np
+        self._detector = mp_face_detection.FaceDetection(model_selection=0, min_detection_confidence=0.5)
+        self.max_faces = max_faces
+
+    def _eye_score(self, rgb, x: float, y: float, d: float) -> Optional[float]:
+        cv2, np = self._cv2, self._np
+        h, w = rgb.shape[:2]
+        x0, x1 = int(x - self.HALF_WIDTH * d), int(x + self.HALF_WIDTH * d) + 1
+        y0, y1 = int(y - self.ABOVE * d), int(y + self.BELOW * d) + 1
+        if x0 < 0 or y0 < 0 or x1 > w or y1 > h:
+            return None
+        gray = cv2.cvtColor(rgb[y0:y1, x0:x1], cv2.COLOR_RGB2GRAY)
+        patch = cv2.resize(gray, self.PATCH_SIZE, interpolation=cv2.INTER_AREA)
+        lo, hi = np.percentile(patch, (5, 95))
+        if hi - lo < 8:
+            # flat patch: too dark or washed out to tell
+            return None
+        dark = patch < lo + 0.35 * (hi - lo)
+        pw = self.PATCH_SIZE[0]
+        heights = dark[:, pw // 4: pw - pw // 4].sum(axis=0)
+        return float(np.percentile(heights, 75)) / self.PATCH_SIZE[1]
+
+    def process_raw(self, rgb) -> list[EyeState]:
+        results = self._detector.process(rgb)
+        h, w = rgb.shape[:2]
+        found = []
+        for detection in (results.detections or ())[: self.max_faces]:  # type: ignore[attr-defined]
+            kp = detection.location_data.relative_keypoints
+            # keypoint 0 is the subject's right eye, 1 the left
+            rx, ry, lx, ly = kp[0].x * w, kp[0].y * h, kp[1].x * w, kp[1].y * h
+            d = math.hypot(lx - rx, ly - ry)
+            if d < self.MIN_EYE_DISTANCE:
+                continue
+            scores = [s for s in (self._eye_score(rgb, rx, ry, d), self._eye_score(rgb, lx, ly, d)) if s is not None]
+            if scores:
+                found.append((sum(scores) / len(scores), (rx + lx) / 2 / w, (ry + ly) / 2 / h))
+
+        return [EyeState(score, cx, cy, None) for score, cx, cy in found]
+
+    def close(self) -> None:
+        self._detector.close()
+
+
+BACKENDS: dict[str, type[InferenceBackend]] = {
+    FaceMeshBackend.name: FaceMeshBackend,
+    FaceMeshLiteBackend.name: FaceMeshLiteBackend,
+    EyePatchBackend.name: EyePatchBackend,
+}
+
+
+def _backend_class(name: str) -> type[InferenceBackend]:
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"unknown inference backend {name!r}; choose one of {', '.join(BACKENDS)}")
+
+
+def baseline_gain_for(name: str) -> Optional[float]:
+    """The named backend's baseline_gain, without loading it."""
+    return _backend_class(name).baseline_gain
+
+
+def create_backend(name: str, max_faces: int = 1) -> tuple[InferenceBackend, float]:
+    """Load the named backend. Returns (backend, seconds it took to load)."""
+    factory = _backend_class(name)
+    started = time.perf_counter()
+    backend = factory(max_faces)
+    return backend, time.perf_counter() - started
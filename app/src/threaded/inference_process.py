@@ -0,0 +1,189 @@
+import os
+import time
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+from PyQt6.QtCore import QThread, pyqtSignal
+from services.instrumentation import metrics
+from threaded import inference_worker
+from threaded.tracker import KEEP_CAMERA_WARM, TRACKER_BACKEND
+
+# run capture + inference in a separate process instead of a QThread in the GUI process
+TRACKER_PROCESS = os.getenv("LUMINA_TRACKER_PROCESS", "0") == "1"
+# also copy every frame into shared memory (for previews); landmarks are always shared
+PUBLISH_FRAMES = os.getenv("LUMINA_TRACKER_PUBLISH_FRAMES", "0") == "1"
+
+
+class ProcessEyeTracker(QThread):
+    """
+    Drop-in alternative to EyeTrackerThread that runs OpenCV and the model in a
+    spawned child process (inference_worker.run_worker), so frame processing
+    doesn't compete with the GUI, SyncWorker or SQLite writes for the GIL.
+
+    The child is started once and then paused and resumed over a command pipe,
+    like the in-process engine. This QThread only listens on the event pipe and
+    re-emits blink/ready events as Qt signals. latest() reads the newest
+    landmarks (and frame, if published) straight from shared memory.
+    """
+    blink_detected = pyqtSignal(int)
+    ready = pyqtSignal(float)
+
+    def __init__(
+        self,
+        camera_index: int = 0,
+        keep_camera_warm: bool = KEEP_CAMERA_WARM,
+        publish_frames: bool = PUBLISH_FRAMES,
+        backend: str = TRACKER_BACKEND,
+    ):
+        super().__init__()
+        self.running = True
+        self.blink_count = 0
+        self.camera_index = camera_index
+        self.keep_camera_warm = keep_camera_warm
+        self.publish_frames = publish_frames
+        self.backend = backend
+
+        ctx = get_context("spawn")
+        self._shm = SharedMemory(create=True, size=inference_worker.SHM_SIZE)
+        self._shared = inference_worker.SharedState(self._shm)
+        self._shared.header[:] = 0
+        self._cmd_recv, self._cmd_send = ctx.Pipe(duplex=False)
+        self._evt_recv, self._evt_send = ctx.Pipe(duplex=False)
+        self._proc = ctx.Process(
+            target=inference_worker.run_worker,
+            args=(self._cmd_recv, self._evt_send, self._shm.name, camera_index, keep_camera_warm, publish_frames, backend),
+            name="lumina-inference",
+            daemon=True,
+        )
+        self._active = False
+        self._resumed_at: Optional[float] = None
+
+        self.process_start_seconds: Optional[float] = None
+        self.model_load_seconds: Optional[float] = None
+        self.camera_open_seconds: Optional[float] = None
+        self.time_to_first_ready_seconds: Optional[float] = None
+        self.resumes = 0
+        self.worker_stats: dict = {}
+        self._started_at: Optional[float] = None
+        self.max_fps = 0.0
+        self.max_width = 0
+
+    def warm_up(self):
+        """Start the child paused: it imports the vision stack and loads the model only."""
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+            self._proc.start()
+            # the child owns these ends now
+            self._cmd_recv.close()
+            self._evt_send.close()
+            if self.max_fps or self.max_width:
+                self._send(("limits", self.max_fps, self.max_width))
+        if not self.isRunning():
+            self.start()
+
+    def resume(self):
+        if not self._active:
+            self._active = True
+            self._resumed_at = time.perf_counter()
+            self.resumes += 1
+            self.blink_count = 0
+        self.warm_up()
+        self._send("resume")
+
+    def pause(self):
+        self._active = False
+        self._send("pause")
+
+    def is_active(self) -> bool:
+        return self._active
+
+    def set_limits(self, max_fps: float = 0, max_width: int = 0):
+        """Cap frames per second and inference width in the child (0: no cap)."""
+        self.max_fps = max_fps
+        self.max_width = max_width
+        self._send(("limits", max_fps, max_width))
+
+    def _send(self, cmd: str | tuple) -> None:
+        if self._started_at is None:
+            return
+        try:
+            self._cmd_send.send(cmd)
+        except (BrokenPipeError, OSError):
+            pass
+
+    def latest(self, with_frame: bool = False) -> Optional[dict]:
+        """Newest eye landmarks / EAR (and frame, if published) from shared memory."""
+        return self._shared.read(with_frame=with_frame and self.publish_frames)
+
+    def stats(self) -> dict:
+        def ms(v):
+            return round(v * 1000, 1) if v is not None else None
+        out = {
+            "mode": "process",
+            "backend": self.backend,
+            "pid": self._proc.pid,
+            "alive": self._proc.is_alive(),
+            "process_start_ms": ms(self.process_start_seconds),
+            "model_load_ms": ms(self.model_load_seconds),
+            "camera_open_ms": ms(self.camera_open_seconds),
+            "time_to_first_ready_ms": ms(self.time_to_first_ready_seconds),
+            "resumes": self.resumes,
+            "max_fps": self.max_fps,
+            "max_width": self.max_width,
+        }
+        for name, value in self.worker_stats.get("counters", {}).items():
+            out[name] = value
+        for name, h in self.worker_stats.get("histograms", {}).items():
+            out[f"{name} p50/p95"] = f"{h['p50']}/{h['p95']}"
+        return out
+
+    def run(self):
+        while self.running:
+            try:
+                if not self._evt_recv.poll(0.2):
+                    if not self._proc.is_alive():
+                        break
+                    continue
+                msg = self._evt_recv.recv()
+            except (EOFError, OSError):
+                break
+
+            kind = msg[0]
+            if kind == "blink":
+                self.blink_count = msg[1]
+                metrics.counter("tracker.blinks").inc()
+                self.blink_detected.emit(msg[1])
+            elif kind == "ready":
+                if self._resumed_at is not None:
+                    self.time_to_first_ready_seconds = time.perf_counter() - self._resumed_at
+                    metrics.gauge("tracker.time_to_first_ready_ms").set(round(self.time_to_first_ready_seconds * 1000, 1))
+                    self.ready.emit(self.time_to_first_ready_seconds)
+            elif kind == "loaded":
+                self.model_load_seconds = msg[1]
+                if self._started_at is not None:
+                    self.process_start_seconds = time.perf_counter() - self._started_at
+                metrics.gauge("tracker.model_load_ms").set(round(msg[1] * 1000, 1))
+            elif kind == "camera_open":
+                self.camera_open_seconds = msg[1]
+                metrics.gauge("tracker.camera_open_ms").set(round(msg[1] * 1000, 1))
+            elif kind == "stats":
+                self.worker_stats = msg[1]
+            elif kind == "stopped":
+                break
+
+    def stop(self):
+        """Shut the child down for good (app exit)."""
+        self._active = False
+        self._send("stop")
+        if self._started_at is not None:
+            self._proc.join(timeout=3.0)
+            if self._proc.is_alive():
+                self._proc.terminate()
+                self._proc.join(timeout=1.0)
+        self.running = False
+        self.wait()
+        self._evt_recv.close()
+        self._cmd_send.close()
+        self._shared.release()
+        self._shm.close()
+        self._shm.unlink()
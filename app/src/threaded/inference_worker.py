@@ -0,0 +1,253 @@
+"""
+Child-process side of the out-of-process tracker (see inference_process.py).
+
+The child owns the camera, the inference backend and the EAR/blink state machine, so none of
+that work competes with the GUI process for the GIL. The latest eye landmarks,
+and optionally the latest frame, go into a shared-memory block the GUI maps
+directly (backends without eye contours leave them zero). Blink counts, readiness and periodic stats are sent as small tuples
+over a pipe. The child has no Qt imports.
+"""
+import time
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+from threaded.inference_backends import EAR_POINTS, consec_frames_for, create_backend
+
+EYE_POINTS = len(EAR_POINTS)
+# header: seq, ear, has_face, frame_h, frame_w, monotonic timestamp
+HEADER_FIELDS = 6
+HEADER_BYTES = HEADER_FIELDS * 8
+LANDMARK_BYTES = EYE_POINTS * 2 * 4
+# room for a 720p BGR frame; larger frames are published downscaled
+MAX_FRAME_SHAPE = (720, 1280, 3)
+FRAME_OFFSET = HEADER_BYTES + LANDMARK_BYTES
+SHM_SIZE = FRAME_OFFSET + MAX_FRAME_SHAPE[0] * MAX_FRAME_SHAPE[1] * MAX_FRAME_SHAPE[2]
+
+STATS_INTERVAL = 2.0
+
+
+class SharedState:
+    """
+    Typed views over the shared block. Writes are wrapped in a seqlock: seq is
+    odd while the writer is inside, so readers retry instead of seeing a torn
+    update. No lock is shared between the processes.
+    """
+
+    def __init__(self, shm: SharedMemory):
+        # imported here so importing this module (from the GUI) does not load numpy
+        import numpy as np
+
+        self.shm = shm
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.float64, buffer=shm.buf, offset=0)
+        self.landmarks = np.ndarray((EYE_POINTS, 2), dtype=np.float32, buffer=shm.buf, offset=HEADER_BYTES)
+        self.frame = np.ndarray(MAX_FRAME_SHAPE, dtype=np.uint8, buffer=shm.buf, offset=FRAME_OFFSET)
+
+    def release(self) -> None:
+        # views must go before the mapping can be closed
+        del self.header, self.landmarks, self.frame
+
+    def begin_write(self) -> None:
+        self.header[0] += 1
+
+    def end_write(self) -> None:
+        self.header[0] += 1
+
+    def read(self, with_frame: bool = False, retries: int = 100) -> Optional[dict]:
+        for _ in range(retries):
+            seq = self.header[0]
+            if seq % 2:
+                continue
+            header = self.header.copy()
+            landmarks = self.landmarks.copy()
+            frame = None
+            if with_frame and header[3] and header[4]:
+                frame = self.frame[: int(header[3]), : int(header[4])].copy()
+            if self.header[0] == seq:
+                return {
+                    "seq": int(seq // 2),
+                    "ear": float(header[1]),
+                    "has_face": bool(header[2]),
+                    "timestamp": float(header[5]),
+                    "landmarks": landmarks,
+                    "frame": frame,
+                }
+        return None
+
+
+def run_worker(
+    commands: Connection,
+    events: Connection,
+    shm_name: str,
+    camera_index: int,
+    keep_camera_warm: bool,
+    publish_frames: bool,
+    backend: str = "facemesh",
+    ear_thresh: float = 0.21,
+    consec_frames: int = 2,
+) -> None:
+    import cv2
+    import numpy as np
+    from services.instrumentation import install_gc_monitor, metrics
+
+    install_gc_monitor()
+
+    shm = SharedMemory(name=shm_name)
+    state = SharedState(shm)
+
+    model, load_seconds = create_backend(backend)
+    events.send(("loaded", load_seconds))
+
+    capture_ms = metrics.histogram("tracker.capture_ms")
+    inference_ms = metrics.histogram("tracker.inference_ms")
+    frame_ms = metrics.histogram("tracker.frame_ms")
+    frames = metrics.counter("tracker.frames")
+    faces = metrics.counter("tracker.frames_with_face")
+
+    active = False
+    running = True
+    cap = None
+    frame = None  # capture, downscale and RGB buffers are reused across frames
+    small = None
+    rgb = None
+    # caps from the parent's resource governor ("limits" command); 0 means none
+    max_fps = 0.0
+    max_width = 0
+    last_frame = 0.0
+    blink_count = 0
+    frame_counter = 0
+    awaiting_ready = False
+    last_stats = time.monotonic()
+    try:
+        while running:
+            # block while idle, otherwise just drain pending commands
+            if not active:
+                timeout = 0.2 if cap is not None else None
+            else:
+                timeout = 0
+            while commands.poll(timeout):
+                cmd = commands.recv()
+                if cmd == "resume" and not active:
+                    active = True
+                    blink_count = 0
+                    frame_counter = 0
+                    awaiting_ready = True
+                elif cmd == "pause":
+                    active = False
+                elif cmd == "stop":
+                    running = False
+                    break
+                elif isinstance(cmd, tuple) and cmd[0] == "limits":
+                    _, max_fps, max_width = cmd
+                timeout = 0
+            if not running:
+                break
+
+            if not active:
+                if cap is not None:
+                    if keep_camera_warm:
+                        # a warm camera keeps grabbing so frames aren't stale on resume
+                        cap.grab()
+                    else:
+                        cap.release()
+                        cap = None
+                continue
+
+            if cap is None:
+                t0 = time.perf_counter()
+                cap = cv2.VideoCapture(camera_index)
+                events.send(("camera_open", time.perf_counter() - t0))
+
+            if max_fps and time.perf_counter() - last_frame < 1.0 / max_fps:
+                # over the cap: take the frame off the camera without decoding it
+                if cap.grab():
+                    continue
+
+            t_frame = last_frame = time.perf_counter()
+            ret, out = cap.read(frame)
+            frame = out if ret else frame
+            capture_ms.observe_since(t_frame)
+            if not ret:
+                cap.release()
+                cap = None
+                time.sleep(0.5)
+                continue
+
+            src = frame
+            h, w = frame.shape[:2]
+            if max_width and w > max_width:
+                sh = round(h * max_width / w)
+                if small is None or small.shape[:2] != (sh, max_width):
+                    small = np.empty((sh, max_width, 3), dtype=np.uint8)
+                cv2.resize(frame, (max_width, sh), dst=small, interpolation=cv2.INTER_AREA)
+                src = small
+            if rgb is None or rgb.shape != src.shape:
+                rgb = np.empty_like(src)
+            cv2.cvtColor(src, cv2.COLOR_BGR2RGB, dst=rgb)
+            t0 = time.perf_counter()
+            detected = model.process(rgb)
+            inference_ms.observe_since(t0)
+            frames.inc()
+
+            face = detected[0] if detected else None
+            ear = face.ear if face is not None else 0.0
+            state.begin_write()
+            try:
+                if face is not None:
+                    if face.points is not None:
+                        # points are in inference pixels; the GUI wants full-frame ones
+                        state.landmarks[:] = face.points
+                        if src is not frame:
+                            state.landmarks *= w / src.shape[1]
+                    else:
+                        state.landmarks[:] = 0
+                state.header[1] = ear
+                state.header[2] = 1.0 if face is not None else 0.0
+                state.header[5] = time.monotonic()
+                if publish_frames:
+                    if h > MAX_FRAME_SHAPE[0] or w > MAX_FRAME_SHAPE[1]:
+                        scale = min(MAX_FRAME_SHAPE[0] / h, MAX_FRAME_SHAPE[1] / w)
+                        ph, pw = int(h * scale), int(w * scale)
+                        state.frame[:ph, :pw] = cv2.resize(frame, (pw, ph))
+                    else:
+                        ph, pw = h, w
+                        state.frame[:h, :w] = frame
+                    state.header[3], state.header[4] = ph, pw
+            finally:
+                state.end_write()
+
+            if face is not None:
+                faces.inc()
+                if awaiting_ready:
+                    awaiting_ready = False
+                    events.send(("ready",))
+                if ear < ear_thresh:
+                    frame_counter += 1
+                else:
+                    if frame_counter >= consec_frames_for(max_fps, consec_frames):
+                        blink_count += 1
+                        events.send(("blink", blink_count))
+                    frame_counter = 0
+            frame_ms.observe_since(t_frame)
+
+            now = time.monotonic()
+            if now - last_stats >= STATS_INTERVAL:
+                last_stats = now
+                snap = metrics.snapshot()
+                events.send(("stats", {
+                    "counters": snap["counters"],
+                    "histograms": {
+                        k: {q: v[q] for q in ("count", "mean", "p50", "p95", "p99", "max")}
+                        for k, v in snap["histograms"].items()
+                    },
+                }))
+    finally:
+        if cap is not None:
+            cap.release()
+        model.close()
+        state.release()
+        shm.close()
+        try:
+            events.send(("stopped",))
+        except (BrokenPipeError, OSError):
+            pass
@@ -0,0 +1,93 @@
+import json
+import os
+import queue
+import time
+from typing import Optional
+import requests
+from PyQt6.QtCore import QThread
+from services.auth_service import User, API_BASE_URL
+from services import local_db
+from services.instrumentation import metrics
+
+# push blinks to the backend as they happen, for live dashboards (off by default)
+LIVE_STREAM = os.getenv("LUMINA_LIVE_STREAM", "0") == "1"
+LIVE_STREAM_INTERVAL = float(os.getenv("LUMINA_LIVE_STREAM_INTERVAL", "0.25"))
+
+
+class LiveStreamer(QThread):
+    """
+    Best-effort live feed of blinks to POST /live/blinks, batched every
+    LIVE_STREAM_INTERVAL seconds. Nothing sent here is stored by the backend:
+    SyncWorker remains the only path that persists blinks, so a dropped batch
+    only delays what live viewers see until the next sync.
+
+    Only sessions that already have a cloud id can be streamed; until the first
+    sync assigns one, blinks are skipped.
+    """
+
+    def __init__(self, user: User, interval: float = LIVE_STREAM_INTERVAL, max_queue: int = 1024):
+        super().__init__()
+        self.user = user
+        self.interval = interval
+        self.running = True
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self._cloud_ids: dict[int, Optional[int]] = {}
+
+    def offer(self, session_id: int, timestamp: str, count: int) -> None:
+        """Queue one blink; called from the GUI thread, never blocks."""
+        try:
+            self._queue.put_nowait((session_id, timestamp, count))
+        except queue.Full:
+            metrics.counter("live.dropped").inc()
+
+    def _cloud_id(self, session_id: int) -> Optional[int]:
+        cloud_id = self._cloud_ids.get(session_id)
+        if cloud_id is None:
+            # re-checked each batch until SyncWorker has pushed the session
+            cloud_id = local_db.get_cloud_session_id(session_id)
+            self._cloud_ids[session_id] = cloud_id
+        return cloud_id
+
+    def run(self):
+        while self.running:
+            time.sleep(self.interval)
+            batch = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch or not self.user.token:
+                continue
+            payload = []
+            for session_id, ts, count in batch:
+                cloud_id = self._cloud_id(session_id)
+                if cloud_id is not None:
+                    payload.append({"timestamp": ts, "count": count, "session_id": cloud_id})
+            if payload:
+                self._send(payload)
+
+    def _send(self, payload: list) -> None:
+        started = time.perf_counter()
+        try:
+            resp = requests.post(
+                f"{API_BASE_URL}/live/blinks",
+                data=json.dumps(payload).encode(),
+                headers={
+                    "Authorization": f"Bearer {self.user.token}",
+                    "Content-Type": "application/json",
+                },
+                timeout=2,
+            )
+        except requests.RequestException:
+            metrics.counter("live.errors").inc()
+            return
+        metrics.histogram("live.rtt_ms").observe_since(started)
+        if resp.status_code == 202:
+            metrics.counter("live.rows").inc(len(payload))
+        else:
+            metrics.counter(f"live.http_{resp.status_code}").inc()
+
+    def stop(self):
+        self.running = False
+        self.wait()
@@ -0,0 +1,366 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from typing import Optional
+from PyQt6.QtCore import QThread, pyqtSignal
+from services.instrumentation import metrics
+from threaded import face_pool
+from threaded.inference_backends import OpenBaseline, baseline_gain_for, consec_frames_for
+from threaded.tracker import TRACKER_BACKEND
+
+
+def _parse_source(value: str) -> int | str:
+    value = value.strip()
+    return int(value) if value.isdigit() else value
+
+
+# comma-separated camera indices, device paths or stream URLs, e.g. "0,1" or "0,rtsp://cam2/stream"
+TRACKER_SOURCES = [_parse_source(s) for s in os.getenv("LUMINA_TRACKER_SOURCES", "0").split(",") if s.strip()]
+TRACKER_MAX_FACES = max(1, int(os.getenv("LUMINA_TRACKER_MAX_FACES", "1")))
+TRACKER_WORKERS = int(os.getenv("LUMINA_TRACKER_WORKERS", "0"))  # 0: one per source, capped at cores - 1
+
+# the multi-track engine is only used when there is more than one thing to track
+MULTI_TRACKER = len(TRACKER_SOURCES) > 1 or TRACKER_MAX_FACES > 1
+
+
+@dataclass
+class Track:
+    track_id: int
+    cx: float
+    cy: float
+    last_seen: float
+    hits: int = 1
+    confirmed: bool = False
+    blink_count: int = 0
+    closed_frames: int = 0
+
+
+@dataclass
+class FaceTracker:
+    """
+    Assigns stable ids to faces seen by one camera.
+
+    Faces barely move between frames, so each detection is matched to the nearest
+    existing track by eye centroid (greedy, closest pairs first) within
+    max_distance. Unmatched detections start new tracks. A track must be seen
+    min_hits times before it is confirmed, so a one-frame false positive doesn't
+    open a session. A track not seen for timeout seconds is lost. With a
+    baseline, each track's raw openness is put on the EAR scale against that
+    track's own open-eye level.
+    """
+    max_distance: float = 0.15
+    min_hits: int = 3
+    timeout: float = 3.0
+    ear_thresh: float = 0.21
+    consec_frames: int = 2
+    baseline: Optional[OpenBaseline] = None
+    tracks: dict[int, Track] = field(default_factory=dict)
+    _next_id: int = 1
+
+    def update(self, faces: list[tuple[float, float, float]], now: float):
+        """
+        Apply one frame's detections.
+
+        Returns (started, blinked, lost): newly confirmed tracks, (track, count)
+        blink events, and ids of confirmed tracks that timed out.
+        """
+        pairs = sorted(
+            (math.hypot(t.cx - cx, t.cy - cy), tid, fi)
+            for tid, t in self.tracks.items()
+            for fi, (_, cx, cy) in enumerate(faces)
+        )
+        matched_tracks: set[int] = set()
+        assignment: dict[int, int] = {}
+        for dist, tid, fi in pairs:
+            if dist > self.max_distance:
+                break
+            if tid in matched_tracks or fi in assignment:
+                continue
+            matched_tracks.add(tid)
+            assignment[fi] = tid
+
+        started: list[Track] = []
+        blinked: list[tuple[Track, int]] = []
+        for fi, (ear, cx, cy) in enumerate(faces):
+            tid = assignment.get(fi)
+            if tid is None:
+                track = self.tracks[self._next_id] = Track(self._next_id, cx, cy, now)
+                self._next_id += 1
+            else:
+                track = self.tracks[tid]
+                track.cx, track.cy, track.last_seen = cx, cy, now
+                track.hits += 1
+
+            if not track.confirmed and track.hits >= self.min_hits:
+                track.confirmed = True
+                started.append(track)
+
+            if self.baseline is not None:
+                ear = self.baseline.normalize(track.track_id, ear)
+            # same EAR state machine as EyeTrackerThread, kept per face
+            if ear < self.ear_thresh:
+                track.closed_frames += 1
+            else:
+                if track.closed_frames >= self.consec_frames and track.confirmed:
+                    track.blink_count += 1
+                    blinked.append((track, track.blink_count))
+                track.closed_frames = 0
+
+        return started, blinked, self.expire(now)
+
+    def expire(self, now: float) -> list[int]:
+        """Drop tracks not seen for timeout seconds; returns the ids of confirmed ones."""
+        lost: list[int] = []
+        for tid, track in list(self.tracks.items()):
+            if now - track.last_seen > self.timeout:
+                del self.tracks[tid]
+                if self.baseline is not None:
+                    self.baseline.forget(tid)
+                if track.confirmed:
+                    lost.append(tid)
+        return lost
+
+    def clear(self) -> list[int]:
+        """Drop every track; returns the ids of confirmed ones."""
+        lost = [tid for tid, t in self.tracks.items() if t.confirmed]
+        self.tracks.clear()
+        if self.baseline is not None:
+            self.baseline.levels.clear()
+        return lost
+
+
+class MultiTrackerThread(QThread):
+    """
+    Tracker engine for shared workstations: N camera sources, up to max_faces
+    faces each, with model inference spread over a process pool so several
+    streams can use more than one core.
+
+    This thread only captures and keeps the per-face state. Each source has at
+    most one frame in the pool at a time. Frames grabbed while the previous one
+    is still being processed are dropped, so latency stays bounded when
+    inference can't keep up. Tracks are keyed "<source index>:<track id>" and
+    report blinks independently, so the dashboard can route each to its own
+    session. pause()/resume() match EyeTrackerThread. The pool, and with it the
+    loaded models, survives a pause.
+    """
+    track_started = pyqtSignal(str, str)  # track key, display label
+    track_blink = pyqtSignal(str, int)  # track key, blink count for that track
+    track_lost = pyqtSignal(str)
+
+    def __init__(
+        self,
+        sources: Optional[list[int | str]] = None,
+        max_faces: int = TRACKER_MAX_FACES,
+        workers: int = TRACKER_WORKERS,
+        backend: str = TRACKER_BACKEND,
+    ):
+        super().__init__()
+        self.sources = list(sources if sources is not None else TRACKER_SOURCES)
+        self.max_faces = max_faces
+        self.backend = backend
+        self.workers = workers or max(1, min(len(self.sources), (os.cpu_count() or 2) - 1))
+        self.running = True
+        self._cond = threading.Condition()
+        self._active = False
+        # bumped by pause(); frames submitted before a pause are dropped, not applied after resume
+        self._epoch = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        gain = baseline_gain_for(backend)
+        self.trackers = [
+            FaceTracker(baseline=OpenBaseline(gain) if gain is not None else None)
+            for _ in self.sources
+        ]
+
+        self.frames_submitted = 0
+        self.frames_dropped = 0
+        self.frames_skipped = 0
+        # set by set_limits (the resource governor); 0 means no cap
+        self.max_fps = 0.0
+        self.max_width = 0
+        self.pool_start_seconds: Optional[float] = None
+
+    @staticmethod
+    def track_key(source_idx: int, track_id: int) -> str:
+        return f"{source_idx}:{track_id}"
+
+    def set_limits(self, max_fps: float = 0, max_width: int = 0):
+        """Cap frames per second per source and the width of frames sent to the pool (0: no cap)."""
+        self.max_fps = max_fps
+        self.max_width = max_width
+        consec = consec_frames_for(max_fps)
+        for tracker in self.trackers:
+            tracker.consec_frames = consec
+
+    def warm_up(self):
+        if not self.isRunning():
+            self.start()
+
+    def resume(self):
+        with self._cond:
+            self._active = True
+            self._cond.notify_all()
+        self.warm_up()
+
+    def pause(self):
+        with self._cond:
+            self._active = False
+            self._epoch += 1
+            self._cond.notify_all()
+
+    def is_active(self) -> bool:
+        return self._active
+
+    def stats(self) -> dict:
+        return {
+            "sources": len(self.sources),
+            "backend": self.backend,
+            "workers": self.workers,
+            "max_faces": self.max_faces,
+            "active_tracks": sum(1 for tr in self.trackers for t in tr.tracks.values() if t.confirmed),
+            "frames_submitted": self.frames_submitted,
+            "frames_dropped": self.frames_dropped,
+            "frames_skipped": self.frames_skipped,
+            "max_fps": self.max_fps,
+            "max_width": self.max_width,
+            "pool_start_ms": round(self.pool_start_seconds * 1000, 1) if self.pool_start_seconds is not None else None,
+        }
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        t0 = time.perf_counter()
+        # spawn, not fork: forking a process that has Qt and capture threads running is unsafe
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context("spawn"),
+            initializer=face_pool.init_worker,
+            initargs=(self.max_faces, self.backend),
+        )
+        # one no-op job per worker so the model load happens now, not on the first frame
+        for f in [pool.submit(os.getpid) for _ in range(self.workers)]:
+            f.result()
+        self.pool_start_seconds = time.perf_counter() - t0
+        metrics.gauge("multi_tracker.pool_start_ms").set(round(self.pool_start_seconds * 1000, 1))
+        return pool
+
+    def _emit_lost(self, source_idx: int, track_ids: list[int]):
+        for tid in track_ids:
+            self.track_lost.emit(self.track_key(source_idx, tid))
+
+    def run(self):
+        import cv2
+
+        self._pool = self._start_pool()
+        n = len(self.sources)
+        caps: list = [None] * n
+        inflight: list[Optional[Future]] = [None] * n
+        submitted_at = [0.0] * n
+        submitted_epoch = [0] * n
+        last_submit = [0.0] * n
+
+        roundtrip_ms = metrics.histogram("multi_tracker.roundtrip_ms")
+        inference_ms = metrics.histogram("multi_tracker.inference_ms")
+        frames = metrics.counter("multi_tracker.frames")
+        dropped = metrics.counter("multi_tracker.frames_dropped")
+        skipped = metrics.counter("multi_tracker.frames_skipped")
+        blinks = metrics.counter("multi_tracker.blinks")
+        tracks_gauge = metrics.gauge("multi_tracker.active_tracks")
+        try:
+            while self.running:
+                if not self._active:
+                    for i, cap in enumerate(caps):
+                        if cap is not None:
+                            cap.release()
+                            caps[i] = None
+                    for i, fut in enumerate(inflight):
+                        # a frame from before the pause must not feed the tracks after resume
+                        if fut is not None:
+                            fut.cancel()
+                            inflight[i] = None
+                    for i, tracker in enumerate(self.trackers):
+                        self._emit_lost(i, tracker.clear())
+                    tracks_gauge.set(0)
+                    with self._cond:
+                        while self.running and not self._active:
+                            self._cond.wait()
+                    continue
+
+                # grab every source first, then decode: keeps the cameras roughly in step
+                grabbed = [False] * n
+                for i, src in enumerate(self.sources):
+                    if caps[i] is None:
+                        caps[i] = cv2.VideoCapture(src)
+                    grabbed[i] = caps[i].grab()
+                if not any(grabbed):
+                    time.sleep(0.5)
+
+                now = time.monotonic()
+                for i in range(n):
+                    fut = inflight[i]
+                    if fut is not None and fut.done() and submitted_epoch[i] != self._epoch:
+                        # submitted before a pause()/resume() this loop never saw
+                        inflight[i] = fut = None
+                    if fut is not None and fut.done():
+                        inflight[i] = None
+                        faces, infer_ms, _pid = fut.result()
+                        roundtrip_ms.observe_since(submitted_at[i])
+                        inference_ms.observe(infer_ms)
+                        started, blinked, lost = self.trackers[i].update(faces, now)
+                        for track in started:
+                            self.track_started.emit(
+                                self.track_key(i, track.track_id),
+                                f"Camera {i + 1} · Person {track.track_id}",
+                            )
+                        for track, count in blinked:
+                            blinks.inc()
+                            self.track_blink.emit(self.track_key(i, track.track_id), count)
+                        self._emit_lost(i, lost)
+                    else:
+                        # no result this pass (camera gone, read failing, or still in flight):
+                        # its tracks must still time out so their sessions end
+                        self._emit_lost(i, self.trackers[i].expire(now))
+
+                    if not grabbed[i]:
+                        # camera unplugged or busy: release it and reopen on the next pass
+                        caps[i].release()
+                        caps[i] = None
+                        continue
+                    if inflight[i] is not None:
+                        self.frames_dropped += 1
+                        dropped.inc()
+                        continue
+                    if self.max_fps and now - last_submit[i] < 1.0 / self.max_fps:
+                        # over the cap: the grabbed frame is never decoded
+                        self.frames_skipped += 1
+                        skipped.inc()
+                        continue
+                    ret, frame = caps[i].retrieve()
+                    if not ret:
+                        continue
+                    h, w = frame.shape[:2]
+                    if self.max_width and w > self.max_width:
+                        frame = cv2.resize(frame, (self.max_width, round(h * self.max_width / w)), interpolation=cv2.INTER_AREA)
+                    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    last_submit[i] = now
+                    submitted_at[i] = time.perf_counter()
+                    submitted_epoch[i] = self._epoch
+                    inflight[i] = self._pool.submit(face_pool.detect_faces, rgb)
+                    self.frames_submitted += 1
+                    frames.inc()
+
+                tracks_gauge.set(sum(1 for tr in self.trackers for t in tr.tracks.values() if t.confirmed))
+        finally:
+            for cap in caps:
+                if cap is not None:
+                    cap.release()
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            self._active = False
+            self._cond.notify_all()
+        self.wait()
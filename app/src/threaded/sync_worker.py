@@ -1,29 +1,222 @@
 from PyQt6.QtCore import QThread
+import json
+import threading
 import time
 import requests
 from typing import Optional
 from services.auth_service import User, API_BASE_URL
-from services import local_db
+from services import local_db, local_retention
+from services.instrumentation import metrics, BYTES_BUCKETS, RATE_BUCKETS
+
+# summary columns, in the order get_unsynced_sessions returns them after cloud_session_id
+SUMMARY_FIELDS = ("total_blinks", "duration_seconds", "mean_rate", "peak_rate", "longest_gap_seconds")
+
+
+class ServerBusy(Exception):
+    """The backend refused a sync request with 429/503; nothing more is sent until retry_at."""
+
+
+class AdaptiveBatch:
+    """
+    Rows per /sync/* request, sized AIMD-style: it grows by `step` after every
+    accepted batch and halves when the backend pushes back, and it never exceeds
+    the maximum the backend advertises in X-Sync-Max-Batch (or `ceiling` until it
+    has said).
+    """
+
+    def __init__(self, start: int = 500, floor: int = 50, step: int = 250, ceiling: int = 5000):
+        self.value = start
+        self.floor = floor
+        self.step = step
+        self.ceiling = ceiling
+
+    def size(self) -> int:
+        return min(self.value, self.ceiling)
+
+    def grow(self):
+        self.value = self.size() + self.step
+
+    def shrink(self):
+        self.value = max(self.floor, self.size() // 2)
+
 
 class SyncWorker(QThread):
+    # change feed pages pulled per cycle; a long catch-up continues next cycle
+    MAX_PULL_PAGES = 20
+    # blink batches pushed per cycle; a big backlog drains over a few cycles
+    MAX_PUSH_BATCHES = 20
+    # longest Retry-After honoured as given; anything longer is clamped
+    MAX_RETRY_AFTER = 15 * 60
+
     def __init__(self, user: User, interval_seconds: int = 60):
         super().__init__()
         self.user = user
+        self.base_interval = interval_seconds
         self.interval = interval_seconds
+        # local retention (fold, vacuum) between cycles; the resource governor defers it
+        self.maintenance = True
         self.running = True
+        self.batch = AdaptiveBatch()
+        self.retry_at = 0.0
+        self._wake = threading.Event()
 
     def run(self):
         while self.running:
             try:
-                self._sync_sessions()
-                self._sync_blinks()
+                if time.monotonic() >= self.retry_at:
+                    self._sync_deletions()
+                    self._sync_sessions()
+                    self._sync_blinks()
+                    self._pull_changes()
             except Exception:
                 # yaha pe we are failing silently so it can try again next cycle even if the user is offline
                 pass
-            time.sleep(self.interval)
+            if self.maintenance:
+                try:
+                    self._maintain()
+                except Exception:
+                    pass
+            self._wake.wait(max(self.interval, self.retry_at - time.monotonic()))
+            self._wake.clear()
 
     def stop(self):
         self.running = False
+        self._wake.set()
+
+    def pace(self, interval_factor: float = 1.0, maintenance: bool = True):
+        """
+        Stretch the time between sync cycles and allow or defer local retention
+        work. The resource governor calls this on battery or under load. Going
+        back to a shorter interval syncs straight away, to catch up.
+        """
+        interval = self.base_interval * interval_factor
+        shorter = interval < self.interval
+        self.interval, self.maintenance = interval, maintenance
+        if shorter:
+            self._wake.set()
+
+    def _admission(self, resp: requests.Response):
+        """Follow the backend's advertised limits, and back off when it refuses a request."""
+        max_batch = resp.headers.get("X-Sync-Max-Batch")
+        if max_batch and max_batch.isdigit():
+            self.batch.ceiling = int(max_batch)
+        if resp.status_code in (413, 429, 503):
+            self.batch.shrink()
+        metrics.gauge("sync.batch_size").set(self.batch.size())
+        if resp.status_code in (429, 503):
+            retry_after = resp.headers.get("Retry-After", "")
+            delay = int(retry_after) if retry_after.isdigit() else self.interval
+            self.retry_at = time.monotonic() + min(delay, self.MAX_RETRY_AFTER)
+            metrics.counter("sync.throttled").inc()
+            raise ServerBusy(resp.status_code)
+
+    def _post(self, name: str, path: str, payload: list | dict, method: str = "POST") -> requests.Response:
+        """Send a json payload, recording payload size, round-trip time and rows/sec under sync.<name>.*"""
+        body = json.dumps(payload).encode()
+        rows = len(payload) if isinstance(payload, list) else 1
+        metrics.histogram(f"sync.{name}.payload_bytes", BYTES_BUCKETS).observe(len(body))
+        started = time.perf_counter()
+        try:
+            resp = requests.request(
+                method,
+                f"{API_BASE_URL}{path}",
+                data=body,
+                headers={
+                    "Authorization": f"Bearer {self.user.token}",
+                    "Content-Type": "application/json",
+                },
+                timeout=10,
+            )
+        except requests.RequestException:
+            metrics.counter(f"sync.{name}.errors").inc()
+            raise
+        elapsed = time.perf_counter() - started
+        metrics.histogram(f"sync.{name}.rtt_ms").observe(elapsed * 1000)
+        if resp.status_code == 200:
+            metrics.counter(f"sync.{name}.rows").inc(rows)
+            if elapsed > 0:
+                metrics.histogram(f"sync.{name}.rows_per_sec", RATE_BUCKETS).observe(rows / elapsed)
+        else:
+            metrics.counter(f"sync.{name}.http_{resp.status_code}").inc()
+        if path.startswith("/sync/"):
+            self._admission(resp)
+        return resp
+
+    def _maintain(self):
+        """One bounded step of local retention (fold, purge, incremental vacuum) between syncs."""
+        idle = local_db.get_active_session(self.user.email) is None
+        local_retention.run_step(idle)
+
+    def _get(self, name: str, path: str, params: dict) -> requests.Response:
+        started = time.perf_counter()
+        try:
+            resp = requests.get(
+                f"{API_BASE_URL}{path}",
+                params=params,
+                headers={"Authorization": f"Bearer {self.user.token}"},
+                timeout=10,
+            )
+        except requests.RequestException:
+            metrics.counter(f"sync.{name}.errors").inc()
+            raise
+        metrics.histogram(f"sync.{name}.rtt_ms").observe_since(started)
+        if resp.status_code != 200:
+            metrics.counter(f"sync.{name}.http_{resp.status_code}").inc()
+        return resp
+
+    def _pull_changes(self):
+        """Apply sessions created, changed or deleted on other devices since the last pull."""
+        if not self.user.token:
+            return
+
+        since = int(local_db.get_sync_state(self.user.email, "changes_version") or 0)
+        for _ in range(self.MAX_PULL_PAGES):
+            resp = self._get("changes", "/changes", {"since": since, "limit": 500})
+            if resp.status_code != 200:
+                return
+            feed = resp.json()
+            if feed.get("reset"):
+                # deletes we never saw were already purged on the backend: reconcile
+                # against the sessions that still exist, then start over
+                live = self._get("session_ids", "/sessions/ids", {})
+                if live.status_code != 200:
+                    return
+                removed = local_db.reset_changes(self.user.email, live.json()["ids"])
+                metrics.counter("sync.changes.reset_removed").inc(removed)
+                since = 0
+                continue
+            touched = local_db.apply_changes(self.user.email, feed["changes"], feed["version"])
+            metrics.counter("sync.changes.applied").inc(touched)
+            since = feed["version"]
+            if not feed["more"]:
+                return
+
+    def _sync_deletions(self):
+        """Send session tombstones, then purge the ones the backend acknowledged."""
+        if not self.user.token:
+            return
+
+        rows = local_db.get_deleted_sessions(self.user.email)
+        if not rows:
+            return
+
+        # never synced: nothing to tell the backend
+        local_db.purge_sessions([local_id for local_id, cloud_id in rows if cloud_id is None])
+        by_cloud_id = {cloud_id: local_id for local_id, cloud_id in rows if cloud_id is not None}
+        if not by_cloud_id:
+            return
+
+        cloud_ids = list(by_cloud_id)
+        while cloud_ids:
+            chunk = cloud_ids[:self.batch.size()]
+            resp = self._post("deletions", "/sync/deletions", chunk)
+            if resp.status_code == 413 and self.batch.size() < len(chunk):
+                continue
+            if resp.status_code != 200:
+                return
+            acked = resp.json().get("ids", [])
+            local_db.purge_sessions([by_cloud_id[i] for i in acked if i in by_cloud_id])
+            cloud_ids = cloud_ids[len(chunk):]
 
     def _sync_sessions(self):
         """Sync unsynced sessions to cloud."""
@@ -34,56 +227,89 @@ class SyncWorker(QThread):
         if not sessions:
             return
 
+        # sessions already in the cloud were ended (or renamed) since their last sync
+        for row in sessions:
+            local_id, _, name, _, end_time, cloud_id = row[:6]
+            if cloud_id is None:
+                continue
+            update = {"name": name, "end_time": end_time}
+            if end_time:
+                # the blinks are still on their way, so send the complete summary with the end
+                update.update(zip(SUMMARY_FIELDS, row[6:]))
+            resp = self._post("session_updates", f"/sessions/{cloud_id}", update, method="PATCH")
+            if resp.status_code in (200, 404):
+                # 404: deleted in the cloud, nothing left to update
+                local_db.mark_session_synced(local_id)
+
+        new_sessions = [row for row in sessions if row[5] is None]
+        if not new_sessions:
+            return
+
         payload = []
-        for (local_id, user_email, name, start_time, end_time) in sessions:
+        for (local_id, user_email, name, start_time, end_time, _cloud_id,
+             total_blinks, duration_seconds, mean_rate, peak_rate, longest_gap_seconds) in new_sessions:
             payload.append({
                 "id": local_id,  # We'll use this to map back
                 "name": name,
                 "start_time": start_time,
                 "end_time": end_time,
             })
+            if end_time:
+                # the summary is complete locally, so the backend doesn't need to wait for the blinks
+                payload[-1].update({
+                    "total_blinks": total_blinks,
+                    "duration_seconds": duration_seconds,
+                    "mean_rate": mean_rate,
+                    "peak_rate": peak_rate,
+                    "longest_gap_seconds": longest_gap_seconds,
+                })
 
-        resp = requests.post(
-            f"{API_BASE_URL}/sync/sessions",
-            json=payload,
-            headers={"Authorization": f"Bearer {self.user.token}"},
-            timeout=10,
-        )
-        if resp.status_code == 200:
+        while payload:
+            n = self.batch.size()
+            resp = self._post("sessions", "/sync/sessions", payload[:n])
+            if resp.status_code == 413 and self.batch.size() < min(n, len(payload)):
+                continue
+            if resp.status_code != 200:
+                return
             data = resp.json()
             # Map local IDs to cloud IDs
             cloud_ids = data.get("ids", [])
-            for i, (local_id, _, _, _, _) in enumerate(sessions):
+            for i, (local_id, *_rest) in enumerate(new_sessions[:n]):
                 if i < len(cloud_ids):
                     cloud_id = cloud_ids[i]
                 else:
                     cloud_id = None
                 local_db.mark_session_synced(local_id, cloud_id)
+            payload, new_sessions = payload[n:], new_sessions[n:]
 
     def _sync_blinks(self):
         """Sync unsynced blinks to cloud."""
         if not self.user.token:
             return
 
-        rows = local_db.get_unsynced_blinks(self.user.email)
-        if not rows:
-            return
+        for _ in range(self.MAX_PUSH_BATCHES):
+            limit = self.batch.size()
+            rows = local_db.get_unsynced_blinks(self.user.email, limit)
+            if not rows:
+                return
 
-        payload = [
-            {
-                "timestamp": ts,
-                "count": count,
-                "session_id": session_id
-            }
-            for (_id, ts, count, session_id) in rows
-        ]
-
-        resp = requests.post(
-            f"{API_BASE_URL}/sync/blinks",
-            json=payload,
-            headers={"Authorization": f"Bearer {self.user.token}"},
-            timeout=10,
-        )
-        if resp.status_code == 200:
+            payload = [
+                {
+                    "timestamp": ts,
+                    "count": count,
+                    "session_id": cloud_session_id
+                }
+                # blinks go out under the cloud session id, not the local one
+                for (_id, ts, count, cloud_session_id) in rows
+            ]
+
+            resp = self._post("blinks", "/sync/blinks", payload)
+            if resp.status_code == 413 and self.batch.size() < len(rows):
+                continue
+            if resp.status_code != 200:
+                return
             ids = [row[0] for row in rows]
-            local_db.mark_blinks_synced(ids)
\ No newline at end of file
+            local_db.mark_blinks_synced(ids)
+            if len(rows) < limit:
+                return
+            self.batch.grow()
\ No newline at end of file
@@ -1,66 +1,245 @@
-import cv2
-import mediapipe as mp
-import numpy as np
+import os
+import threading
+import time
 from PyQt6.QtCore import QThread, pyqtSignal
-import mediapipe.python.solutions.face_mesh as mp_face_mesh
+from services.instrumentation import metrics
+from threaded.inference_backends import capped_width, consec_frames_for, create_backend
+
+# keep the webcam open between sessions so START SESSION skips the camera open;
+# off by default since it keeps the camera light on while idle
+KEEP_CAMERA_WARM = os.getenv("LUMINA_KEEP_CAMERA_WARM", "0") == "1"
+# frames wider than this are downscaled into a fixed buffer before inference; 0 disables.
+# FaceMesh runs on a 192x192 crop internally, so 640 costs no accuracy at webcam distances
+INFERENCE_WIDTH = int(os.getenv("LUMINA_TRACKER_INFERENCE_WIDTH", "640"))
+# face/eye model, see threaded/inference_backends.py: facemesh, facemesh-lite or eyepatch
+TRACKER_BACKEND = os.getenv("LUMINA_TRACKER_BACKEND", "facemesh")
 
 class EyeTrackerThread(QThread):
+    """
+    Long-lived tracker engine. The thread is started once, loads its model once, and
+    is then paused/resumed per session instead of being torn down, so starting a
+    session doesn't pay for model init (and, with keep_camera_warm, camera open).
+    """
     blink_detected = pyqtSignal(int)
+    ready = pyqtSignal(float)  # seconds from resume() to the first frame with a face
 
-    def __init__(self):
+    def __init__(
+        self,
+        camera_index: int = 0,
+        keep_camera_warm: bool = KEEP_CAMERA_WARM,
+        inference_width: int = INFERENCE_WIDTH,
+        backend: str = TRACKER_BACKEND,
+    ):
         super().__init__()
         self.running = True
         self.blink_count = 0
-        # MediaPipe Landmark Indices
-        self.LEFT_EYE = [33, 160, 158, 133, 153, 144]
-        self.RIGHT_EYE = [362, 385, 387, 263, 373, 380]
+        self.camera_index = camera_index
+        self.keep_camera_warm = keep_camera_warm
+        self.inference_width = inference_width
+        self.backend = backend
         self.EAR_THRESH = 0.21
         self.CONSEC_FRAMES = 2
+        # set by set_limits (the resource governor); 0 means no cap
+        self.max_fps = 0.0
+        self.max_width = 0
+
+        self._cond = threading.Condition()
+        self._active = False
+        self._resumed_at: float | None = None
+        # bumped by every resume() that starts a session; run() resets the
+        # per-session state when it sees a new one
+        self._generation = 0
+
+        # counters
+        self.model_load_seconds: float | None = None
+        self.camera_open_seconds: float | None = None
+        self.time_to_first_ready_seconds: float | None = None
+        self.resumes = 0
+        self.buffer_allocations = 0
+        self.buffer_bytes = 0
+
+    def set_limits(self, max_fps: float = 0, max_width: int = 0):
+        """Cap frames per second and inference width (0: no cap); applies from the next frame."""
+        self.max_fps = max_fps
+        self.max_width = max_width
 
-    def euclidean_dist(self, pt1, pt2):
-        return np.linalg.norm(np.array(pt1) - np.array(pt2))
+    def warm_up(self):
+        """Start the engine paused: imports the vision stack and loads the model only."""
+        if not self.isRunning():
+            self.start()
 
-    def eye_aspect_ratio(self, eye_landmarks):
-        A = self.euclidean_dist(eye_landmarks[1], eye_landmarks[5])
-        B = self.euclidean_dist(eye_landmarks[2], eye_landmarks[4])
-        C = self.euclidean_dist(eye_landmarks[0], eye_landmarks[3])
-        return (A + B) / (2.0 * C)
+    def resume(self):
+        """Begin (or continue) detecting blinks; starts the engine on first call."""
+        with self._cond:
+            if not self._active:
+                self._active = True
+                self._resumed_at = time.perf_counter()
+                self._generation += 1
+                self.resumes += 1
+            self._cond.notify_all()
+        self.warm_up()
+
+    def pause(self):
+        """Stop detecting blinks but keep the model (and optionally the camera) loaded."""
+        with self._cond:
+            self._active = False
+            self._cond.notify_all()
+
+    def is_active(self) -> bool:
+        return self._active
+
+    def stats(self) -> dict:
+        def ms(v):
+            return round(v * 1000, 1) if v is not None else None
+        return {
+            "backend": self.backend,
+            "model_load_ms": ms(self.model_load_seconds),
+            "camera_open_ms": ms(self.camera_open_seconds),
+            "time_to_first_ready_ms": ms(self.time_to_first_ready_seconds),
+            "resumes": self.resumes,
+            "max_fps": self.max_fps,
+            "inference_width": capped_width(self.inference_width, self.max_width),
+            "buffer_allocations": self.buffer_allocations,
+            "buffer_mb": round(self.buffer_bytes / (1024 * 1024), 2),
+        }
 
     def run(self):
-        cap = cv2.VideoCapture(0)
+        # imported here so the GUI can start without the vision stack;
+        # VisionPreloader usually has them in sys.modules already
+        import cv2
+        import numpy as np
+
+        model, self.model_load_seconds = create_backend(self.backend)
+
+        cap = None
         frame_counter = 0
-        # mp_face_mesh = mp.solutions.face_mesh
-        # mp_face_mesh = mp.solutions.face_mesh
-        with mp_face_mesh.FaceMesh(
-            max_num_faces=1, refine_landmarks=True,
-            min_detection_confidence=0.5, min_tracking_confidence=0.5
-        ) as face_mesh:
+        # reused every frame: capture, optional downscale, and RGB conversion all write
+        # into these instead of allocating ~2.7 MB per 720p frame
+        frame = None
+        small = None
+        rgb = None
+        awaiting_ready = False
+        generation = 0
+
+        # resolved once so the per-frame cost is just the observe() calls
+        capture_ms = metrics.histogram("tracker.capture_ms")
+        convert_ms = metrics.histogram("tracker.convert_ms")
+        inference_ms = metrics.histogram("tracker.inference_ms")
+        frame_ms = metrics.histogram("tracker.frame_ms")
+        frames = metrics.counter("tracker.frames")
+        skipped = metrics.counter("tracker.frames_skipped")
+        last_frame = 0.0
+        faces = metrics.counter("tracker.frames_with_face")
+        blinks = metrics.counter("tracker.blinks")
+        allocs = metrics.counter("tracker.buffer_allocations")
+        alloc_bytes = metrics.counter("tracker.buffer_alloc_bytes")
+
+        def track_alloc(buf):
+            self.buffer_allocations += 1
+            self.buffer_bytes += buf.nbytes
+            allocs.inc()
+            alloc_bytes.inc(buf.nbytes)
+        metrics.gauge("tracker.model_load_ms").set(round(self.model_load_seconds * 1000, 1))
+        try:
             while self.running:
-                ret, frame = cap.read()
-                if not ret: break
+                if not self._active:
+                    if cap is not None and not self.keep_camera_warm:
+                        cap.release()
+                        cap = None
+                    with self._cond:
+                        while self.running and not self._active:
+                            # a warm camera keeps grabbing so frames aren't stale on resume
+                            self._cond.wait(timeout=0.2 if cap is not None else None)
+                            if cap is not None and not self._active:
+                                cap.grab()
+                    if not self.running:
+                        break
+
+                if generation != self._generation:
+                    # new session (possibly resumed before warm-up, or paused and resumed
+                    # within one frame): fresh per-session counters
+                    generation = self._generation
+                    self.blink_count = 0
+                    frame_counter = 0
+                    awaiting_ready = True
+
+                if cap is None:
+                    t0 = time.perf_counter()
+                    cap = cv2.VideoCapture(self.camera_index)
+                    self.camera_open_seconds = time.perf_counter() - t0
+                    metrics.gauge("tracker.camera_open_ms").set(round(self.camera_open_seconds * 1000, 1))
+
+                max_fps = self.max_fps
+                if max_fps and time.perf_counter() - last_frame < 1.0 / max_fps:
+                    # over the cap: take the frame off the camera without decoding it
+                    if cap.grab():
+                        skipped.inc()
+                        continue
+
+                t_frame = last_frame = time.perf_counter()
+                ret, out = cap.read(frame)
+                capture_ms.observe_since(t_frame)
+                if ret and out is not frame:
+                    # first frame, or the camera changed resolution
+                    frame = out
+                    track_alloc(frame)
+                if not ret:
+                    # camera unplugged or busy: let go of it and retry shortly
+                    cap.release()
+                    cap = None
+                    time.sleep(0.5)
+                    continue
+
+                t0 = time.perf_counter()
+                src = frame
+                h, w, _ = frame.shape
+                width = capped_width(self.inference_width, self.max_width)
+                if width and w > width:
+                    sh = round(h * width / w)
+                    if small is None or small.shape[:2] != (sh, width):
+                        small = np.empty((sh, width, 3), dtype=np.uint8)
+                        track_alloc(small)
+                    cv2.resize(frame, (width, sh), dst=small, interpolation=cv2.INTER_AREA)
+                    src = small
+                if rgb is None or rgb.shape != src.shape:
+                    rgb = np.empty_like(src)
+                    track_alloc(rgb)
+                cv2.cvtColor(src, cv2.COLOR_BGR2RGB, dst=rgb)
+                convert_ms.observe_since(t0)
 
-                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = face_mesh.process(rgb)
+                t0 = time.perf_counter()
+                detected = model.process(rgb)
+                inference_ms.observe_since(t0)
+                frames.inc()
 
-                if results.multi_face_landmarks: #type:ignore
-                    h, w, _ = frame.shape
-                    face_landmarks = results.multi_face_landmarks[0] #type:ignore
-                    
-                    l_eye = [(int(face_landmarks.landmark[i].x * w), int(face_landmarks.landmark[i].y * h)) for i in self.LEFT_EYE]
-                    r_eye = [(int(face_landmarks.landmark[i].x * w), int(face_landmarks.landmark[i].y * h)) for i in self.RIGHT_EYE]
-                    
-                    ear = (self.eye_aspect_ratio(l_eye) + self.eye_aspect_ratio(r_eye)) / 2.0
+                if detected:
+                    faces.inc()
+                    if awaiting_ready and self._resumed_at is not None:
+                        awaiting_ready = False
+                        self.time_to_first_ready_seconds = time.perf_counter() - self._resumed_at
+                        metrics.gauge("tracker.time_to_first_ready_ms").set(round(self.time_to_first_ready_seconds * 1000, 1))
+                        self.ready.emit(self.time_to_first_ready_seconds)
 
+                    ear = detected[0].ear
                     if ear < self.EAR_THRESH:
                         frame_counter += 1
                     else:
-                        if frame_counter >= self.CONSEC_FRAMES:
+                        if frame_counter >= consec_frames_for(max_fps, self.CONSEC_FRAMES):
                             self.blink_count += 1
+                            blinks.inc()
                             self.blink_detected.emit(self.blink_count)
                         frame_counter = 0
 
-        cap.release()
+                frame_ms.observe_since(t_frame)
+        finally:
+            if cap is not None:
+                cap.release()
+            model.close()
 
     def stop(self):
-        self.running = False
-        self.wait()
\ No newline at end of file
+        """Shut the engine down for good (app exit)."""
+        with self._cond:
+            self.running = False
+            self._active = False
+            self._cond.notify_all()
+        self.wait()
@@ -0,0 +1,19 @@
+import time
+from PyQt6.QtCore import QThread, pyqtSignal
+from services import startup_profile
+
+class VisionPreloader(QThread):
+    """
+    Imports OpenCV and MediaPipe off the GUI thread so the first START SESSION
+    doesn't pay for them. Importing is idempotent, so the tracker can still import
+    them itself if a session starts before this finishes.
+    """
+    loaded = pyqtSignal(float)  # seconds spent importing
+
+    def run(self):
+        started = time.perf_counter()
+        import cv2  # noqa: F401
+        import mediapipe.python.solutions.face_mesh  # noqa: F401
+        elapsed = time.perf_counter() - started
+        startup_profile.mark("vision stack preloaded")
+        self.loaded.emit(elapsed)
@@ -1,17 +1,36 @@
+import os
 import psutil
 from datetime import datetime
 from PyQt6.QtWidgets import QVBoxLayout, QLabel, QWidget, QFrame, QPushButton, QHBoxLayout
 from PyQt6.QtCore import QTimer, Qt
+from PyQt6.QtGui import QKeySequence, QShortcut
 from threaded.tracker import EyeTrackerThread
+from threaded.multi_tracker import MultiTrackerThread, MULTI_TRACKER
+from threaded.inference_process import ProcessEyeTracker, TRACKER_PROCESS
 from threaded.sync_worker import SyncWorker
+from threaded.live_streamer import LiveStreamer, LIVE_STREAM
+from threaded.vision_preloader import VisionPreloader
 from services.auth_service import User
+from services.blink_rate import BREAK_REMINDERS, BlinkRate, BreakReminder, format_rates
+from services import startup_profile
+from services.instrumentation import flush_gc_events, metrics
+from services.resource_governor import GOVERNOR, Level, ResourceGovernor
+from services.track_sessions import TrackSessionRouter
+from windows.debug_panel import DebugPanel
+from windows.history_panel import HistoryPanel
 import services.local_db as local_db 
 
+# set LUMINA_PRELOAD_VISION=0 to defer loading OpenCV/MediaPipe until the first session starts
+PRELOAD_VISION = os.getenv("LUMINA_PRELOAD_VISION", "1") != "0"
+PRELOAD_DELAY_MS = 1500
+
 class DashboardWidget(QWidget):
-    def __init__(self, user: User):
+    def __init__(self, user: User, prefetched: dict | None = None):
         super().__init__()
         self.user = user
         self.current_session_id = None
+        # local data read in parallel with login (threaded.auth_worker.prefetch_dashboard)
+        self._prefetched = prefetched if prefetched and prefetched.get("email") == user.email else None
 
         # this is the in-memory buffer for batching blink writes
         self._pending_samples: list[tuple[str, int]] = []  # (timestamp, count)
@@ -20,13 +39,35 @@ class DashboardWidget(QWidget):
         self.setStyleSheet("background-color: #0F0F0F; color: #FFFFFF;")
         self._init_ui()
 
-        # initialize tracker (but don't start it yet)
-        self.tracker = EyeTrackerThread()
-        self.tracker.blink_detected.connect(self.update_blinks)
+        # the tracker (and with it cv2/mediapipe) is created on first use
+        self.tracker: EyeTrackerThread | ProcessEyeTracker | MultiTrackerThread | None = None
+        # shared-station mode (LUMINA_TRACKER_SOURCES / LUMINA_TRACKER_MAX_FACES): one session per tracked face
+        self.track_sessions = TrackSessionRouter(self.user.email) if MULTI_TRACKER else None
+        self.multi_tracking = False
+        self.vision_preloader: VisionPreloader | None = None
+        self.debug_panel: DebugPanel | None = None
+        self.history_panel: HistoryPanel | None = None
+        self._baseline_rss_mb: float | None = None
+
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self).activated.connect(self._toggle_debug_panel)
+        QShortcut(QKeySequence("Ctrl+H"), self).activated.connect(self._show_history)
 
         # start background sync worker
         self.sync_worker = SyncWorker(user=self.user)
         self.sync_worker.start()
+        self.live_streamer = LiveStreamer(user=self.user) if LIVE_STREAM else None
+        if self.live_streamer is not None:
+            self.live_streamer.start()
+
+        # caps tracker fps/resolution and defers sync on battery, under load or when hot
+        self.governor = ResourceGovernor() if GOVERNOR else None
+        if self.governor is not None:
+            metrics.register_provider("governor", self.governor.stats)
+
+        # rolling blinks/min of the running session, kept in memory and fed by blink signals only
+        self.blink_rate = BlinkRate()
+        self.break_reminder = BreakReminder() if BREAK_REMINDERS else None
+        metrics.register_provider("blink_rate", self._blink_rate_stats)
 
         # cpu and memory performance timer
         self.stats_timer = QTimer(self)
@@ -36,10 +77,17 @@ class DashboardWidget(QWidget):
         # this is the flush buffer timer (every 5 seconds, even if batch isn't full)
         self.flush_timer = QTimer(self)
         self.flush_timer.timeout.connect(self._flush_local_blinks)
+        self.flush_timer.timeout.connect(self._update_pending)
         self.flush_timer.start(5000)
 
         # check if there's an active session on load
         self._check_active_session()
+        self._update_pending(self._prefetched["pending"] if self._prefetched else None)
+        self._prefetched = None
+
+        # warm the vision imports in the background once the window has painted
+        if PRELOAD_VISION and self.tracker is None:
+            QTimer.singleShot(PRELOAD_DELAY_MS, self._preload_vision)
 
     def _init_ui(self):
         main_layout = QVBoxLayout()
@@ -107,8 +155,42 @@ class DashboardWidget(QWidget):
 
         blink_layout.addWidget(title, alignment=Qt.AlignmentFlag.AlignCenter)
         blink_layout.addWidget(self.count_label, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.rate_label = QLabel(format_rates({60: None, 300: None, 900: None}))
+        self.rate_label.setStyleSheet("color: #AAA; font-size: 12px; font-family: monospace; border: none;")
+        blink_layout.addWidget(self.rate_label, alignment=Qt.AlignmentFlag.AlignCenter)
         main_layout.addWidget(blink_box)
 
+        self.reminder_label = QLabel("")
+        self.reminder_label.setWordWrap(True)
+        self.reminder_label.setStyleSheet("color: #FFB020; font-size: 13px; font-weight: bold;")
+        self.reminder_label.setVisible(False)
+        main_layout.addWidget(self.reminder_label)
+
+        self.tracks_label = QLabel("TRACKED FACES: 0")
+        self.tracks_label.setStyleSheet("color: #AAA; font-size: 13px; font-family: monospace;")
+        self.tracks_label.setVisible(MULTI_TRACKER)
+        main_layout.addWidget(self.tracks_label)
+
+        history_button = QPushButton("VIEW HISTORY")
+        history_button.setStyleSheet("""
+            QPushButton {
+                background-color: #333;
+                color: #FFF;
+                font-size: 12px;
+                padding: 8px 16px;
+                border-radius: 8px;
+            }
+            QPushButton:hover {
+                background-color: #444;
+            }
+        """)
+        history_button.clicked.connect(self._show_history)
+        main_layout.addWidget(history_button)
+
+        self.pending_label = QLabel("")
+        self.pending_label.setStyleSheet("color: #888; font-size: 11px;")
+        main_layout.addWidget(self.pending_label)
+
         # System metrics section
         self.cpu_label = QLabel("CPU USAGE: 0%")
         self.mem_label = QLabel("MEMORY: 0 MB")
@@ -120,17 +202,31 @@ class DashboardWidget(QWidget):
 
     def _check_active_session(self):
         """Check if there's an active session and restore state."""
-        active_id = local_db.get_active_session(self.user.email)
+        if self.track_sessions is not None:
+            # faces can't be re-identified across restarts, so close sessions left open by a crash
+            while (stale_id := local_db.get_active_session(self.user.email)) is not None:
+                local_db.end_session(stale_id)
+            return
+        if self._prefetched is not None:
+            active_id = self._prefetched["active_session_id"]
+        else:
+            active_id = local_db.get_active_session(self.user.email)
         if active_id:
             self.current_session_id = active_id
+            self._start_rate()
             self._start_tracking()
 
     def start_session(self):
         """Start a new tracking session."""
-        if self.current_session_id:
+        if self.current_session_id or self.multi_tracking:
             return  # Already has active session
-        
-        self.current_session_id = local_db.create_session(self.user.email)
+
+        if self.track_sessions is not None:
+            # sessions are opened per face as tracks are confirmed
+            self.multi_tracking = True
+        else:
+            self.current_session_id = local_db.create_session(self.user.email)
+            self._start_rate()
         self._start_tracking()
         self.status_label.setText("●  SESSION ACTIVE")
         self.status_label.setStyleSheet("color: #00FF88; font-weight: bold; font-size: 11px;")
@@ -139,7 +235,7 @@ class DashboardWidget(QWidget):
 
     def stop_session(self):
         """End the current tracking session."""
-        if not self.current_session_id:
+        if not self.current_session_id and not self.multi_tracking:
             return
         
         # Flush any pending blinks first
@@ -149,8 +245,13 @@ class DashboardWidget(QWidget):
         self._stop_tracking()
         
         # End session
-        local_db.end_session(self.current_session_id)
-        self.current_session_id = None
+        if self.track_sessions is not None:
+            self.track_sessions.end_all()
+            self.multi_tracking = False
+            self.tracks_label.setText("TRACKED FACES: 0")
+        else:
+            local_db.end_session(self.current_session_id)
+            self.current_session_id = None
         
         # Update UI
         self.status_label.setText("●  SESSION INACTIVE")
@@ -158,16 +259,65 @@ class DashboardWidget(QWidget):
         self.start_button.setEnabled(True)
         self.stop_button.setEnabled(False)
         self.count_label.setText("0")
+        self.blink_rate.reset()
+        # _update_rate leaves the banner alone without a session, so clear it here
+        self.reminder_label.setVisible(False)
+        self._update_rate()
+
+    def _preload_vision(self):
+        if self.tracker is not None or self.vision_preloader is not None:
+            return
+        self.vision_preloader = VisionPreloader()
+        self.vision_preloader.loaded.connect(self._on_vision_preloaded)
+        self.vision_preloader.start()
+
+    def _on_vision_preloaded(self, _seconds: float):
+        startup_profile.report("startup profile (after background vision preload)")
+        # load the model too, paused, so the first session starts instantly
+        self._ensure_tracker().warm_up()
+
+    def _ensure_tracker(self) -> EyeTrackerThread | ProcessEyeTracker | MultiTrackerThread:
+        if self.tracker is None:
+            if self.track_sessions is not None:
+                self.tracker = MultiTrackerThread()
+                self.tracker.track_started.connect(self._on_track_started)
+                self.tracker.track_blink.connect(self._on_track_blink)
+                self.tracker.track_lost.connect(self._on_track_lost)
+            else:
+                # LUMINA_TRACKER_PROCESS=1 moves capture + inference out of the GUI process
+                self.tracker = ProcessEyeTracker() if TRACKER_PROCESS else EyeTrackerThread()
+                self.tracker.blink_detected.connect(self.update_blinks)
+            metrics.register_provider("tracker", self.tracker.stats)
+            if self.governor is not None and self.governor.level_index:
+                self.tracker.set_limits(self.governor.level.max_fps, self.governor.level.max_width)
+        return self.tracker
 
     def _start_tracking(self):
-        """Start the eye tracker."""
-        if not self.tracker.isRunning():
-            self.tracker.start()
+        """Resume the eye tracker (starting the engine the first time)."""
+        self._ensure_tracker().resume()
 
     def _stop_tracking(self):
-        """Stop the eye tracker."""
-        if self.tracker.isRunning():
-            self.tracker.stop()
+        """Pause the eye tracker; the model stays loaded for the next session."""
+        if self.tracker is not None:
+            self.tracker.pause()
+
+    def _on_track_started(self, key: str, label: str):
+        if self.track_sessions is None or not self.multi_tracking:
+            return
+        self.track_sessions.start(key, label)
+        self.tracks_label.setText(f"TRACKED FACES: {len(self.track_sessions.sessions)}")
+
+    def _on_track_blink(self, key: str, count: int):
+        if self.track_sessions is None or not self.multi_tracking:
+            return
+        self.track_sessions.add_blink(key, count)
+        self.count_label.setText(str(self.track_sessions.total_blinks))
+
+    def _on_track_lost(self, key: str):
+        if self.track_sessions is None:
+            return
+        self.track_sessions.end(key)
+        self.tracks_label.setText(f"TRACKED FACES: {len(self.track_sessions.sessions)}")
 
     def update_blinks(self, count: int):
         """Update blink count. Only works if session is active."""
@@ -175,9 +325,12 @@ class DashboardWidget(QWidget):
             return  # don't track if no active session
         
         self.count_label.setText(str(count))
+        self.blink_rate.add()
         # add to in-memory buffer instead of writing immediately
         ts = datetime.now().isoformat()
         self._pending_samples.append((ts, count))
+        if self.live_streamer is not None:
+            self.live_streamer.offer(self.current_session_id, ts, count)
         
         # flush if buffer reaches batch size
         if len(self._pending_samples) >= self._batch_size:
@@ -185,6 +338,8 @@ class DashboardWidget(QWidget):
 
     def _flush_local_blinks(self):
         """Flush pending blink samples to local DB in a single batch."""
+        if self.track_sessions is not None:
+            self.track_sessions.flush()
         if not self._pending_samples or not self.current_session_id:
             return
         
@@ -196,11 +351,81 @@ class DashboardWidget(QWidget):
         local_db.save_blinks_batch(self.user.email, samples, self.current_session_id)
         self._pending_samples.clear()
 
+    def _update_pending(self, counts: tuple[int, int] | None = None):
+        sessions, blinks = counts if counts is not None else local_db.get_pending_counts(self.user.email)
+        self.pending_label.setText(f"Waiting to sync: {sessions} sessions · {blinks} blinks" if sessions or blinks else "All data synced")
+
     def update_stats(self):
         cpu = psutil.cpu_percent()
         mem = psutil.Process().memory_info().rss / (1024 * 1024)
         self.cpu_label.setText(f"CPU USAGE: {cpu:>5}%")
         self.mem_label.setText(f"MEMORY: {int(mem):>6} MB")
+        metrics.gauge("process.cpu_percent").set(cpu)
+        metrics.gauge("process.rss_mb").set(round(mem, 1))
+        if self._baseline_rss_mb is None:
+            self._baseline_rss_mb = mem
+        metrics.gauge("process.rss_growth_mb").set(round(mem - self._baseline_rss_mb, 1))
+        # GC pauses are queued by the collector callback; record them on the stats tick
+        flush_gc_events()
+        if self.governor is not None:
+            level = self.governor.update(cpu)
+            if level is not None:
+                self._apply_level(level)
+        self._update_rate()
+
+    def _start_rate(self):
+        self.blink_rate.start()
+        if self.break_reminder is not None:
+            self.break_reminder.reset()
+        self.reminder_label.setVisible(False)
+        self._update_rate()
+
+    def _update_rate(self):
+        """Refresh the rolling blink rate display and raise a break reminder when it stays low."""
+        rates = self.blink_rate.rates()
+        self.rate_label.setText(format_rates(rates))
+        for window, value in rates.items():
+            if value is not None:
+                metrics.gauge(f"blink_rate.{window // 60}m").set(value)
+        if self.break_reminder is None or not self.current_session_id:
+            return
+        message = self.break_reminder.check(self.blink_rate, rates)
+        if message is not None:
+            self.reminder_label.setText(f"TIME FOR A BREAK · {message}")
+            self.reminder_label.setVisible(True)
+        elif self.reminder_label.isVisible() and (rates[self.break_reminder.window] or 0) >= self.break_reminder.threshold:
+            self.reminder_label.setVisible(False)
+
+    def _blink_rate_stats(self) -> dict:
+        out = {f"{window // 60}m_per_min": value for window, value in self.blink_rate.rates().items()}
+        out["session_blinks"] = self.blink_rate.total
+        out["covered_s"] = self.blink_rate.covered_seconds()
+        if self.break_reminder is not None:
+            out["reminders"] = self.break_reminder.reminders
+        return out
+
+    def _apply_level(self, level: Level):
+        """Apply a resource governor decision to the tracker and the sync worker."""
+        if self.tracker is not None:
+            self.tracker.set_limits(level.max_fps, level.max_width)
+        self.sync_worker.pace(level.sync_interval_factor, level.maintenance)
+
+    def _toggle_debug_panel(self):
+        if self.debug_panel is None:
+            self.debug_panel = DebugPanel(self)
+        if self.debug_panel.isVisible():
+            self.debug_panel.hide()
+        else:
+            self.debug_panel.show()
+            self.debug_panel.raise_()
+
+    def _show_history(self):
+        # blinks still in the in-memory buffer should show up in the chart
+        self._flush_local_blinks()
+        if self.history_panel is None:
+            self.history_panel = HistoryPanel(self.user.email, self)
+        self.history_panel.show()
+        self.history_panel.raise_()
 
     def closeEvent(self, a0):
         """Flush any remaining samples before closing."""
@@ -208,13 +433,23 @@ class DashboardWidget(QWidget):
             self._flush_local_blinks()
             # we can optionally end session on close, or leave it active
             local_db.end_session(self.current_session_id)
+        if self.track_sessions is not None:
+            self.track_sessions.end_all()
         
         # stop timers and threads
+        if self.debug_panel is not None:
+            self.debug_panel.close()
+        if self.history_panel is not None:
+            self.history_panel.close()
         self.flush_timer.stop()
         self.stats_timer.stop()
-        if hasattr(self, 'tracker'):
+        if self.tracker is not None:
             self.tracker.stop()
+        if self.vision_preloader is not None:
+            self.vision_preloader.wait()
         if hasattr(self, 'sync_worker'):
             self.sync_worker.stop()
+        if self.live_streamer is not None:
+            self.live_streamer.stop()
         if a0:
             a0.accept()
\ No newline at end of file
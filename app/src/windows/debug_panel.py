@@ -0,0 +1,143 @@
+from PyQt6.QtWidgets import (
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QWidget,
+    QPlainTextEdit,
+    QPushButton,
+)
+from PyQt6.QtCore import QTimer, Qt
+from PyQt6.QtGui import QFont
+
+from services.instrumentation import metrics
+from services.sampling_profiler import profiler
+
+
+class DebugPanel(QWidget):
+    """
+    Diagnostics window (Ctrl+Shift+D on the dashboard): live metrics, the sampling
+    profiler toggle, and export of everything to a JSON file for bug reports.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.WindowType.Window)
+        self.setWindowTitle("Lumina Diagnostics")
+        self.resize(560, 640)
+        self.setStyleSheet("background-color: #0F0F0F; color: #FFFFFF;")
+        self._init_ui()
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self._refresh)
+
+    def _init_ui(self):
+        layout = QVBoxLayout()
+        layout.setContentsMargins(12, 12, 12, 12)
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setFont(QFont("monospace", 9))
+        self.text.setStyleSheet("background-color: #1A1A1A; border: none;")
+        layout.addWidget(self.text)
+
+        btn_row = QHBoxLayout()
+        self.profiler_btn = QPushButton()
+        self.profiler_btn.clicked.connect(self._toggle_profiler)
+        btn_row.addWidget(self.profiler_btn)
+
+        reset_btn = QPushButton("Reset Profile")
+        reset_btn.clicked.connect(profiler.reset)
+        btn_row.addWidget(reset_btn)
+
+        btn_row.addStretch(1)
+
+        export_btn = QPushButton("Export")
+        export_btn.clicked.connect(self._export)
+        btn_row.addWidget(export_btn)
+        layout.addLayout(btn_row)
+
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("color: #888; font-size: 11px;")
+        layout.addWidget(self.status_label)
+
+        for btn in self.findChildren(QPushButton):
+            btn.setStyleSheet(
+                "QPushButton { background-color: #333; color: #FFF; border-radius: 6px; padding: 6px 12px; }"
+                "QPushButton:hover { background-color: #444; }"
+            )
+
+        self.setLayout(layout)
+        self._update_profiler_button()
+
+    def showEvent(self, a0):
+        self._refresh()
+        self.refresh_timer.start(1000)
+        super().showEvent(a0)
+
+    def hideEvent(self, a0):
+        self.refresh_timer.stop()
+        super().hideEvent(a0)
+
+    def _update_profiler_button(self):
+        self.profiler_btn.setText("Stop Profiler" if profiler.running else "Start Profiler")
+
+    def _toggle_profiler(self):
+        if profiler.running:
+            profiler.stop()
+        else:
+            profiler.start()
+        self._update_profiler_button()
+
+    def _export(self):
+        path = metrics.export(extra={
+            "profiler": {
+                "samples": profiler.samples,
+                "interval_seconds": profiler.interval,
+                "collapsed_stacks": profiler.collapsed(),
+            }
+        })
+        self.status_label.setText(f"Exported to {path}")
+
+    def _refresh(self):
+        snap = metrics.snapshot()
+        lines = []
+
+        lines.append(f"{'HISTOGRAM':<34}{'n':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>10}")
+        for name, h in snap["histograms"].items():
+            if not h["count"]:
+                continue
+
+            def fmt(v):
+                return f"{v:.3g}" if v is not None else "-"
+            lines.append(f"{name:<34}{h['count']:>8}{fmt(h['p50']):>9}{fmt(h['p95']):>9}{fmt(h['p99']):>9}{fmt(h['max']):>10}")
+
+        lines.append("")
+        lines.append("COUNTERS")
+        for name, value in snap["counters"].items():
+            lines.append(f"  {name:<40}{value:>12}")
+
+        lines.append("")
+        lines.append("GAUGES")
+        for name, value in snap["gauges"].items():
+            lines.append(f"  {name:<40}{value!s:>12}")
+
+        for provider, values in snap["providers"].items():
+            lines.append("")
+            lines.append(provider.upper())
+            for name, value in values.items():
+                lines.append(f"  {name:<40}{value!s:>12}")
+
+        if snap["events"]:
+            lines.append("")
+            lines.append("RECENT EVENTS")
+            for ev in snap["events"][-10:]:
+                lines.append(f"  {ev['time']}  [{ev['kind']}] {ev['message']}")
+
+        if profiler.samples:
+            lines.append("")
+            lines.append(f"PROFILER ({profiler.samples} samples{', running' if profiler.running else ''})")
+            total = sum(n for _, n in profiler.top_functions(1000)) or 1
+            for frame, n in profiler.top_functions(12):
+                lines.append(f"  {n / total * 100:5.1f}%  {frame}")
+
+        self.text.setPlainText("\n".join(lines))
+        self._update_profiler_button()
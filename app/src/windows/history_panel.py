@@ -0,0 +1,245 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from PyQt6.QtWidgets import (
+    QVBoxLayout,
+    QLabel,
+    QWidget,
+    QListView,
+    QAbstractItemView,
+)
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QRectF
+from PyQt6.QtGui import QColor, QPainter
+
+import services.local_db as local_db
+
+PAGE_SIZE = 50
+MAX_PAGES = 8
+CHART_CACHE_SIZE = 32
+
+
+def _fmt_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    minutes = int(seconds // 60)
+    if minutes >= 60:
+        return f"{minutes // 60}h {minutes % 60:02d}m"
+    return f"{minutes}m {int(seconds % 60):02d}s"
+
+
+class SessionHistoryModel(QAbstractListModel):
+    """
+    Sessions newest first, fetched a page at a time. The view calls canFetchMore()
+    / fetchMore() as the user scrolls near the end, and each page is a keyset seek
+    (local_db.get_sessions_page), so deep pages cost no more than the first. Rows
+    are the precomputed per-session summaries, so nothing reads blink samples here.
+
+    Only max_pages pages are held at once, least recently read first out; the view
+    reads the rows it paints, so the pages kept are the ones around the viewport.
+    Each page's keyset cursor is kept, so an evicted page is read back with the
+    same single seek when it scrolls into view again. Memory stays flat however
+    far the user scrolls: one (start_time, id) cursor per page plus max_pages pages.
+    """
+    SessionIdRole = Qt.ItemDataRole.UserRole + 1
+    RowRole = Qt.ItemDataRole.UserRole + 2
+
+    def __init__(self, user_email: str, page_size: int = PAGE_SIZE, max_pages: int = MAX_PAGES, parent=None):
+        super().__init__(parent)
+        self.user_email = user_email
+        self.page_size = page_size
+        self.max_pages = max_pages
+        # _cursors[p] is the `after` that reads page p (None for the first page)
+        self._cursors: list[Optional[tuple]] = [None]
+        self._pages: OrderedDict[int, list[tuple]] = OrderedDict()
+        self._count = 0
+        self._exhausted = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._count
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        page_no = len(self._cursors) - 1
+        page = self._read_page(page_no)
+        if len(page) < self.page_size:
+            self._exhausted = True
+        if not page:
+            return
+        self._cursors.append((page[-1][2], page[-1][0]))
+        first = self._count
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self._count += len(page)
+        self.endInsertRows()
+
+    def _read_page(self, page_no: int) -> list[tuple]:
+        page = self._pages.get(page_no)
+        if page is not None:
+            self._pages.move_to_end(page_no)
+            return page
+        page = local_db.get_sessions_page(self.user_email, after=self._cursors[page_no], limit=self.page_size)
+        self._pages[page_no] = page
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return page
+
+    def _row(self, row: int) -> Optional[tuple]:
+        page = self._read_page(row // self.page_size)
+        offset = row % self.page_size
+        # a page read back after sessions were deleted can come up short
+        return page[offset] if offset < len(page) else None
+
+    def reload(self):
+        self.beginResetModel()
+        self._cursors = [None]
+        self._pages.clear()
+        self._count = 0
+        self._exhausted = False
+        self.endResetModel()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= self._count:
+            return None
+        row = self._row(index.row())
+        if row is None:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            session_id, name, start_time, end_time, total, duration, mean_rate = row[:7]
+            started = datetime.fromisoformat(start_time)
+            title = name or started.strftime("%a %d %b %Y, %H:%M")
+            if end_time is None:
+                return f"{title}\n  in progress · {total} blinks"
+            rate = f"{mean_rate:.1f}/min" if mean_rate is not None else "-"
+            return f"{title}\n  {_fmt_duration(duration)} · {total} blinks · {rate}"
+        if role == self.SessionIdRole:
+            return row[0]
+        if role == self.RowRole:
+            return row
+        return None
+
+
+class BlinkChart(QWidget):
+    """Bar chart of blinks per minute for one session."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(140)
+        self._minutes: list[tuple[str, int]] = []
+
+    def set_data(self, minutes: list[tuple[str, int]]):
+        self._minutes = minutes
+        self.update()
+
+    def paintEvent(self, a0):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#1A1A1A"))
+        if not self._minutes:
+            painter.setPen(QColor("#666"))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "No blinks recorded")
+            painter.end()
+            return
+
+        # one bar per minute, including minutes with no blinks
+        first = datetime.fromisoformat(self._minutes[0][0])
+        last = datetime.fromisoformat(self._minutes[-1][0])
+        span = int((last - first).total_seconds() // 60) + 1
+        counts = [0] * span
+        for minute, n in self._minutes:
+            counts[int((datetime.fromisoformat(minute) - first).total_seconds() // 60)] = n
+        peak = max(counts) or 1
+
+        margin = 8
+        label_h = 16  # room for the caption above the bars
+        top = margin + label_h
+        width = self.width() - 2 * margin
+        height = self.height() - top - margin
+        bar_w = width / span
+        painter.setPen(QColor("#888"))
+        painter.drawText(margin, margin + 11, f"{span} min · peak {peak}/min")
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor("#00FF88"))
+        for i, n in enumerate(counts):
+            if not n:
+                continue
+            h = height * n / peak
+            painter.drawRect(QRectF(margin + i * bar_w, top + height - h, max(1.0, bar_w - 1), h))
+        painter.end()
+
+
+class HistoryPanel(QWidget):
+    """
+    Session history window: a lazily paged list of sessions and, for the selected
+    one, its summary and a per-minute blink chart. Charts are built from
+    per-minute aggregates and kept in a bounded LRU, so flipping between
+    recently viewed sessions doesn't hit the database again.
+    """
+
+    def __init__(self, user_email: str, parent=None, cache_size: int = CHART_CACHE_SIZE):
+        super().__init__(parent, Qt.WindowType.Window)
+        self.setWindowTitle("Lumina History")
+        self.resize(420, 640)
+        self.setStyleSheet("background-color: #0F0F0F; color: #FFFFFF;")
+        self.cache_size = cache_size
+        self._chart_cache: OrderedDict[int, list[tuple[str, int]]] = OrderedDict()
+
+        self.model = SessionHistoryModel(user_email, parent=self)
+        self._init_ui()
+
+    def _init_ui(self):
+        layout = QVBoxLayout()
+        layout.setContentsMargins(12, 12, 12, 12)
+
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        # every row is two lines, which lets the view skip measuring each row
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.list_view.setStyleSheet(
+            "QListView { background-color: #1A1A1A; border: none; }"
+            "QListView::item { padding: 6px; border-bottom: 1px solid #222; }"
+            "QListView::item:selected { background-color: #333; }"
+        )
+        self.list_view.selectionModel().currentChanged.connect(self._on_current_changed)
+        layout.addWidget(self.list_view, stretch=3)
+
+        self.summary_label = QLabel("Select a session")
+        self.summary_label.setStyleSheet("color: #AAA; font-size: 12px; font-family: monospace;")
+        layout.addWidget(self.summary_label)
+
+        self.chart = BlinkChart()
+        layout.addWidget(self.chart, stretch=1)
+
+        self.setLayout(layout)
+
+    def showEvent(self, a0):
+        # pick up sessions recorded since the panel was last open
+        self.model.reload()
+        super().showEvent(a0)
+
+    def _blink_minutes(self, session_id: int, ended: bool) -> list[tuple[str, int]]:
+        cached = self._chart_cache.get(session_id)
+        if cached is not None:
+            self._chart_cache.move_to_end(session_id)
+            return cached
+        minutes = local_db.get_blink_minutes(session_id)
+        # an active session's chart is still growing, so only ended ones are cached
+        if ended:
+            self._chart_cache[session_id] = minutes
+            if len(self._chart_cache) > self.cache_size:
+                self._chart_cache.popitem(last=False)
+        return minutes
+
+    def _on_current_changed(self, current: QModelIndex, _previous: QModelIndex):
+        row = self.model.data(current, SessionHistoryModel.RowRole)
+        if row is None:
+            return
+        session_id, _name, _start, end_time, total, duration, mean_rate, peak_rate, longest_gap = row
+        rate = f"{mean_rate:.1f}" if mean_rate is not None else "-"
+        self.summary_label.setText(
+            f"blinks {total}   duration {_fmt_duration(duration)}\n"
+            f"mean {rate}/min   peak {peak_rate}/min   longest gap {_fmt_duration(longest_gap)}"
+        )
+        self.chart.set_data(self._blink_minutes(session_id, ended=end_time is not None))
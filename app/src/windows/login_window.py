@@ -10,19 +10,27 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, pyqtSignal
 
-from services.auth_service import AuthService, User, AuthError
+from services.auth_service import AuthService, User
+from threaded.auth_worker import AuthWorker
 
 class LoginWidget(QWidget):
     """
     Login/signup widget used as a centralWidget inside AppWindow.
     """
 
-    authenticated = pyqtSignal(User)
+    authenticated = pyqtSignal(User, object)  # user, dashboard prefetch (may be None)
 
     def __init__(self, auth_service: AuthService):
         super().__init__()
         self.auth_service = auth_service
 
+        # network calls run off the GUI thread; results arrive as signals
+        self.auth_worker = AuthWorker(auth_service, self)
+        self.auth_worker.login_succeeded.connect(self._on_login_succeeded)
+        self.auth_worker.signup_succeeded.connect(self._on_signup_succeeded)
+        self.auth_worker.failed.connect(self._on_failed)
+        self.auth_worker.busy_changed.connect(self._on_busy_changed)
+
         self.setStyleSheet("background-color: #0F0F0F; color: #FFFFFF;")
         self._init_ui()
 
@@ -72,7 +80,7 @@ class LoginWidget(QWidget):
         btn_row = QHBoxLayout()
         btn_row.addStretch(1)
 
-        signup_btn = QPushButton("Sign Up")
+        self.signup_btn = signup_btn = QPushButton("Sign Up")
         signup_btn.setStyleSheet(
             """
             QPushButton {
@@ -90,7 +98,13 @@ class LoginWidget(QWidget):
         signup_btn.clicked.connect(self.handle_signup)
         btn_row.addWidget(signup_btn)
 
-        login_btn = QPushButton("Sign In")
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setStyleSheet(signup_btn.styleSheet())
+        self.cancel_btn.clicked.connect(self.handle_cancel)
+        self.cancel_btn.setVisible(False)
+        btn_row.addWidget(self.cancel_btn)
+
+        self.login_btn = login_btn = QPushButton("Sign In")
         login_btn.setStyleSheet(
             """
             QPushButton {
@@ -122,28 +136,39 @@ class LoginWidget(QWidget):
         password = self.password_input.text()
         consent = self.consent_checkbox.isChecked()
 
-        try:
-            # signup does not log in; it just creates the account.
-            self.auth_service.signup(email, password, consent)
-            QMessageBox.information(self, "Signup Successful", "Account created. Please sign in.")
-        except AuthError as e:
-            self._show_error(str(e))
-        except Exception:
-            QMessageBox.critical(self, "Signup Failed", "An unexpected error occurred.")
+        # signup does not log in; it just creates the account.
+        self.error_label.setText("")
+        self.auth_worker.signup(email, password, consent)
 
     def handle_login(self):
         email = self.email_input.text()
         password = self.password_input.text()
 
-        try:
-            user = self.auth_service.login(email, password)
-        except AuthError as e:
-            self._show_error(str(e))
-            return
-        except Exception:
-            QMessageBox.critical(self, "Login Failed", "An unexpected error occurred.")
-            return
+        # repeated clicks while a login is in flight are deduplicated by the worker
+        self.error_label.setText("")
+        self.auth_worker.login(email, password)
+
+    def handle_cancel(self):
+        self.auth_worker.cancel()
+        self._show_error("Cancelled.")
+
+    def _on_busy_changed(self, busy: bool):
+        ops = self.auth_worker.operations()
+        self.login_btn.setText("Signing in…" if "login" in ops else "Sign In")
+        self.signup_btn.setText("Signing up…" if "signup" in ops else "Sign Up")
+        self.cancel_btn.setVisible(busy)
+
+    def _on_signup_succeeded(self):
+        QMessageBox.information(self, "Signup Successful", "Account created. Please sign in.")
 
+    def _on_login_succeeded(self, user: User, prefetched):
         # now we can just clear any previous error and notify the app
         self.error_label.setText("")
-        self.authenticated.emit(user)
\ No newline at end of file
+        self.authenticated.emit(user, prefetched)
+
+    def _on_failed(self, op: str, message: str, unexpected: bool):
+        if unexpected:
+            title = "Signup Failed" if op == "signup" else "Login Failed"
+            QMessageBox.critical(self, title, "An unexpected error occurred.")
+        else:
+            self._show_error(message)
\ No newline at end of file
@@ -0,0 +1,336 @@
+"""
+Load test for the sync and session endpoints.
+
+Starts a local uvicorn on a throwaway SQLite file (or targets --base-url), creates
+synthetic users and runs N simulated desktop clients. Each client does what the
+desktop app does: a SyncWorker cycle (/sync/sessions then /sync/blinks), dashboard
+reads of /sessions and /sessions/{id} with If-None-Match, and the occasional login.
+
+Per endpoint it reports throughput, p50/p99 latency and DB time (read from the
+Server-Timing header the backend emits with LUMINA_SERVER_TIMING=1). Every run is
+written to bench/results/ tagged with the git commit, so runs can be compared:
+
+    uv run python bench/loadtest.py --clients 20 --duration 30
+    uv run python bench/loadtest.py --compare bench/results/A.json bench/results/B.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+_SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+class Recorder:
+    """Thread-safe per-endpoint collection of latency, DB time and status codes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency_ms = defaultdict(list)
+        self.db_ms = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, status: int, elapsed_ms: float, server_timing: str | None):
+        with self._lock:
+            self.latency_ms[endpoint].append(elapsed_ms)
+            self.statuses[endpoint][status] += 1
+            if server_timing:
+                match = _SERVER_TIMING_DB.search(server_timing)
+                if match:
+                    self.db_ms[endpoint].append(float(match.group(1)))
+                    self.queries[endpoint].append(int(match.group(2)))
+
+
+class Client:
+    """Keep-alive HTTP client for one simulated desktop app."""
+
+    def __init__(self, base_url: str, recorder: Recorder):
+        parsed = urllib.parse.urlparse(base_url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 80
+        self.recorder = recorder
+        self.token: str | None = None
+        self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+
+    def request(self, endpoint: str, method: str, path: str, json_body=None, form=None, headers=None):
+        hdrs = dict(headers or {})
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body)
+            hdrs["Content-Type"] = "application/json"
+        elif form is not None:
+            body = urllib.parse.urlencode(form)
+            hdrs["Content-Type"] = "application/x-www-form-urlencoded"
+        if self.token:
+            hdrs["Authorization"] = f"Bearer {self.token}"
+
+        started = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=body, headers=hdrs)
+            resp = self.conn.getresponse()
+            data = resp.read()
+        except (http.client.HTTPException, OSError):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            self.recorder.record(endpoint, 0, (time.perf_counter() - started) * 1000, None)
+            return 0, {}, b""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.recorder.record(endpoint, resp.status, elapsed_ms, resp.getheader("Server-Timing"))
+        return resp.status, {k.lower(): v for k, v in resp.getheaders()}, data
+
+
+def desktop_client(idx: int, run_id: str, base_url: str, args, recorder: Recorder, stop_at: float):
+    rng = random.Random(idx)
+    client = Client(base_url, recorder)
+    email = f"load-{run_id}-{idx}@example.com"
+    password = "load-test-password"
+
+    client.request("POST /auth/signup", "POST", "/auth/signup",
+                   json_body={"email": email, "password": password, "full_name": None, "consent": True})
+
+    def login():
+        status, _, data = client.request("POST /auth/login", "POST", "/auth/login",
+                                         form={"username": email, "password": password})
+        if status == 200:
+            client.token = json.loads(data)["access_token"]
+
+    login()
+    if not client.token:
+        return
+
+    cloud_ids: list[int] = []
+    etags: dict[str, str] = {}
+    clock = datetime.now() - timedelta(days=rng.randint(0, 90))
+    blink_count = 0
+    cycle = 0
+
+    while time.monotonic() < stop_at:
+        cycle += 1
+
+        # SyncWorker cycle: push the session first, then its blinks
+        start = clock
+        clock += timedelta(seconds=args.batch_size * 3)
+        status, _, data = client.request("POST /sync/sessions", "POST", "/sync/sessions", json_body=[{
+            "id": cycle,
+            "name": None,
+            "start_time": start.isoformat(),
+            "end_time": clock.isoformat(),
+        }])
+        if status == 200:
+            cloud_ids.extend(json.loads(data).get("ids", []))
+        session_id = cloud_ids[-1] if cloud_ids else None
+
+        samples = []
+        for i in range(args.batch_size):
+            blink_count += 1
+            samples.append({
+                "timestamp": (start + timedelta(seconds=i * 3)).isoformat(),
+                "count": blink_count,
+                "session_id": session_id,
+            })
+        client.request("POST /sync/blinks", "POST", "/sync/blinks", json_body=samples)
+
+        # dashboard polling
+        for _ in range(args.reads_per_cycle):
+            hdrs = {"If-None-Match": etags["list"]} if "list" in etags else {}
+            status, headers, _ = client.request("GET /sessions", "GET", "/sessions", headers=hdrs)
+            if "etag" in headers:
+                etags["list"] = headers["etag"]
+
+            if cloud_ids:
+                sid = rng.choice(cloud_ids)
+                key = f"s{sid}"
+                hdrs = {"If-None-Match": etags[key]} if key in etags else {}
+                status, headers, _ = client.request("GET /sessions/{id}", "GET", f"/sessions/{sid}", headers=hdrs)
+                if "etag" in headers:
+                    etags[key] = headers["etag"]
+
+        if args.login_every and cycle % args.login_every == 0:
+            login()
+
+        if args.think_ms:
+            time.sleep(args.think_ms / 1000)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_url: str) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = {**os.environ, "LUMINA_DATABASE_URL": db_url, "LUMINA_SERVER_TIMING": "1"}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR / "src",
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return proc, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not start listening within 30s")
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    for endpoint, latencies in sorted(recorder.latency_ms.items()):
+        statuses = recorder.statuses[endpoint]
+        db = recorder.db_ms[endpoint]
+        queries = recorder.queries[endpoint]
+        errors = sum(n for code, n in statuses.items() if code == 0 or code >= 400)
+        endpoints[endpoint] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(_percentile(latencies, 50), 3),
+            "p99_ms": round(_percentile(latencies, 99), 3),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "db_p50_ms": round(_percentile(db, 50), 3),
+            "db_mean_ms": round(sum(db) / len(db), 3) if db else 0.0,
+            "queries_mean": round(sum(queries) / len(queries), 2) if queries else 0.0,
+            "statuses": {str(code): n for code, n in sorted(statuses.items())},
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {"seconds": round(elapsed, 3), "total_requests": total, "total_rps": round(total / elapsed, 2), "endpoints": endpoints}
+
+
+def _git_commit() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain"], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+        return f"{sha}-dirty" if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(result: dict) -> None:
+    summary = result["summary"]
+    print(f"commit {result['commit']}  clients {result['config']['clients']}  "
+          f"{summary['total_requests']} requests in {summary['seconds']}s ({summary['total_rps']} req/s)")
+    print(f"{'endpoint':<22}{'req/s':>9}{'p50 ms':>10}{'p99 ms':>10}{'db ms':>9}{'queries':>9}{'errors':>8}")
+    for endpoint, e in summary["endpoints"].items():
+        print(f"{endpoint:<22}{e['rps']:>9}{e['p50_ms']:>10}{e['p99_ms']:>10}{e['db_mean_ms']:>9}{e['queries_mean']:>9}{e['errors']:>8}")
+
+
+def compare(old_path: str, new_path: str) -> None:
+    old = json.loads(Path(old_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+    print(f"{old['commit']} -> {new['commit']}")
+    print(f"{'endpoint':<22}{'req/s':>18}{'p50 ms':>20}{'p99 ms':>20}{'db ms':>18}")
+
+    def delta(a, b):
+        if not a:
+            return f"{b:>9}"
+        return f"{b:>9} ({(b - a) / a * 100:+.0f}%)"
+
+    for endpoint, n in new["summary"]["endpoints"].items():
+        o = old["summary"]["endpoints"].get(endpoint)
+        if o is None:
+            print(f"{endpoint:<22} (new)")
+            continue
+        print(f"{endpoint:<22}{delta(o['rps'], n['rps']):>18}{delta(o['p50_ms'], n['p50_ms']):>20}"
+              f"{delta(o['p99_ms'], n['p99_ms']):>20}{delta(o['db_mean_ms'], n['db_mean_ms']):>18}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Lumina backend sync and session endpoints.")
+    parser.add_argument("--clients", type=int, default=10, help="simulated desktop clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to run")
+    parser.add_argument("--batch-size", type=int, default=200, help="blink samples per /sync/blinks call")
+    parser.add_argument("--reads-per-cycle", type=int, default=2, help="dashboard reads per sync cycle")
+    parser.add_argument("--login-every", type=int, default=20, help="re-login every N cycles (0 disables)")
+    parser.add_argument("--think-ms", type=float, default=50.0, help="pause between cycles per client")
+    parser.add_argument("--base-url", help="target an already running backend instead of starting one")
+    parser.add_argument("--db-url", help="database url for the spawned backend (default: temp sqlite file)")
+    parser.add_argument("--out", help="result file path (default: bench/results/loadtest-<time>-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    proc = None
+    base_url = args.base_url
+    db_url = args.db_url
+    if not base_url:
+        if not db_url:
+            db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='lumina-load-'), 'load.db')}"
+        proc, base_url = start_server(db_url)
+
+    recorder = Recorder()
+    run_id = f"{int(time.time())}-{os.getpid()}"
+    try:
+        started = time.monotonic()
+        stop_at = started + args.duration
+        threads = [
+            threading.Thread(target=desktop_client, args=(i, run_id, base_url, args, recorder, stop_at), daemon=True)
+            for i in range(args.clients)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - started
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    commit = _git_commit()
+    result = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "config": {
+            "clients": args.clients,
+            "duration": args.duration,
+            "batch_size": args.batch_size,
+            "reads_per_cycle": args.reads_per_cycle,
+            "login_every": args.login_every,
+            "think_ms": args.think_ms,
+            "target": args.base_url or db_url,
+        },
+        "summary": summarize(recorder, elapsed),
+    }
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"loadtest-{datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2))
+    print_report(result)
+    print(f"\nresults written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,45 @@ SECRET_KEY = os.getenv("LUMINA_SECRET_KEY", "change-me-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# database: sqlite for local dev, any sqlalchemy url (e.g. postgresql+psycopg://...) in production
+DATABASE_URL = os.getenv("LUMINA_DATABASE_URL", "sqlite:///./lumina.db")
+DB_POOL_SIZE = int(os.getenv("LUMINA_DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("LUMINA_DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("LUMINA_DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("LUMINA_DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("LUMINA_DB_POOL_PRE_PING", "1") == "1"
+# rows per multi-row INSERT statement when bulk inserting on server databases
+DB_INSERT_PAGE_SIZE = int(os.getenv("LUMINA_DB_INSERT_PAGE_SIZE", "1000"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("LUMINA_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# raw blink samples older than this are folded into hourly rollups and their monthly
+# partition is dropped; 0 keeps raw samples forever
+RAW_BLINK_RETENTION_DAYS = int(os.getenv("LUMINA_RAW_BLINK_RETENTION_DAYS", "180"))
+# deletion tombstones in the change feed are kept this long; a device that last pulled
+# before that is told to reset and pull everything again
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("LUMINA_TOMBSTONE_RETENTION_DAYS", "30"))
+RETENTION_INTERVAL_SECONDS = int(os.getenv("LUMINA_RETENTION_INTERVAL_SECONDS", str(6 * 60 * 60)))
+
+# admission control for /sync/* ingestion. Each user has a token bucket of rows
+# (refilled at SYNC_ROWS_PER_SECOND, holding at most SYNC_BURST_ROWS); a request costs
+# one token per row it carries. At most SYNC_MAX_IN_FLIGHT ingestion requests run at
+# once across all users. Bodies over SYNC_MAX_BODY_BYTES or SYNC_MAX_BATCH_ROWS are refused.
+SYNC_ROWS_PER_SECOND = float(os.getenv("LUMINA_SYNC_ROWS_PER_SECOND", "2000"))
+SYNC_BURST_ROWS = int(os.getenv("LUMINA_SYNC_BURST_ROWS", "20000"))
+SYNC_MAX_IN_FLIGHT = int(os.getenv("LUMINA_SYNC_MAX_IN_FLIGHT", "8"))
+SYNC_MAX_BODY_BYTES = int(os.getenv("LUMINA_SYNC_MAX_BODY_BYTES", str(2 * 1024 * 1024)))
+SYNC_MAX_BATCH_ROWS = int(os.getenv("LUMINA_SYNC_MAX_BATCH_ROWS", "5000"))
+
+# adds a Server-Timing header (db time, query count, total) to every response; used by the load tests.
+# the same numbers are always available in aggregate at GET /metrics
+SERVER_TIMING = os.getenv("LUMINA_SERVER_TIMING", "0") == "1"
+
+# ETags and cached response bodies for session reads live in process memory, so they are
+# only consistent within one worker. uvicorn takes its default --workers from
+# WEB_CONCURRENCY; with more than one, the response cache is switched off.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+RESPONSE_CACHE = os.getenv("LUMINA_RESPONSE_CACHE", "1") == "1" and WEB_CONCURRENCY <= 1
+
 
 def access_token_expires() -> timedelta:
-    return timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
\ No newline at end of file
+    return timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -1,14 +1,73 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
-
-DATABASE_URL = "sqlite:///./lumina.db"
+from config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_INSERT_PAGE_SIZE,
+    SQLITE_BUSY_TIMEOUT_MS,
+)
 
 class Base(DeclarativeBase):
     pass
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _set_sqlite_pragmas(dbapi_conn, _conn_record):
+    # WAL lets readers run alongside the single writer, busy_timeout makes writers
+    # queue instead of failing with "database is locked", and NORMAL is durable enough under WAL
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.close()
+
+
+def build_engine(url: str = DATABASE_URL) -> Engine:
+    """Create an engine for the given url with pool and dialect tuning applied."""
+    if is_sqlite(url):
+        if ":memory:" in url or url in ("sqlite://", "sqlite+pysqlite://"):
+            # in-memory dbs live inside one connection, so pool settings don't apply
+            return create_engine(url, connect_args={"check_same_thread": False})
+
+        engine = create_engine(
+            url,
+            connect_args={
+                "check_same_thread": False,
+                "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+            },
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+        return engine
+
+    kwargs = {}
+    if url.startswith("postgresql+psycopg2"):
+        # batch both multi-row INSERTs and executemany UPDATEs through psycopg2's fast paths
+        kwargs["executemany_mode"] = "values_plus_batch"
+
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        insertmanyvalues_page_size=DB_INSERT_PAGE_SIZE,
+        **kwargs,
+    )
+
+
+engine = build_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -17,4 +76,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
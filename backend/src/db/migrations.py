@@ -0,0 +1,30 @@
+"""
+Additive schema migrations.
+
+create_all() creates missing tables but never touches existing ones, so columns
+added to a model later (e.g. the session summary columns) are added here with
+ALTER TABLE. Only nullable columns are handled. Anything else needs a real
+migration.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from db.conn import Base
+
+
+def add_missing_columns(engine: Engine) -> list[str]:
+    """ALTER TABLE ... ADD COLUMN for nullable model columns missing from the database."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present or not column.nullable:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+                added.append(f"{table.name}.{column.name}")
+    return added
@@ -0,0 +1,214 @@
+"""
+Monthly partitions for raw blink samples.
+
+Raw samples live in one table per calendar month (blink_samples_YYYYMM) instead of
+a single ever-growing table. Writers route each row by its timestamp, readers only
+touch the months that overlap the range they ask for, and retention can drop a
+whole month with one DROP TABLE instead of a huge DELETE.
+
+Each partition numbers its rows from 1, so reads expose a global sample id with
+the partition key folded in: 202601 * ID_STRIDE + local id (see global_id).
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    MetaData,
+    Table,
+    func,
+    inspect,
+    literal,
+    select,
+    union_all,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateIndex, CreateTable, DropTable
+
+PARTITION_PREFIX = "blink_samples_"
+
+_metadata = MetaData()
+_tables: Dict[str, Table] = {}
+# partition keys known to exist, per database url; re-read periodically so partitions
+# created by other worker processes become visible to this one
+_known: Dict[str, Set[str]] = {}
+_known_loaded_at: Dict[str, float] = {}
+_KNOWN_TTL_SECONDS = 60.0
+_lock = threading.Lock()
+
+# room for 10^10 local ids per month; 202601 * 10^10 stays below 2^53, so ids are
+# exact in JSON clients too
+ID_STRIDE = 10 ** 10
+
+
+def partition_key(ts: datetime) -> str:
+    return ts.strftime("%Y%m")
+
+
+def key_range(key: str) -> tuple[datetime, datetime]:
+    """[start, end) of the month a partition key covers."""
+    year, month = int(key[:4]), int(key[4:])
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def global_id(key: str, local_id: int) -> int:
+    """Sample id unique across partitions, from a partition key and the row's own id."""
+    return int(key) * ID_STRIDE + local_id
+
+
+def split_id(sample_id: int) -> tuple[str, int]:
+    """Inverse of global_id: (partition key, id within the partition)."""
+    key, local_id = divmod(sample_id, ID_STRIDE)
+    return f"{key:06d}", local_id
+
+
+def partition_table(key: str) -> Table:
+    """Table object for a partition key (does not create it in the database)."""
+    with _lock:
+        table = _tables.get(key)
+        if table is None:
+            name = f"{PARTITION_PREFIX}{key}"
+            # no foreign keys: partitions are dropped wholesale and session deletes
+            # clear their samples with set-based deletes
+            table = Table(
+                name,
+                _metadata,
+                Column("id", Integer, primary_key=True),
+                Column("user_id", Integer, nullable=False),
+                Column("timestamp", DateTime, nullable=False),
+                Column("count", Integer, nullable=False),
+                Column("session_id", Integer, nullable=True),
+                Index(f"ix_{name}_user_ts", "user_id", "timestamp"),
+                Index(f"ix_{name}_session", "session_id"),
+            )
+            _tables[key] = table
+        return table
+
+
+def _bind_key(bind: Engine | Connection) -> str:
+    return str(bind.engine.url)
+
+
+def existing_keys(bind: Engine | Connection, refresh: bool = False) -> List[str]:
+    """Sorted partition keys present in the database."""
+    cache_key = _bind_key(bind)
+    now = time.monotonic()
+    with _lock:
+        known = _known.get(cache_key)
+        stale = now - _known_loaded_at.get(cache_key, 0.0) > _KNOWN_TTL_SECONDS
+    if known is None or stale or refresh:
+        names = inspect(bind).get_table_names()
+        suffixes = [n[len(PARTITION_PREFIX):] for n in names if n.startswith(PARTITION_PREFIX)]
+        known = {s for s in suffixes if len(s) == 6 and s.isdigit()}
+        with _lock:
+            _known[cache_key] = known
+            _known_loaded_at[cache_key] = now
+    return sorted(known)
+
+
+def ensure_partition(bind: Engine | Connection, key: str) -> Table:
+    """Return the partition table for key, creating it (and its indexes) if needed."""
+    table = partition_table(key)
+    cache_key = _bind_key(bind)
+    if key in existing_keys(bind):
+        return table
+
+    engine = bind.engine
+    # DDL runs on its own connection so it commits independently of the caller's transaction
+    with engine.begin() as conn:
+        conn.execute(CreateTable(table, if_not_exists=True))
+        for index in table.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+    with _lock:
+        _known.setdefault(cache_key, set()).add(key)
+    return table
+
+
+def drop_partition(conn: Connection, key: str) -> None:
+    conn.execute(DropTable(partition_table(key), if_exists=True))
+    with _lock:
+        _known.get(_bind_key(conn), set()).discard(key)
+
+
+def keys_for_range(
+    bind: Engine | Connection,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[str]:
+    """Existing partition keys overlapping [start, end]. Open ends mean unbounded."""
+    keys = existing_keys(bind)
+    lo = partition_key(start) if start else None
+    hi = partition_key(end) if end else None
+    return [k for k in keys if (lo is None or k >= lo) and (hi is None or k <= hi)]
+
+
+def routed_select(
+    bind: Engine | Connection,
+    columns: Iterable[str],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    where=None,
+    clip: bool = True,
+):
+    """
+    UNION ALL of `SELECT columns FROM partition WHERE ...` over only the partitions
+    overlapping [start, end]. `where` is a callable taking a partition table and
+    returning extra filter clauses. With clip=False the range only picks partitions
+    and rows are not filtered on timestamp. An "id" column comes out as the global
+    sample id. Returns None if no partition overlaps.
+    """
+    columns = list(columns)
+    selects = []
+    for key in keys_for_range(bind, start, end):
+        table = partition_table(key)
+        stmt = select(*[
+            (literal(global_id(key, 0), BigInteger) + table.c.id).label("id") if name == "id" else table.c[name]
+            for name in columns
+        ])
+        if clip and start is not None:
+            stmt = stmt.where(table.c.timestamp >= start)
+        if clip and end is not None:
+            stmt = stmt.where(table.c.timestamp <= end)
+        if where is not None:
+            stmt = stmt.where(*where(table))
+        selects.append(stmt)
+
+    if not selects:
+        return None
+    if len(selects) == 1:
+        return selects[0].subquery()
+    return union_all(*selects).subquery()
+
+
+def group_by_partition(rows: Iterable[dict]) -> Dict[str, List[dict]]:
+    """Bucket sample rows (dicts with a `timestamp`) by the partition they belong to."""
+    grouped: Dict[str, List[dict]] = {}
+    for row in rows:
+        grouped.setdefault(partition_key(row["timestamp"]), []).append(row)
+    return grouped
+
+
+def minute_bucket(column, dialect_name: str):
+    """SQL expression truncating a timestamp column to the start of its minute."""
+    if dialect_name == "sqlite":
+        return func.strftime("%Y-%m-%d %H:%M:00", column)
+    if dialect_name == "postgresql":
+        return func.date_trunc("minute", column)
+    return func.date_format(column, "%Y-%m-%d %H:%i:00")
+
+
+def hour_bucket(column, dialect_name: str):
+    """SQL expression truncating a timestamp column to the start of its hour."""
+    if dialect_name == "sqlite":
+        return func.strftime("%Y-%m-%d %H:00:00", column)
+    if dialect_name == "postgresql":
+        return func.date_trunc("hour", column)
+    # mysql / mariadb
+    return func.date_format(column, "%Y-%m-%d %H:00:00")
@@ -1,26 +1,96 @@
+import logging
+from contextlib import asynccontextmanager
 from models import session_model
 from typing import Optional
-from fastapi import FastAPI, Depends, HTTPException, status, Body
+from fastapi import FastAPI, Depends, HTTPException, status, Body, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from models import user_model
 from models import blink_model
+from models import change_model
 from schemas import general_schemas
 from db.conn import Base, engine, get_db
+from db import partitions
+from db.migrations import add_missing_columns
+from db import timing
 from typing import List
-from datetime import datetime
+from datetime import datetime, timedelta
+from config import SERVER_TIMING, WEB_CONCURRENCY
 from service.auth_service import (
+    authenticate_token,
     create_access_token,
     get_current_user,
     hash_password,
     authenticate_user,
     get_user_by_email,
 )
-
-app = FastAPI(title="Lumina Backend")
+from service.sync_service import ingest_blinks, ingest_sessions
+from service.summary_service import finish_sessions, fold_blink_batch, store_client_summary
+from service.retention_service import RetentionWorker, migrate_legacy_samples
+from service.analytics_service import analytics_cache, hourly_rate_profile, low_rate_sessions
+from service.response_cache import etag_matches, response_cache, versions
+from service.change_feed import changes_since, delete_sessions, record_session_changes
+from service.live_hub import HEARTBEAT_SECONDS, TooManySubscribers, live_hub
+from service import metrics
+from service.admission import admitted_payload
+from service.serialization import (
+    BLINK_READ_FIELDS,
+    SESSION_READ_COLUMNS,
+    SESSION_READ_FIELDS,
+    FastJSONResponse,
+    array_body,
+    dumps,
+    parse_blink_samples,
+    parse_session_dicts,
+    parse_session_ids,
+    rows_to_dicts,
+)
+from service.metrics import MetricsMiddleware
 
 # Create tables on startup (simple dev approach)
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    if WEB_CONCURRENCY > 1:
+        logger.warning(
+            "WEB_CONCURRENCY=%d: session response cache and ETag revalidation disabled "
+            "(versions are per process)", WEB_CONCURRENCY
+        )
+    migrate_legacy_samples(engine)
+    retention_worker = RetentionWorker(engine)
+    retention_worker.start()
+    yield
+    retention_worker.stop()
+
+
+app = FastAPI(title="Lumina Backend", lifespan=lifespan)
+
+timing.install(engine)
+app.add_middleware(MetricsMiddleware, server_timing=SERVER_TIMING)
+
+
+def _cached_json(body: bytes, etag: str) -> Response:
+    # no-cache: clients may store the body but must revalidate with If-None-Match
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": "private, no-cache"},
+    )
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": "private, no-cache"},
+    )
 
 @app.post("/auth/signup", response_model=general_schemas.UserRead, status_code=status.HTTP_201_CREATED)
 def signup(user_in: general_schemas.UserCreate, db: Session = Depends(get_db)):
@@ -65,22 +135,25 @@ def login(
     return {"access_token": token, "token_type": "bearer"}
 
     
-@app.post("/sync/blinks", status_code=status.HTTP_200_OK)
+@app.post("/sync/blinks", status_code=status.HTTP_200_OK, openapi_extra=array_body(general_schemas.BlinkSampleIn.model_json_schema()))
 def sync_blinks(
-    samples: List[general_schemas.BlinkSampleIn] = Body(...),
+    payload=Depends(admitted_payload, scope="function"),
     current_user: user_model.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    for sample in samples:
-        db.add(
-            blink_model.BlinkSample(
-                user_id=current_user.id,
-                timestamp=sample.timestamp,
-                count=sample.count,
-                session_id=sample.session_id,
-            )
-        )
-    db.commit()
+    """Bulk upload of blink samples: a list of {timestamp, count, session_id}."""
+    samples = parse_blink_samples(payload)
+    ingest_blinks(db, current_user.id, samples)
+    metrics.record_ingest("blinks", len(samples))
+    if samples:
+        timestamps = [sample.timestamp for sample in samples]
+        analytics_cache.invalidate(current_user.id, min(timestamps), max(timestamps))
+        session_ids = {s.session_id for s in samples if s.session_id is not None}
+        # blinks usually arrive after their session was synced as ended
+        fold_blink_batch(db, current_user.id, samples)
+        versions.bump_sessions(current_user.id, session_ids)
+        record_session_changes(db, current_user.id, session_ids)
+        live_hub.publish_samples(current_user.id, samples, source="sync")
     return {"status": "ok", "received": len(samples)}
 
 
@@ -102,38 +175,102 @@ def create_session(
     db.add(session)
     db.commit()
     db.refresh(session)
+    versions.bump_list(current_user.id)
+    record_session_changes(db, current_user.id, [session.id])
     return session
 
 
 @app.get("/sessions", response_model=List[general_schemas.SessionRead])
 def list_sessions(
+    request: Request,
     current_user: user_model.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """List all sessions for the current user."""
-    sessions = db.query(session_model.Session).filter(
-        session_model.Session.user_id == current_user.id
-    ).order_by(session_model.Session.start_time.desc()).all()
-    return sessions
+    # etag is taken before querying so a concurrent write can only make it stale, never newer than the body
+    etag = versions.list_etag(current_user.id)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return _not_modified(etag)
+    body = response_cache.get(etag)
+    if body is not None:
+        return _cached_json(body, etag)
+
+    rows = db.execute(
+        select(*SESSION_READ_COLUMNS)
+        .where(session_model.Session.user_id == current_user.id)
+        .order_by(session_model.Session.start_time.desc())
+    ).all()
+    body = dumps(rows_to_dicts(SESSION_READ_FIELDS, rows))
+    response_cache.put(etag, body)
+    return _cached_json(body, etag)
+
+
+@app.get("/sessions/ids")
+def list_session_ids(
+    current_user: user_model.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Ids of all the current user's sessions, for clients reconciling after a change feed reset."""
+    ids = db.scalars(
+        select(session_model.Session.id).where(session_model.Session.user_id == current_user.id)
+    ).all()
+    return FastJSONResponse({"ids": list(ids)})
 
 
 @app.get("/sessions/{session_id}", response_model=general_schemas.SessionWithBlinks)
 def get_session(
     session_id: int,
+    request: Request,
     current_user: user_model.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Get a session with its blink samples."""
-    session = db.query(session_model.Session).filter(
-        session_model.Session.id == session_id,
-        session_model.Session.user_id == current_user.id
+    etag = versions.session_etag(current_user.id, session_id)
+    if_none_match = request.headers.get("if-none-match")
+    # "*" must not answer 304 for a session that doesn't exist (or isn't this user's)
+    if etag_matches(if_none_match, etag, wildcard=False):
+        return _not_modified(etag)
+    body = response_cache.get(etag)
+    if body is not None:
+        # only an existing session has a body cached under its current etag
+        if etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+        return _cached_json(body, etag)
+
+    row = db.execute(
+        select(*SESSION_READ_COLUMNS).where(
+            session_model.Session.id == session_id,
+            session_model.Session.user_id == current_user.id,
+        )
     ).first()
-    if not session:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found"
         )
-    return session
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    session = dict(zip(SESSION_READ_FIELDS, row))
+
+    # only scan the monthly partitions the session overlaps
+    samples = partitions.routed_select(
+        db.get_bind(),
+        BLINK_READ_FIELDS,
+        start=session["start_time"],
+        end=session["end_time"] or datetime.now(),
+        where=lambda t: (t.c.session_id == session_id, t.c.user_id == current_user.id),
+        clip=False,
+    )
+    blink_rows = []
+    if samples is not None:
+        blink_rows = db.execute(select(samples).order_by(samples.c.timestamp)).all()
+
+    session["blink_samples"] = rows_to_dicts(BLINK_READ_FIELDS, blink_rows)
+    body = dumps(session)
+    # active sessions still receive blinks, so only ended ones are worth keeping in memory
+    if session["end_time"] is not None:
+        response_cache.put(etag, body)
+    return _cached_json(body, etag)
 
 
 @app.patch("/sessions/{session_id}", response_model=general_schemas.SessionRead)
@@ -143,7 +280,7 @@ def update_session(
     current_user: user_model.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Update a session (name, end_time)."""
+    """Update a session (name, end_time, and optionally the summary the client computed)."""
     session = db.query(session_model.Session).filter(
         session_model.Session.id == session_id,
         session_model.Session.user_id == current_user.id
@@ -158,9 +295,16 @@ def update_session(
         session.name = session_update.name
     if session_update.end_time is not None:
         session.end_time = session_update.end_time
+    if session_update.total_blinks is not None:
+        store_client_summary(session, session_update)
     
     db.commit()
+    if session_update.end_time is not None:
+        finish_sessions(db, current_user.id, [session_id])
     db.refresh(session)
+    analytics_cache.invalidate(current_user.id)
+    versions.bump_session(current_user.id, session_id)
+    record_session_changes(db, current_user.id, [session_id])
     return session
 
 
@@ -170,48 +314,213 @@ def delete_session(
     current_user: user_model.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Delete a session."""
-    session = db.query(session_model.Session).filter(
-        session_model.Session.id == session_id,
-        session_model.Session.user_id == current_user.id
-    ).first()
-    if not session:
+    """Delete a session and its blink samples."""
+    if not delete_sessions(db, current_user.id, [session_id]):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found"
         )
-    db.delete(session)
-    db.commit()
+    analytics_cache.invalidate(current_user.id)
+    versions.bump_session(current_user.id, session_id)
     return None
 
 
-@app.post("/sync/sessions", status_code=status.HTTP_200_OK)
+@app.post("/sync/sessions", status_code=status.HTTP_200_OK, openapi_extra=array_body({"type": "object"}))
 def sync_sessions(
-    sessions_data: List[dict] = Body(...),
+    payload=Depends(admitted_payload, scope="function"),
     current_user: user_model.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Sync sessions from local DB. Expects list of {id, name, start_time, end_time}."""
-    created_ids = []
-    for sess_data in sessions_data:
-        session = session_model.Session(
-            user_id=current_user.id,
-            name=sess_data.get("name"),
-            start_time=datetime.fromisoformat(sess_data["start_time"]),
-            end_time=datetime.fromisoformat(sess_data["end_time"]) if sess_data.get("end_time") else None,
-        )
-        db.add(session)
-        db.flush()  # Get the ID
-        created_ids.append(session.id)
-    db.commit()
+    """Sync sessions from local DB. Expects list of {id, name, start_time, end_time} plus optional summary fields."""
+    sessions_data = parse_session_dicts(payload)
+    created_ids = ingest_sessions(db, current_user.id, sessions_data)
+    metrics.record_ingest("sessions", len(created_ids))
+    # ended sessions from older clients come without a summary
+    finish_sessions(db, current_user.id, [
+        sid for sid, data in zip(created_ids, sessions_data)
+        if data.get("end_time") and data.get("total_blinks") is None
+    ])
+    analytics_cache.invalidate(current_user.id)
+    versions.bump_list(current_user.id)
+    record_session_changes(db, current_user.id, created_ids)
     return {"status": "ok", "created": len(created_ids), "ids": created_ids}
 
 
+@app.post("/sync/deletions", status_code=status.HTTP_200_OK, openapi_extra=array_body({"type": "integer"}))
+def sync_deletions(
+    payload=Depends(admitted_payload, scope="function"),
+    current_user: user_model.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Tombstones from the desktop: delete these sessions with their samples. Every id
+    sent is acknowledged, including ones already gone, so the client can drop its
+    tombstones.
+    """
+    session_ids = parse_session_ids(payload)
+    deleted = delete_sessions(db, current_user.id, session_ids)
+    metrics.record_ingest("deletions", len(session_ids))
+    if deleted:
+        analytics_cache.invalidate(current_user.id)
+        for session_id in deleted:
+            versions.bump_session(current_user.id, session_id)
+    return {"status": "ok", "deleted": len(deleted), "ids": session_ids}
+
+
+@app.get("/changes", response_model=general_schemas.ChangeFeed)
+def list_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    current_user: user_model.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Sessions created, updated or deleted after version `since`, each with its blink
+    rollups. Pass the returned `version` as the next `since`; keep paging while `more`.
+    """
+    return FastJSONResponse(changes_since(db, current_user.id, since, limit))
+
+
+# ========== ANALYTICS ENDPOINTS ==========
+
+@app.get("/analytics/hourly", response_model=general_schemas.HourlyBlinkRateReport)
+def analytics_hourly(
+    days: int = Query(30, ge=1, le=366),
+    current_user: user_model.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Average blink rate per hour of day over the last `days` days."""
+    user_id: int = current_user.id
+    now = datetime.now()
+    # rolling window: anything ingested after now still lands inside it
+    window = (now - timedelta(days=days), datetime.max)
+    hours = analytics_cache.get_or_compute(
+        user_id, ("hourly", days), window,
+        lambda: hourly_rate_profile(db, user_id, days, now=now),
+    )
+    return {"days": days, "hours": hours}
+
+
+@app.get("/analytics/sessions/low-rate", response_model=List[general_schemas.LowRateSession])
+def analytics_low_rate_sessions(
+    max_rate: float = Query(..., gt=0, description="blinks per minute"),
+    days: int = Query(30, ge=1, le=366),
+    current_user: user_model.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Ended sessions from the last `days` days with a blink rate below `max_rate`/min."""
+    user_id: int = current_user.id
+    now = datetime.now()
+    window = (now - timedelta(days=days), datetime.max)
+    return analytics_cache.get_or_compute(
+        user_id, ("low-rate", max_rate, days), window,
+        lambda: low_rate_sessions(db, user_id, max_rate, days, now=now),
+    )
+
+
+# ========== LIVE ENDPOINTS ==========
+
+@app.post("/live/blinks", status_code=status.HTTP_202_ACCEPTED)
+def live_blinks_publish(
+    samples: List[general_schemas.BlinkSampleIn] = Body(...),
+    current_user: user_model.User = Depends(get_current_user),
+):
+    """
+    Low-latency blink stream from the desktop: fanned out to live subscribers but not
+    stored. The same blinks are persisted later through /sync/blinks, so clients
+    should dedupe on (session_id, count).
+    """
+    live_hub.publish_samples(current_user.id, samples, source="live")
+    return {"status": "accepted", "received": len(samples)}
+
+
+async def _stream_user_id(request: Request, token: Optional[str]) -> int:
+    # EventSource can't set headers, so the token may also come as ?token=
+    auth = request.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        token = auth[7:]
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return await run_in_threadpool(authenticate_token, token)
+
+
+@app.get("/live/blinks")
+async def live_blinks_sse(
+    request: Request,
+    session_id: Optional[int] = None,
+    token: Optional[str] = Query(None),
+):
+    """Server-Sent Events stream of the user's new blinks, optionally for one session."""
+    user_id = await _stream_user_id(request, token)
+    try:
+        sub = live_hub.subscribe(user_id, session_id)
+    except TooManySubscribers:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many live streams open")
+
+    async def events():
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                data = await sub.next(HEARTBEAT_SECONDS)
+                if data is None:
+                    yield ": keepalive\n\n"
+                    continue
+                dropped = sub.take_dropped()
+                if dropped:
+                    yield f'event: gap\ndata: {{"dropped": {dropped}}}\n\n'
+                sub.seq += 1
+                yield f"id: {sub.seq}\nevent: blinks\ndata: {data}\n\n"
+        finally:
+            live_hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/ws/live")
+async def live_blinks_ws(websocket: WebSocket, token: str = Query(...), session_id: Optional[int] = None):
+    """WebSocket variant of /live/blinks: JSON text frames, with gap and ping messages."""
+    try:
+        user_id = await run_in_threadpool(authenticate_token, token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    try:
+        sub = live_hub.subscribe(user_id, session_id)
+    except TooManySubscribers:
+        await websocket.close(code=1013)
+        return
+
+    await websocket.accept()
+    try:
+        while True:
+            data = await sub.next(HEARTBEAT_SECONDS)
+            if data is None:
+                await websocket.send_text('{"type": "ping"}')
+                continue
+            dropped = sub.take_dropped()
+            if dropped:
+                await websocket.send_text(f'{{"type": "gap", "dropped": {dropped}}}')
+            await websocket.send_text(data)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        live_hub.unsubscribe(sub)
+
+
 @app.get("/auth/me", response_model=general_schemas.UserRead)
 def read_me(current_user: user_model.User = Depends(get_current_user)):
     """Example protected endpoint the web dashboard can call later."""
     return current_user
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app="main:app", host="localhost", port=8080, reload=True)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from db.conn import Base
@@ -6,6 +6,11 @@ from models.user_model import User
 
 
 class BlinkSample(Base):
+    """
+    Legacy single-table storage for raw samples. New samples are written to the
+    monthly partitions in db/partitions.py; rows left here are moved over on startup,
+    so the table is normally empty and has no ORM relationship to Session.
+    """
     __tablename__ = "blink_samples"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -15,4 +20,19 @@ class BlinkSample(Base):
     session_id = Column(Integer, ForeignKey("sessions.id"), nullable=True)
 
     user = relationship(User)
-    session = relationship("Session", back_populates="blink_samples")
\ No newline at end of file
+
+
+class BlinkRollup(Base):
+    """Hourly aggregate of raw samples that have aged out of their partition."""
+    __tablename__ = "blink_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    session_id = Column(Integer, nullable=True)
+    bucket_start = Column(DateTime, nullable=False)
+    blinks = Column(Integer, nullable=False)  # number of raw samples folded into this bucket
+
+    __table_args__ = (
+        Index("ix_blink_rollups_user_bucket", "user_id", "bucket_start"),
+        Index("ix_blink_rollups_session", "session_id"),
+    )
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, DateTime, Boolean, ForeignKey, Index
+
+from db.conn import Base
+
+
+class SessionChange(Base):
+    """
+    Change feed entry: the latest change to one of a user's sessions (its fields,
+    summary or samples). id is the feed version. Each session keeps only its newest
+    entry, so catching up costs one row per changed session however often it changed.
+    """
+    __tablename__ = "session_changes"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    session_id = Column(Integer, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)
+    changed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_session_changes_user_session", "user_id", "session_id", unique=True),
+        Index("ix_session_changes_user_version", "user_id", "id"),
+        # versions must never be reused after the newest entry is replaced
+        {"sqlite_autoincrement": True},
+    )
+
+
+class ChangeFeedFloor(Base):
+    """Highest version whose tombstone was garbage-collected, per user."""
+    __tablename__ = "change_feed_floors"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Float, ForeignKey
 from sqlalchemy.orm import relationship
 
 from db.conn import Base
@@ -14,5 +14,19 @@ class Session(Base):
     start_time = Column(DateTime, nullable=False)
     end_time = Column(DateTime, nullable=True)
 
-    user = relationship(User)
-    blink_samples = relationship("BlinkSample", back_populates="session")
\ No newline at end of file
+    # summary, computed when the session ends (and refreshed as late blinks arrive)
+    # so list views don't have to read the samples
+    total_blinks = Column(Integer, nullable=True)
+    duration_seconds = Column(Float, nullable=True)
+    mean_rate = Column(Float, nullable=True)  # blinks/min over the whole session
+    peak_rate = Column(Integer, nullable=True)  # most blinks in one clock minute
+    longest_gap_seconds = Column(Float, nullable=True)
+    # running state for folding in blinks as they sync; blink_gap_seconds is the
+    # longest gap up to the last blink, without the trailing gap to end_time
+    last_blink_at = Column(DateTime, nullable=True)
+    cur_minute_blinks = Column(Integer, nullable=True)
+    blink_gap_seconds = Column(Float, nullable=True)
+    # the client sent a complete summary, so blinks synced later don't change it
+    summary_from_client = Column(Boolean, nullable=True)
+
+    user = relationship(User)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Literal
 from datetime import datetime
 from pydantic import BaseModel, EmailStr
 
@@ -36,11 +36,18 @@ class SessionBase(BaseModel):
 class SessionCreate(SessionBase):
     start_time: datetime
 
-class SessionUpdate(BaseModel):
+class SessionSummary(BaseModel):
+    total_blinks: int | None = None
+    duration_seconds: float | None = None
+    mean_rate: float | None = None
+    peak_rate: int | None = None
+    longest_gap_seconds: float | None = None
+
+class SessionUpdate(SessionSummary):
     name: str | None = None
     end_time: datetime | None = None
 
-class SessionRead(SessionBase):
+class SessionRead(SessionBase, SessionSummary):
     id: int
     user_id: int
     start_time: datetime
@@ -59,4 +66,41 @@ class BlinkSampleRead(BaseModel):
     session_id: int | None = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class BlinkRollupRead(BaseModel):
+    bucket_start: datetime
+    bucket_seconds: int
+    blinks: int
+
+class SessionChangeRead(BaseModel):
+    version: int
+    op: Literal["upsert", "delete"]
+    session_id: int
+    session: SessionRead | None = None
+    rollups: List[BlinkRollupRead] = []
+
+class ChangeFeed(BaseModel):
+    version: int
+    more: bool
+    # the cursor is older than the tombstones still kept: drop pulled data and start from 0
+    reset: bool = False
+    changes: List[SessionChangeRead]
+
+class HourlyBlinkRate(BaseModel):
+    hour: int
+    blinks_per_min: float | None = None
+    blinks: int
+    active_hours: int
+
+class HourlyBlinkRateReport(BaseModel):
+    days: int
+    hours: List[HourlyBlinkRate]
+
+class LowRateSession(BaseModel):
+    id: int
+    name: str | None = None
+    start_time: datetime
+    end_time: datetime
+    blinks: int
+    blinks_per_min: float
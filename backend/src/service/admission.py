@@ -0,0 +1,173 @@
+"""
+Admission control for /sync/* ingestion.
+
+Three limits, checked cheapest first:
+
+- a global cap on ingestion requests in flight. Past it the request is refused
+  with 503 before its body is read, so a burst can't queue up unbounded work in
+  the threadpool and the database;
+- a cap on body size (413), enforced while the body streams in, and on rows per
+  request;
+- a token bucket per user, in rows, so one client draining a huge backlog (or
+  stuck in a retry loop) gets a fair share and no more. When it is empty the
+  request gets 429.
+
+Refusals carry Retry-After. Every /sync/* response also advertises the current
+limits in X-Sync-* headers, which the desktop's SyncWorker uses to size its
+batches.
+
+The state lives in one process, like the live hub. With several workers each
+one enforces the limits on its own share of the traffic.
+"""
+import math
+import threading
+import time
+from typing import Any, AsyncIterator, Dict
+
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from config import (
+    SYNC_BURST_ROWS,
+    SYNC_MAX_BATCH_ROWS,
+    SYNC_MAX_BODY_BYTES,
+    SYNC_MAX_IN_FLIGHT,
+    SYNC_ROWS_PER_SECOND,
+)
+from models import user_model
+from service import metrics
+from service.auth_service import get_current_user
+from service.serialization import decode_body
+
+# idle buckets are dropped once there are more than this many
+MAX_BUCKETS = 10_000
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate, self.capacity = rate, capacity
+        self.tokens, self.updated = capacity, now
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, cost: float, now: float) -> float:
+        """Take `cost` tokens. Returns 0 if they were there, else the seconds until they will be."""
+        self.refill(now)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class Admission:
+    def __init__(
+        self,
+        rows_per_second: float = SYNC_ROWS_PER_SECOND,
+        burst_rows: int = SYNC_BURST_ROWS,
+        max_in_flight: int = SYNC_MAX_IN_FLIGHT,
+        max_body_bytes: int = SYNC_MAX_BODY_BYTES,
+        max_batch_rows: int = SYNC_MAX_BATCH_ROWS,
+    ):
+        self.rows_per_second = rows_per_second
+        # a full-size batch must always fit in an empty-handed bucket eventually
+        self.burst_rows = max(burst_rows, max_batch_rows)
+        self.max_in_flight = max_in_flight
+        self.max_body_bytes = max_body_bytes
+        self.max_batch_rows = max_batch_rows
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "X-Sync-Max-Batch": str(self.max_batch_rows),
+            "X-Sync-Max-Bytes": str(self.max_body_bytes),
+            "X-Sync-Rate": _fmt(self.rows_per_second),
+        }
+
+    def _refuse(self, code: int, reason: str, detail: str, retry_after: float | None = None) -> HTTPException:
+        metrics.sync_rejected.inc(reason)
+        headers = self.headers()
+        if retry_after is not None:
+            headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+        return HTTPException(status_code=code, detail=detail, headers=headers)
+
+    def enter(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                raise self._refuse(
+                    status.HTTP_503_SERVICE_UNAVAILABLE, "in_flight", "Too many sync requests in progress", 1
+                )
+            self._in_flight += 1
+        metrics.sync_in_flight.add(1)
+
+    def leave(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        metrics.sync_in_flight.add(-1)
+
+    def check_rows(self, user_id: int, rows: int) -> None:
+        """Charge the user's bucket for `rows` rows, or refuse the request."""
+        if rows > self.max_batch_rows:
+            raise self._refuse(
+                status.HTTP_413_CONTENT_TOO_LARGE, "batch_rows", f"At most {self.max_batch_rows} rows per request"
+            )
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                if len(self._buckets) >= MAX_BUCKETS:
+                    self._prune(now)
+                bucket = self._buckets[user_id] = TokenBucket(self.rows_per_second, self.burst_rows, now)
+            wait = bucket.take(rows, now)
+        if wait:
+            raise self._refuse(status.HTTP_429_TOO_MANY_REQUESTS, "rate", "Sync rate limit exceeded", wait)
+
+    def _prune(self, now: float) -> None:
+        # a bucket that has refilled completely is indistinguishable from a new one
+        for user_id, bucket in list(self._buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.capacity:
+                del self._buckets[user_id]
+
+    async def read_body(self, request: Request) -> bytes:
+        """The request body, refusing it as soon as it is known to be over the size cap."""
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > self.max_body_bytes:
+            raise self._refuse(status.HTTP_413_CONTENT_TOO_LARGE, "body_bytes", "Request body too large")
+        chunks, size = [], 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                raise self._refuse(status.HTTP_413_CONTENT_TOO_LARGE, "body_bytes", "Request body too large")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+
+def _fmt(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+admission = Admission()
+
+
+async def admitted_payload(
+    request: Request,
+    response: Response,
+    current_user: user_model.User = Depends(get_current_user),
+) -> AsyncIterator[Any]:
+    """
+    Dependency for /sync/* endpoints: the JSON body, once the request has passed
+    admission. It holds an in-flight slot until the endpoint returns.
+    """
+    admission.enter()
+    try:
+        payload = decode_body(await admission.read_body(request))
+        admission.check_rows(current_user.id, len(payload) if isinstance(payload, list) else 1)
+        response.headers.update(admission.headers())
+        yield payload
+    finally:
+        admission.leave()
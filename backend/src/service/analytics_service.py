@@ -0,0 +1,217 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from db import partitions
+from models import blink_model, session_model
+
+
+def _as_datetime(value) -> datetime:
+    # sqlite returns the truncated bucket as text, server databases as a timestamp
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _naive(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def hourly_blink_counts(db: Session, user_id: int, start: datetime, end: datetime) -> Dict[datetime, int]:
+    """Blinks per wall-clock hour in [start, end], from raw partitions and rollups."""
+    bind = db.get_bind()
+    buckets: Dict[datetime, int] = {}
+
+    raw = partitions.routed_select(
+        bind, ["timestamp"], start=start, end=end,
+        where=lambda t: (t.c.user_id == user_id,),
+    )
+    if raw is not None:
+        bucket = partitions.hour_bucket(raw.c.timestamp, bind.dialect.name)
+        for bucket_start, blinks in db.execute(select(bucket, func.count()).group_by(bucket)):
+            key = _as_datetime(bucket_start)
+            buckets[key] = buckets.get(key, 0) + blinks
+
+    rollup = blink_model.BlinkRollup
+    rollup_rows = db.execute(
+        select(rollup.bucket_start, func.sum(rollup.blinks))
+        .where(rollup.user_id == user_id, rollup.bucket_start >= start, rollup.bucket_start <= end)
+        .group_by(rollup.bucket_start)
+    )
+    for bucket_start, blinks in rollup_rows:
+        key = _as_datetime(bucket_start)
+        buckets[key] = buckets.get(key, 0) + int(blinks)
+
+    return buckets
+
+
+def hourly_rate_profile(db: Session, user_id: int, days: int, now: Optional[datetime] = None) -> List[dict]:
+    """
+    Average blinks/min for each hour of the day over the last `days` days.
+    Only hours with tracked blinks count towards the average.
+    """
+    end = now or datetime.now()
+    start = end - timedelta(days=days)
+    buckets = hourly_blink_counts(db, user_id, start, end)
+
+    totals = [0] * 24
+    active = [0] * 24
+    for bucket_start, blinks in buckets.items():
+        totals[bucket_start.hour] += blinks
+        active[bucket_start.hour] += 1
+
+    return [
+        {
+            "hour": hour,
+            "blinks_per_min": round(totals[hour] / (active[hour] * 60), 3) if active[hour] else None,
+            "blinks": totals[hour],
+            "active_hours": active[hour],
+        }
+        for hour in range(24)
+    ]
+
+
+def session_blink_totals(db: Session, user_id: int, start: Optional[datetime] = None) -> Dict[int, int]:
+    """Blink totals per session id for sessions with samples since `start`."""
+    bind = db.get_bind()
+    totals: Dict[int, int] = {}
+
+    raw = partitions.routed_select(
+        bind, ["session_id"], start=start,
+        where=lambda t: (t.c.user_id == user_id, t.c.session_id.isnot(None)),
+        clip=False,
+    )
+    if raw is not None:
+        for session_id, blinks in db.execute(
+            select(raw.c.session_id, func.count()).group_by(raw.c.session_id)
+        ):
+            totals[session_id] = totals.get(session_id, 0) + blinks
+
+    rollup = blink_model.BlinkRollup
+    stmt = (
+        select(rollup.session_id, func.sum(rollup.blinks))
+        .where(rollup.user_id == user_id, rollup.session_id.isnot(None))
+        .group_by(rollup.session_id)
+    )
+    if start is not None:
+        stmt = stmt.where(rollup.bucket_start >= start)
+    for session_id, blinks in db.execute(stmt):
+        totals[session_id] = totals.get(session_id, 0) + int(blinks)
+
+    return totals
+
+
+def low_rate_sessions(db: Session, user_id: int, max_rate: float, days: int, now: Optional[datetime] = None) -> List[dict]:
+    """Ended sessions started in the last `days` days whose blinks/min is below max_rate."""
+    end = now or datetime.now()
+    start = end - timedelta(days=days)
+    Sess = session_model.Session
+
+    sessions = db.execute(
+        select(Sess.id, Sess.name, Sess.start_time, Sess.end_time)
+        .where(Sess.user_id == user_id, Sess.start_time >= start, Sess.end_time.isnot(None))
+        .order_by(Sess.start_time.desc())
+    ).all()
+    if not sessions:
+        return []
+
+    totals = session_blink_totals(db, user_id, start=start)
+    result = []
+    for sess in sessions:
+        minutes = (sess.end_time - sess.start_time).total_seconds() / 60
+        if minutes <= 0:
+            continue
+        blinks = totals.get(sess.id, 0)
+        rate = blinks / minutes
+        if rate < max_rate:
+            result.append({
+                "id": sess.id,
+                "name": sess.name,
+                "start_time": sess.start_time,
+                "end_time": sess.end_time,
+                "blinks": blinks,
+                "blinks_per_min": round(rate, 3),
+            })
+    return result
+
+
+class AnalyticsCache:
+    """
+    Per-user cache of analytics results. Each entry remembers the time window it was
+    computed over so ingesting samples only evicts results whose window they touch.
+    Every invalidation stamps the user with a new value of a cache-wide counter, and
+    a result is only stored if the user hasn't been stamped since its compute began,
+    so a compute that raced an ingest can't put pre-ingest numbers back in the cache.
+
+    Expired results are dropped whenever a user's entries are touched, and at most
+    max_users users are kept (least recently used first out). An evicted user's stamp
+    is folded into a floor every unknown user is assumed to have been stamped at, so
+    forgetting a user can't let a raced compute through.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, max_entries_per_user: int = 32, max_users: int = 1024):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries_per_user
+        self.max_users = max_users
+        # user_id -> (last invalidation stamp, key -> (window start, window end, created, value))
+        self._users: "OrderedDict[int, Tuple[int, OrderedDict]]" = OrderedDict()
+        self._clock = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, entries: "OrderedDict", now: float) -> None:
+        for k in [k for k, (_, _, created, _) in entries.items() if now - created >= self.ttl]:
+            del entries[k]
+
+    def _user(self, user_id: int) -> Tuple[int, "OrderedDict"]:
+        user = self._users.get(user_id)
+        if user is None:
+            user = self._users[user_id] = (self._floor, OrderedDict())
+            while len(self._users) > self.max_users:
+                _, (stamp, _) = self._users.popitem(last=False)
+                self._floor = max(self._floor, stamp)
+        else:
+            self._users.move_to_end(user_id)
+        return user
+
+    def get_or_compute(self, user_id: int, key: Tuple, window: Tuple[datetime, datetime], compute: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            _, entries = self._user(user_id)
+            self._expire(entries, now)
+            if key in entries:
+                entries.move_to_end(key)
+                return entries[key][3]
+            started = self._clock
+
+        value = compute()
+
+        with self._lock:
+            stamp, entries = self._user(user_id)
+            if stamp > started:
+                return value
+            entries[key] = (window[0], window[1], now, value)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+        return value
+
+    def invalidate(self, user_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None) -> None:
+        """Drop a user's results overlapping [start, end]; no range drops all of them."""
+        with self._lock:
+            self._clock += 1
+            _, entries = self._user(user_id)
+            self._users[user_id] = (self._clock, entries)
+            if start is None or end is None:
+                entries.clear()
+                return
+            self._expire(entries, time.monotonic())
+            start, end = _naive(start), _naive(end)
+            stale = [k for k, (w_start, w_end, _, _) in entries.items() if w_start <= end and start <= w_end]
+            for k in stale:
+                del entries[k]
+
+
+analytics_cache = AnalyticsCache()
@@ -7,7 +7,7 @@ from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from models import user_model
 from config import SECRET_KEY, ALGORITHM, access_token_expires
-from db.conn import get_db
+from db.conn import SessionLocal, get_db
 
 
 # Use pbkdf2_sha256 instead of bcrypt to avoid Windows-specific bcrypt backend issues
@@ -44,25 +44,44 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[user_m
     return user
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> user_model.User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def user_from_token(db: Session, token: str) -> user_model.User:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str | None = payload.get("sub")
         if email is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
 
     user = get_user_by_email(db, email=email)
     if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        raise _credentials_exception()
+    return user
+
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> user_model.User:
+    return user_from_token(db, token)
+
+
+def authenticate_token(token: str) -> int:
+    """
+    Resolve a bearer token to a user id using a short-lived DB session. For
+    long-lived streaming endpoints, which shouldn't hold a pooled connection
+    (as Depends(get_db) would) for the whole stream.
+    """
+    db = SessionLocal()
+    try:
+        return user_from_token(db, token).id
+    finally:
+        db.close()
@@ -0,0 +1,205 @@
+"""
+Versioned change feed for pulling sessions down to other devices.
+
+Every write that changes a session (its fields, its summary or its samples)
+records a SessionChange row for it, replacing the previous one. The row's id is a
+version that only ever grows. A client keeps the highest version it has applied
+and asks for everything after it, so catching up costs one entry per session
+that changed since then. Session bodies and per-minute blink rollups are read
+when the feed is served. Nothing is copied at write time.
+
+Readers take everything with `id > since`, so versions must become visible in
+the order they were assigned. On server databases an id is assigned at INSERT but
+only seen at COMMIT, so two writes for one user could otherwise commit out of
+order and a reader that had moved past the later id would never see the earlier
+one. record_session_changes therefore takes a row lock on the user before
+inserting, held until the transaction commits, which serializes each user's feed
+writers. SQLite already allows one writer at a time and ignores FOR UPDATE.
+
+Deleted sessions stay in the feed as tombstones until TOMBSTONE_RETENTION_DAYS
+have passed. Then purge_tombstones drops them and raises the user's floor. A
+cursor below the floor may have missed a delete, so the feed answers it with
+reset=True.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from db import partitions
+from models import blink_model, change_model, session_model, user_model
+from service.serialization import SESSION_READ_COLUMNS, SESSION_READ_FIELDS
+from config import TOMBSTONE_RETENTION_DAYS
+
+MAX_PAGE = 1000
+
+
+def record_session_changes(
+    db: Session, user_id: int, session_ids: Iterable[int], deleted: bool = False, commit: bool = True
+) -> None:
+    """
+    Move the given sessions to the head of the user's change feed. The user row stays
+    locked until the caller's transaction commits (see the module docstring), so
+    with commit=False commit promptly.
+    """
+    ids = sorted(set(session_ids))
+    if not ids:
+        return
+    users = user_model.User.__table__
+    db.execute(select(users.c.id).where(users.c.id == user_id).with_for_update())
+    table = change_model.SessionChange.__table__
+    now = datetime.now()
+    db.execute(delete(table).where(table.c.user_id == user_id, table.c.session_id.in_(ids)))
+    db.execute(insert(table), [
+        {"user_id": user_id, "session_id": sid, "deleted": deleted, "changed_at": now}
+        for sid in ids
+    ])
+    if commit:
+        db.commit()
+
+
+def delete_sessions(db: Session, user_id: int, session_ids: Iterable[int]) -> List[int]:
+    """
+    Delete the user's sessions, with their samples and rollups, and leave a tombstone
+    for each in the change feed, all in one transaction. Each table gets one
+    set-based DELETE covering all the sessions. No rows are loaded through the ORM.
+    Returns the ids that existed.
+    """
+    Sess = session_model.Session
+    ids = list(set(session_ids))
+    if not ids:
+        return []
+    found = list(db.scalars(select(Sess.id).where(Sess.user_id == user_id, Sess.id.in_(ids))))
+    if not found:
+        return []
+
+    bind = db.get_bind()
+    # samples are routed by their own timestamp, which a skewed client clock can put
+    # outside the session's span, so every partition is swept; each DELETE is a seek
+    # on the session_id index
+    for key in partitions.existing_keys(bind):
+        table = partitions.partition_table(key)
+        db.execute(delete(table).where(table.c.user_id == user_id, table.c.session_id.in_(found)))
+    legacy = blink_model.BlinkSample.__table__
+    db.execute(delete(legacy).where(legacy.c.user_id == user_id, legacy.c.session_id.in_(found)))
+    rollups = blink_model.BlinkRollup.__table__
+    db.execute(delete(rollups).where(rollups.c.user_id == user_id, rollups.c.session_id.in_(found)))
+    db.execute(delete(Sess.__table__).where(Sess.user_id == user_id, Sess.id.in_(found)))
+    record_session_changes(db, user_id, found, deleted=True, commit=False)
+    db.commit()
+    return found
+
+
+def purge_tombstones(engine: Engine, retention_days: int = TOMBSTONE_RETENTION_DAYS, now: datetime | None = None) -> int:
+    """Drop tombstones older than the retention window and raise each user's floor. Returns rows dropped."""
+    if retention_days <= 0:
+        return 0
+    horizon = (now or datetime.now()) - timedelta(days=retention_days)
+    changes = change_model.SessionChange.__table__
+    floors = change_model.ChangeFeedFloor.__table__
+    expired = (changes.c.deleted.is_(True), changes.c.changed_at < horizon)
+    with engine.begin() as conn:
+        rows = conn.execute(
+            select(changes.c.user_id, func.max(changes.c.id)).where(*expired).group_by(changes.c.user_id)
+        ).all()
+        if not rows:
+            return 0
+        # versions only grow, so the new floor always replaces the old one
+        conn.execute(delete(floors).where(floors.c.user_id.in_([user_id for user_id, _ in rows])))
+        conn.execute(insert(floors), [{"user_id": user_id, "version": version} for user_id, version in rows])
+        return conn.execute(delete(changes).where(*expired)).rowcount
+
+
+def session_rollups(db: Session, user_id: int, sessions: List[dict]) -> Dict[int, List[dict]]:
+    """
+    Blink counts per minute for each session (SessionRead-shaped dicts), from its raw
+    samples, plus the hourly rollups of samples that retention already compacted.
+    One routed query covers every session.
+    """
+    out: Dict[int, List[dict]] = defaultdict(list)
+    if not sessions:
+        return out
+    ids = [s["id"] for s in sessions]
+    bind = db.get_bind()
+
+    samples = partitions.routed_select(
+        bind,
+        ["session_id", "timestamp"],
+        start=min(s["start_time"] for s in sessions),
+        end=max((s["end_time"] or datetime.now()) for s in sessions),
+        where=lambda t: (t.c.user_id == user_id, t.c.session_id.in_(ids)),
+        clip=False,
+    )
+    if samples is not None:
+        bucket = partitions.minute_bucket(samples.c.timestamp, bind.dialect.name)
+        rows = db.execute(
+            select(samples.c.session_id, bucket.label("bucket"), func.count())
+            .group_by(samples.c.session_id, bucket)
+            .order_by(samples.c.session_id, bucket)
+        )
+        for session_id, bucket_start, blinks in rows:
+            if isinstance(bucket_start, str):
+                # sqlite's strftime gives "YYYY-MM-DD HH:MM:SS"; emit the ISO form datetimes get
+                bucket_start = bucket_start.replace(" ", "T", 1)
+            out[session_id].append({"bucket_start": bucket_start, "bucket_seconds": 60, "blinks": blinks})
+
+    rollups = blink_model.BlinkRollup.__table__
+    rows = db.execute(
+        select(rollups.c.session_id, rollups.c.bucket_start, rollups.c.blinks)
+        .where(rollups.c.user_id == user_id, rollups.c.session_id.in_(ids))
+        .order_by(rollups.c.session_id, rollups.c.bucket_start)
+    )
+    for session_id, bucket_start, blinks in rows:
+        out[session_id].append({"bucket_start": bucket_start, "bucket_seconds": 3600, "blinks": blinks})
+    return out
+
+
+def changes_since(db: Session, user_id: int, since: int, limit: int = 500) -> dict:
+    """
+    Changes after version `since`, oldest first, at most `limit` of them, as a
+    ChangeFeed-shaped dict. `version` in the result is the cursor to pass next time,
+    and `more` says whether another page is waiting.
+    """
+    limit = max(1, min(limit, MAX_PAGE))
+    if since > 0:
+        floor = db.scalar(
+            select(change_model.ChangeFeedFloor.version).where(change_model.ChangeFeedFloor.user_id == user_id)
+        )
+        if floor is not None and since < floor:
+            return {"version": 0, "more": True, "reset": True, "changes": []}
+
+    table = change_model.SessionChange.__table__
+    rows = db.execute(
+        select(table.c.id, table.c.session_id, table.c.deleted)
+        .where(table.c.user_id == user_id, table.c.id > since)
+        .order_by(table.c.id)
+        .limit(limit + 1)
+    ).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    live_ids = [r.session_id for r in rows if not r.deleted]
+    sessions = {}
+    if live_ids:
+        Sess = session_model.Session
+        sessions = {
+            row.id: dict(zip(SESSION_READ_FIELDS, row))
+            for row in db.execute(select(*SESSION_READ_COLUMNS).where(Sess.user_id == user_id, Sess.id.in_(live_ids)))
+        }
+    rollups = session_rollups(db, user_id, list(sessions.values()))
+
+    changes = []
+    for version, session_id, deleted in rows:
+        session = sessions.get(session_id)
+        if deleted or session is None:
+            changes.append({"version": version, "op": "delete", "session_id": session_id, "session": None, "rollups": []})
+            continue
+        changes.append({
+            "version": version,
+            "op": "upsert",
+            "session_id": session_id,
+            "session": session,
+            "rollups": rollups.get(session_id, []),
+        })
+    return {"version": rows[-1].id if rows else since, "more": more, "reset": False, "changes": changes}
@@ -0,0 +1,120 @@
+"""
+In-process pub/sub for live blink events.
+
+Publishers are the sync endpoints, which run in the threadpool. Subscribers are
+SSE and WebSocket handlers on the event loop. publish() serializes an event once
+and hands it to each subscriber's loop with call_soon_threadsafe. Each subscriber
+has a bounded queue. When a slow client falls behind, its oldest events are
+dropped and counted, and it is sent a "gap" event so it knows to refetch.
+Watching a session costs O(new events), never O(session size).
+
+The hub lives in one process. With several workers, each worker only sees what
+was ingested by that worker.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set
+
+from service import metrics
+
+SUBSCRIBER_BUFFER = 256
+MAX_SUBSCRIBERS_PER_USER = 8
+HEARTBEAT_SECONDS = 15.0
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscriber:
+    def __init__(self, user_id: int, session_id: Optional[int], loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self.seq = 0
+
+    def wants(self, session_id: Optional[int]) -> bool:
+        return self.session_id is None or self.session_id == session_id
+
+    def _deliver(self, data: str) -> None:
+        # runs on the subscriber's event loop
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            metrics.live_events_dropped.inc()
+        self.queue.put_nowait(data)
+
+    async def next(self, timeout: float = HEARTBEAT_SECONDS) -> Optional[str]:
+        """Next serialized event, or None if nothing arrived within timeout (send a heartbeat)."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def take_dropped(self) -> int:
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+class LiveHub:
+    def __init__(self, buffer_size: int = SUBSCRIBER_BUFFER, max_per_user: int = MAX_SUBSCRIBERS_PER_USER):
+        self.buffer_size = buffer_size
+        self.max_per_user = max_per_user
+        self._subs: Dict[int, Set[Subscriber]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int, session_id: Optional[int] = None) -> Subscriber:
+        """Register a subscriber on the running event loop."""
+        sub = Subscriber(user_id, session_id, asyncio.get_running_loop(), self.buffer_size)
+        with self._lock:
+            if len(self._subs[user_id]) >= self.max_per_user:
+                raise TooManySubscribers()
+            self._subs[user_id].add(sub)
+        metrics.live_subscribers.add(1)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        with self._lock:
+            subs = self._subs.get(sub.user_id)
+            if subs is None or sub not in subs:
+                return
+            subs.discard(sub)
+            if not subs:
+                del self._subs[sub.user_id]
+        metrics.live_subscribers.add(-1)
+
+    def has_subscribers(self, user_id: int) -> bool:
+        return bool(self._subs.get(user_id))
+
+    def publish(self, user_id: int, event: dict) -> int:
+        """Fan an event out to the user's subscribers (thread-safe). Returns how many got it."""
+        with self._lock:
+            targets = [s for s in self._subs.get(user_id, ()) if s.wants(event.get("session_id"))]
+        if not targets:
+            return 0
+        data = json.dumps(event, default=str)
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub._deliver, data)
+            except RuntimeError:
+                # loop already closed; the handler's finally will unsubscribe it
+                pass
+        metrics.live_events_published.inc(amount=len(targets))
+        return len(targets)
+
+    def publish_samples(self, user_id: int, samples: Iterable, source: str) -> None:
+        """Publish BlinkSampleIn-like objects as one "blinks" event per session."""
+        if not self.has_subscribers(user_id):
+            return
+        by_session: Dict[Optional[int], list] = defaultdict(list)
+        for sample in samples:
+            by_session[sample.session_id].append({"timestamp": sample.timestamp.isoformat(), "count": sample.count})
+        for session_id, items in by_session.items():
+            self.publish(user_id, {"type": "blinks", "source": source, "session_id": session_id, "samples": items})
+
+
+live_hub = LiveHub()
@@ -0,0 +1,209 @@
+"""
+In-process request metrics rendered in the Prometheus text exposition format.
+
+MetricsMiddleware times every request, reads the per-request query count and DB
+time collected by db/timing.py, and records them per route template (so
+/sessions/1 and /sessions/2 share a series). Endpoints add domain counters such as
+rows ingested. GET /metrics renders everything for a Prometheus scrape.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Sequence, Tuple
+from db import timing
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+ROWS_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 5000, 10000)
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labelnames, labels)} {_fmt_value(value)}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help = name, help_text
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, amount: float) -> None:
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_fmt_value(self.value)}"]
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, le)} {count}")
+                lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {_fmt_value(total)}")
+                lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+ROUTE_LABELS = ("method", "route")
+
+requests_total = Counter("lumina_http_requests_total", "HTTP requests handled.", ("method", "route", "status"))
+requests_in_flight = Gauge("lumina_http_requests_in_flight", "HTTP requests currently being handled.")
+request_seconds = Histogram("lumina_http_request_duration_seconds", "Wall time per request.", ROUTE_LABELS)
+request_db_seconds = Histogram("lumina_http_request_db_seconds", "Time spent executing SQL per request.", ROUTE_LABELS)
+request_app_seconds = Histogram(
+    "lumina_http_request_app_seconds",
+    "Request time outside SQL execution (validation, ORM, JSON, auth).",
+    ROUTE_LABELS,
+)
+request_queries = Histogram("lumina_http_request_db_queries", "SQL statements per request.", ROUTE_LABELS, COUNT_BUCKETS)
+request_bytes = Histogram("lumina_http_request_size_bytes", "Request body size.", ROUTE_LABELS, SIZE_BUCKETS)
+response_bytes = Histogram("lumina_http_response_size_bytes", "Response body size.", ROUTE_LABELS, SIZE_BUCKETS)
+ingested_rows = Counter("lumina_sync_ingested_rows_total", "Rows written by /sync/* ingestion.", ("kind",))
+ingest_batch_rows = Histogram("lumina_sync_batch_rows", "Rows per /sync/* request.", ("kind",), ROWS_BUCKETS)
+sync_in_flight = Gauge("lumina_sync_requests_in_flight", "/sync/* requests admitted and not yet finished.")
+sync_rejected = Counter("lumina_sync_rejected_total", "/sync/* requests turned away by admission control.", ("reason",))
+live_subscribers = Gauge("lumina_live_subscribers", "Open live blink streams (SSE and WebSocket).")
+live_events_published = Counter("lumina_live_events_published_total", "Live events delivered to subscriber buffers.")
+live_events_dropped = Counter("lumina_live_events_dropped_total", "Live events dropped because a subscriber fell behind.")
+
+REGISTRY = [
+    requests_total,
+    requests_in_flight,
+    request_seconds,
+    request_db_seconds,
+    request_app_seconds,
+    request_queries,
+    request_bytes,
+    response_bytes,
+    ingested_rows,
+    ingest_batch_rows,
+    sync_in_flight,
+    sync_rejected,
+    live_subscribers,
+    live_events_published,
+    live_events_dropped,
+]
+
+
+def record_ingest(kind: str, rows: int) -> None:
+    ingested_rows.inc(kind, amount=rows)
+    ingest_batch_rows.observe(rows, kind)
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task hop). Optionally adds a
+    Server-Timing header with DB time and query count, which the load tests read.
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = timing.begin_request()
+        started = time.perf_counter()
+        method = scope["method"]
+        request_size = 0
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length":
+                request_size = int(value or 0)
+                break
+        state = {"status": 500, "response_size": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                if self.server_timing:
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    headers = list(message.get("headers", []))
+                    headers.append((
+                        b"server-timing",
+                        f'db;dur={stats.seconds * 1000:.3f};desc="{stats.count} queries", app;dur={elapsed_ms:.3f}'.encode(),
+                    ))
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                state["response_size"] += len(message.get("body", b""))
+            await send(message)
+
+        requests_in_flight.add(1)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            requests_in_flight.add(-1)
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            # unmatched paths share one series so scanners can't blow up cardinality
+            route_path = getattr(route, "path", None) or "unmatched"
+            labels = (method, route_path)
+
+            requests_total.inc(method, route_path, str(state["status"]))
+            request_seconds.observe(elapsed, *labels)
+            request_db_seconds.observe(stats.seconds, *labels)
+            request_app_seconds.observe(max(0.0, elapsed - stats.seconds), *labels)
+            request_queries.observe(stats.count, *labels)
+            if request_size:
+                request_bytes.observe(request_size, *labels)
+            response_bytes.observe(state["response_size"], *labels)
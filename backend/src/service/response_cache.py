@@ -0,0 +1,117 @@
+"""
+Version tracking and serialized-response caching for session reads.
+
+Every mutation of a user's sessions bumps an in-memory version, and reads derive a
+strong ETag from it, so a dashboard poll with a matching If-None-Match is answered
+with 304 before touching the database. Versions live in process memory (with a
+per-boot nonce in the ETag), so they are only correct with a single uvicorn worker:
+another worker never sees this one's bumps and would keep answering 304 or serving
+a stale body. When config.RESPONSE_CACHE is off (it is whenever WEB_CONCURRENCY > 1)
+no If-None-Match is honoured and no body is cached; every read goes to the database.
+"""
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from config import RESPONSE_CACHE
+
+_BOOT_ID = uuid.uuid4().hex[:8]
+
+
+class VersionTracker:
+    """Per-user list versions and per-session versions, plus a global epoch."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._list_versions: Dict[int, int] = {}
+        self._session_versions: Dict[Tuple[int, int], int] = {}
+        # bumped when background jobs rewrite data for many users at once (e.g. compaction)
+        self._epoch = 0
+
+    def list_version(self, user_id: int) -> int:
+        with self._lock:
+            return self._list_versions.get(user_id, 0)
+
+    def session_version(self, user_id: int, session_id: int) -> int:
+        with self._lock:
+            return self._session_versions.get((user_id, session_id), 0)
+
+    def bump_list(self, user_id: int) -> None:
+        with self._lock:
+            self._list_versions[user_id] = self._list_versions.get(user_id, 0) + 1
+
+    def bump_session(self, user_id: int, session_id: int) -> None:
+        """A session changed: its own version and the user's list version move on."""
+        with self._lock:
+            key = (user_id, session_id)
+            self._session_versions[key] = self._session_versions.get(key, 0) + 1
+            self._list_versions[user_id] = self._list_versions.get(user_id, 0) + 1
+
+    def bump_sessions(self, user_id: int, session_ids) -> None:
+        """Several sessions changed, e.g. their blink summaries; the list shows those too."""
+        with self._lock:
+            session_ids = list(session_ids)
+            for session_id in session_ids:
+                key = (user_id, session_id)
+                self._session_versions[key] = self._session_versions.get(key, 0) + 1
+            if session_ids:
+                self._list_versions[user_id] = self._list_versions.get(user_id, 0) + 1
+
+    def bump_epoch(self) -> None:
+        with self._lock:
+            self._epoch += 1
+
+    def list_etag(self, user_id: int) -> str:
+        with self._lock:
+            return f'"{_BOOT_ID}.{self._epoch}.u{user_id}.{self._list_versions.get(user_id, 0)}"'
+
+    def session_etag(self, user_id: int, session_id: int) -> str:
+        with self._lock:
+            version = self._session_versions.get((user_id, session_id), 0)
+            return f'"{_BOOT_ID}.{self._epoch}.u{user_id}.s{session_id}.{version}"'
+
+
+class ResponseCache:
+    """Bounded LRU of serialized response bodies keyed by ETag."""
+
+    def __init__(self, max_entries: int = 512, enabled: bool = True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._bodies: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def get(self, etag: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            body = self._bodies.get(etag)
+            if body is not None:
+                self._bodies.move_to_end(etag)
+            return body
+
+    def put(self, etag: str, body: bytes) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._bodies[etag] = body
+            self._bodies.move_to_end(etag)
+            while len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str, wildcard: bool = True) -> bool:
+    """
+    Whether an If-None-Match header matches etag. "*" matches any current
+    representation, so callers that don't yet know the resource exists pass
+    wildcard=False and check again once they do. Never matches while the response
+    cache is off, since this process's versions may be behind another worker's.
+    """
+    if not if_none_match or not response_cache.enabled:
+        return False
+    if if_none_match.strip() == "*":
+        return wildcard
+    return etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+versions = VersionTracker()
+response_cache = ResponseCache(enabled=RESPONSE_CACHE)
@@ -0,0 +1,108 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, inspect, select
+from sqlalchemy.engine import Engine
+from db import partitions
+from models import blink_model
+from service.response_cache import versions
+from service.change_feed import purge_tombstones
+from config import RAW_BLINK_RETENTION_DAYS, RETENTION_INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_legacy_samples(engine: Engine, chunk_size: int = 5000) -> int:
+    """Move rows from the old single blink_samples table into monthly partitions."""
+    legacy = blink_model.BlinkSample.__table__
+    if not inspect(engine).has_table(legacy.name):
+        return 0
+
+    moved = 0
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(legacy.c.id, legacy.c.user_id, legacy.c.timestamp, legacy.c.count, legacy.c.session_id)
+                .order_by(legacy.c.id)
+                .limit(chunk_size)
+            ).all()
+        if not rows:
+            return moved
+
+        grouped = partitions.group_by_partition(
+            {"user_id": r.user_id, "timestamp": r.timestamp, "count": r.count, "session_id": r.session_id}
+            for r in rows
+        )
+        # create partitions before opening the write transaction (sqlite allows one writer)
+        tables = {key: partitions.ensure_partition(engine, key) for key in grouped}
+        with engine.begin() as conn:
+            for key, part_rows in grouped.items():
+                conn.execute(insert(tables[key]), part_rows)
+            conn.execute(delete(legacy).where(legacy.c.id <= rows[-1].id))
+        moved += len(rows)
+
+
+def compact_expired_partitions(engine: Engine, retention_days: int = RAW_BLINK_RETENTION_DAYS, now: datetime | None = None) -> list[str]:
+    """
+    Fold every partition whose month ended before the retention horizon into hourly
+    rollups and drop it. Returns the partition keys that were compacted.
+    """
+    if retention_days <= 0:
+        return []
+
+    horizon = (now or datetime.now()) - timedelta(days=retention_days)
+    rollups = blink_model.BlinkRollup.__table__
+    compacted = []
+
+    for key in partitions.existing_keys(engine, refresh=True):
+        _, month_end = partitions.key_range(key)
+        if month_end > horizon:
+            continue
+
+        table = partitions.partition_table(key)
+        bucket = partitions.hour_bucket(table.c.timestamp, engine.dialect.name)
+        summary = (
+            select(table.c.user_id, table.c.session_id, bucket, func.count())
+            .group_by(table.c.user_id, table.c.session_id, bucket)
+        )
+        # rollup insert and partition drop commit together, so a crash never loses or doubles samples
+        with engine.begin() as conn:
+            conn.execute(
+                insert(rollups).from_select(
+                    ["user_id", "session_id", "bucket_start", "blinks"], summary
+                )
+            )
+            partitions.drop_partition(conn, key)
+        compacted.append(key)
+        # cached session bodies may still list the samples that were just dropped
+        versions.bump_epoch()
+        logger.info("compacted blink partition %s into hourly rollups", key)
+
+    return compacted
+
+
+class RetentionWorker(threading.Thread):
+    """Background thread that periodically runs partition compaction and tombstone cleanup."""
+
+    def __init__(self, engine: Engine, interval_seconds: int = RETENTION_INTERVAL_SECONDS):
+        super().__init__(name="lumina-retention", daemon=True)
+        self.engine = engine
+        self.interval = interval_seconds
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                compact_expired_partitions(self.engine)
+            except Exception:
+                logger.exception("blink partition compaction failed")
+            try:
+                purged = purge_tombstones(self.engine)
+                if purged:
+                    logger.info("purged %d change feed tombstones", purged)
+            except Exception:
+                logger.exception("tombstone purge failed")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
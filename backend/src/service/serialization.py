@@ -0,0 +1,180 @@
+"""
+Fast JSON for the high-volume endpoints.
+
+The heavy reads (session lists, a session's samples, the change feed) select
+plain row tuples and serialize them straight to bytes. Each column list is
+exactly the response schema's fields, and the column types already match what
+the schema declares, so going through Pydantic models would only copy the data.
+The sync endpoints parse their bodies here too, with a check per field instead of
+one model instance per row.
+
+orjson is used when it is installed (several times faster in both directions,
+and it encodes datetimes natively). Otherwise the stdlib json module is used,
+and the output is the same.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Any, Iterable, List, NamedTuple, Optional, Sequence
+from fastapi import HTTPException, status
+from fastapi.responses import Response
+from models import session_model
+from schemas import general_schemas
+
+try:
+    import orjson
+except ImportError:  # optional; pip install orjson
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(data: bytes | str) -> Any:
+        return orjson.loads(data)
+else:
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, default=_default, separators=(",", ":")).encode()
+
+    def loads(data: bytes | str) -> Any:
+        return json.loads(data)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# ========== RESPONSE SHAPES ==========
+
+SESSION_READ_FIELDS = tuple(general_schemas.SessionRead.model_fields)
+SESSION_READ_COLUMNS = tuple(getattr(session_model.Session, f) for f in SESSION_READ_FIELDS)
+BLINK_READ_FIELDS = tuple(general_schemas.BlinkSampleRead.model_fields)
+
+
+def rows_to_dicts(fields: Sequence[str], rows: Iterable[Sequence]) -> List[dict]:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+# ========== REQUEST BODIES ==========
+
+class BlinkRow(NamedTuple):
+    """A validated /sync/blinks item; quacks like BlinkSampleIn."""
+    timestamp: datetime
+    count: int
+    session_id: Optional[int]
+
+
+def decode_body(body: bytes) -> Any:
+    """A request body decoded as JSON; 422 if it isn't."""
+    try:
+        return loads(body)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Body is not valid JSON")
+
+
+def _invalid(index: int, field: str, message: str) -> HTTPException:
+    # same shape as FastAPI's own validation errors
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail=[{"loc": ["body", index, field], "msg": message, "type": "value_error"}],
+    )
+
+
+def _int(value: Any, index: int, field: str) -> int:
+    # bool is an int subclass but never a valid count or id
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    raise _invalid(index, field, "Input should be a valid integer")
+
+
+# numbers above this are read as milliseconds since the epoch, as Pydantic does
+_MS_THRESHOLD = 2e10
+
+
+def _datetime(value: Any, index: int, field: str) -> datetime:
+    """
+    An ISO 8601 string, or seconds (or milliseconds) since the Unix epoch as a
+    number or numeric string, which Pydantic's datetime also accepts. Epoch
+    values come back in UTC.
+    """
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            try:
+                value = float(value)
+            except ValueError:
+                raise _invalid(index, field, "Input should be a valid datetime")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        seconds = value / 1000 if abs(value) > _MS_THRESHOLD else value
+        try:
+            return datetime.fromtimestamp(seconds, tz=timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            raise _invalid(index, field, "Input should be a valid datetime")
+    raise _invalid(index, field, "Input should be a valid datetime")
+
+
+def parse_blink_samples(payload: Any) -> List[BlinkRow]:
+    """Validate a /sync/blinks body (the same rules as List[BlinkSampleIn])."""
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Expected a JSON array")
+    rows = []
+    for i, item in enumerate(payload):
+        if not isinstance(item, dict):
+            raise _invalid(i, "item", "Input should be an object")
+        try:
+            ts = item["timestamp"]
+            count = item["count"]
+        except KeyError as e:
+            raise _invalid(i, e.args[0], "Field required")
+        timestamp = _datetime(ts, i, "timestamp")
+        session_id = item.get("session_id")
+        rows.append(BlinkRow(
+            timestamp,
+            _int(count, i, "count"),
+            None if session_id is None else _int(session_id, i, "session_id"),
+        ))
+    return rows
+
+
+def array_body(items: dict) -> dict:
+    """
+    openapi_extra for an endpoint that reads its JSON array body itself (through
+    a dependency), so the schema still shows up in the API docs.
+    """
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": {"type": "array", "items": items}}},
+        }
+    }
+
+
+def parse_session_ids(payload: Any) -> List[int]:
+    """Validate a /sync/deletions body: a list of session ids."""
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Expected a JSON array")
+    return [_int(value, i, "id") for i, value in enumerate(payload)]
+
+
+def parse_session_dicts(payload: Any) -> List[dict]:
+    """Validate a /sync/sessions body: a list of objects with a start_time."""
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Expected a JSON array")
+    for i, item in enumerate(payload):
+        if not isinstance(item, dict):
+            raise _invalid(i, "item", "Input should be an object")
+        if not isinstance(item.get("start_time"), str):
+            raise _invalid(i, "start_time", "Field required")
+    return payload
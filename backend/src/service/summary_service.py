@@ -0,0 +1,192 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from db import partitions
+from models import blink_model, session_model
+from schemas import general_schemas
+
+ROLLUP_BUCKET = timedelta(hours=1)
+
+
+def _has_running_state(session: session_model.Session) -> bool:
+    # sessions summarised before the running state existed have totals but no state to fold into
+    return session.cur_minute_blinks is not None or session.total_blinks is None
+
+
+def _fold(session: session_model.Session, timestamps: Sequence[datetime]) -> None:
+    """Fold blink timestamps (in time order) into a session's running summary."""
+    total = session.total_blinks or 0
+    peak = session.peak_rate or 0
+    gap = session.blink_gap_seconds or 0.0
+    in_minute = session.cur_minute_blinks or 0
+    last = session.last_blink_at
+    for ts in timestamps:
+        gap = max(gap, (ts - (last or session.start_time)).total_seconds())
+        if last is not None and ts.replace(second=0, microsecond=0) == last.replace(second=0, microsecond=0):
+            in_minute += 1
+        else:
+            in_minute = 1
+        peak = max(peak, in_minute)
+        total += 1
+        last = ts
+    session.total_blinks = total
+    session.peak_rate = peak
+    session.blink_gap_seconds = gap
+    session.cur_minute_blinks = in_minute
+    session.last_blink_at = last
+
+
+def _finish(session: session_model.Session) -> None:
+    """Duration, mean rate and the trailing gap, as of the session's end_time."""
+    end = session.end_time
+    duration = max(0.0, (end - session.start_time).total_seconds())
+    total = session.total_blinks or 0
+    session.total_blinks = total
+    session.peak_rate = session.peak_rate or 0
+    session.duration_seconds = duration
+    session.mean_rate = round(total / (duration / 60), 3) if duration > 0 else None
+    tail = (end - (session.last_blink_at or session.start_time)).total_seconds()
+    session.longest_gap_seconds = max(session.blink_gap_seconds or 0.0, tail)
+
+
+def store_client_summary(session: session_model.Session, summary: general_schemas.SessionSummary) -> None:
+    """Keep a summary the desktop computed from the complete session; later blinks won't change it."""
+    for field in general_schemas.SessionSummary.model_fields:
+        setattr(session, field, getattr(summary, field))
+    session.summary_from_client = True
+
+
+def fold_blink_batch(db: Session, user_id: int, samples: Sequence) -> int:
+    """
+    Fold one synced batch of samples into the stored summaries of the sessions it
+    touches, without reading their earlier samples. Sessions whose summary came from
+    the client are left alone. A batch older than a session's last folded blink (or
+    a session with no running state yet) falls back to refresh_session_summaries.
+    Returns the number of sessions updated.
+    """
+    by_session: Dict[int, List[datetime]] = {}
+    for sample in samples:
+        if sample.session_id is not None:
+            ts = sample.timestamp
+            # stored timestamps are naive, as the desktop sends them
+            by_session.setdefault(sample.session_id, []).append(ts.replace(tzinfo=None) if ts.tzinfo else ts)
+    if not by_session:
+        return 0
+
+    Sess = session_model.Session
+    sessions = db.query(Sess).filter(Sess.user_id == user_id, Sess.id.in_(list(by_session))).all()
+    stale = []
+    updated = 0
+    for session in sessions:
+        if session.summary_from_client:
+            continue
+        stamps = sorted(by_session[session.id])
+        if not _has_running_state(session) or (
+            session.last_blink_at is not None and stamps[0] < session.last_blink_at
+        ):
+            stale.append(session.id)
+            continue
+        _fold(session, stamps)
+        if session.end_time is not None:
+            _finish(session)
+        updated += 1
+    db.commit()
+    return updated + refresh_session_summaries(db, user_id, stale)
+
+
+def finish_sessions(db: Session, user_id: int, session_ids: Iterable[int]) -> int:
+    """
+    Finalize the summaries of ended sessions from their running state (duration,
+    mean rate, trailing gap). No samples are read unless a session predates the
+    running state. Returns the number of sessions updated.
+    """
+    ids = list(session_ids)
+    if not ids:
+        return 0
+    Sess = session_model.Session
+    sessions = db.query(Sess).filter(
+        Sess.user_id == user_id, Sess.id.in_(ids), Sess.end_time.isnot(None)
+    ).all()
+    stale = []
+    for session in sessions:
+        if session.summary_from_client:
+            continue
+        if not _has_running_state(session):
+            stale.append(session.id)
+            continue
+        _finish(session)
+    db.commit()
+    refresh_session_summaries(db, user_id, stale)
+    return len(sessions)
+
+
+def refresh_session_summaries(db: Session, user_id: int, session_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Rebuild the summaries (and running state) of the user's sessions from stored
+    data: all of them, or just session_ids. Samples for every session are read in
+    one routed query over the partitions the sessions span, and blinks already
+    compacted into rollups are added to the totals. Rollups only keep hourly
+    counts, so for a compacted session the stored peak and longest gap are kept
+    unless the remaining raw samples show more, and the last blink is taken as the
+    end of its last rollup hour at the latest. Returns the number of sessions updated.
+    """
+    Sess = session_model.Session
+    query = db.query(Sess).filter(Sess.user_id == user_id)
+    if session_ids is not None:
+        ids = list(session_ids)
+        if not ids:
+            return 0
+        query = query.filter(Sess.id.in_(ids))
+    sessions: List[session_model.Session] = query.all()
+    if not sessions:
+        return 0
+
+    by_id = {s.id: s for s in sessions}
+    now = datetime.now()
+    stamps: dict[int, list[datetime]] = {sid: [] for sid in by_id}
+    samples = partitions.routed_select(
+        db.get_bind(),
+        ["session_id", "timestamp"],
+        start=min(s.start_time for s in sessions),
+        end=max(s.end_time or now for s in sessions),
+        where=lambda t: (t.c.user_id == user_id, t.c.session_id.in_(list(by_id))),
+        clip=False,
+    )
+    if samples is not None:
+        for session_id, ts in db.execute(select(samples.c.session_id, samples.c.timestamp)):
+            stamps[session_id].append(ts)
+
+    rollup = blink_model.BlinkRollup
+    compacted = {
+        session_id: (int(blinks), last_bucket)
+        for session_id, blinks, last_bucket in db.execute(
+            select(rollup.session_id, func.sum(rollup.blinks), func.max(rollup.bucket_start))
+            .where(rollup.user_id == user_id, rollup.session_id.in_(list(by_id)))
+            .group_by(rollup.session_id)
+        )
+    }
+
+    for sid, session in by_id.items():
+        raw = sorted(stamps[sid])
+        rolled, last_bucket = compacted.get(sid, (0, None))
+        kept_gap = session.blink_gap_seconds if session.blink_gap_seconds is not None else session.longest_gap_seconds
+        kept = (session.peak_rate or 0, kept_gap or 0.0, session.last_blink_at)
+        session.total_blinks = rolled
+        session.peak_rate = 0
+        session.blink_gap_seconds = 0.0
+        session.cur_minute_blinks = 0
+        # for a compacted session, the stretch before the first raw sample is not a real gap
+        session.last_blink_at = raw[0] if rolled and raw else None
+        _fold(session, raw)
+        if rolled:
+            bucket_end = last_bucket + ROLLUP_BUCKET
+            if session.end_time is not None:
+                bucket_end = min(bucket_end, session.end_time)
+            session.peak_rate = max(session.peak_rate, kept[0])
+            session.blink_gap_seconds = max(session.blink_gap_seconds, kept[1])
+            session.last_blink_at = max(ts for ts in (session.last_blink_at, kept[2], bucket_end) if ts is not None)
+        if session.end_time is not None:
+            _finish(session)
+    db.commit()
+    return len(by_id)
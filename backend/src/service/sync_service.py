@@ -0,0 +1,63 @@
+from datetime import datetime
+from typing import List, Sequence
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from db import partitions
+from models import session_model
+from schemas import general_schemas
+from service.serialization import BlinkRow
+
+
+def ingest_blinks(db: Session, user_id: int, samples: Sequence[general_schemas.BlinkSampleIn | BlinkRow]) -> int:
+    """Bulk insert blink samples for a user. Returns the number of rows written."""
+    if not samples:
+        return 0
+
+    rows = [
+        {
+            "user_id": user_id,
+            "timestamp": sample.timestamp,
+            "count": sample.count,
+            "session_id": sample.session_id,
+        }
+        for sample in samples
+    ]
+    grouped = partitions.group_by_partition(rows)
+    # create any missing monthly partitions before this session starts writing
+    tables = {key: partitions.ensure_partition(db.get_bind(), key) for key in grouped}
+    # one executemany per partition instead of per-row ORM units of work; server
+    # dialects turn this into batched multi-row INSERTs
+    for key, part_rows in grouped.items():
+        db.execute(insert(tables[key]), part_rows)
+    db.commit()
+    return len(rows)
+
+
+SUMMARY_FIELDS = tuple(general_schemas.SessionSummary.model_fields)
+
+
+def ingest_sessions(db: Session, user_id: int, sessions_data: List[dict]) -> List[int]:
+    """
+    Bulk insert sessions from the desktop client. Returns the new ids in input order.
+    Summary fields the client already computed are stored as sent.
+    """
+    if not sessions_data:
+        return []
+
+    rows = [
+        {
+            "user_id": user_id,
+            "name": sess_data.get("name"),
+            "start_time": datetime.fromisoformat(sess_data["start_time"]),
+            "end_time": datetime.fromisoformat(sess_data["end_time"]) if sess_data.get("end_time") else None,
+            **{field: sess_data.get(field) for field in SUMMARY_FIELDS},
+            "summary_from_client": True if sess_data.get("total_blinks") is not None else None,
+        }
+        for sess_data in sessions_data
+    ]
+    stmt = insert(session_model.Session).returning(
+        session_model.Session.id, sort_by_parameter_order=True
+    )
+    ids = list(db.scalars(stmt, rows))
+    db.commit()
+    return ids